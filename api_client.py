@@ -0,0 +1,167 @@
+"""
+Pooled HTTP client for the chat completions API.
+
+One OpenAIClient holds a keep-alive connection pool (httpx), so calls reuse
+TCP/TLS connections instead of paying for setup, and it carries its own API key
+instead of the module-global openai.api_key, so it is safe to share between
+threads. It is an llm.py backend (call it with a request dict), and has an
+async interface for event-loop callers:
+
+    client = OpenAIClient(api_key)
+    llm.set_backend(client)
+    ...
+    response = await client.achat_completion(request)
+
+A request may carry "request_timeout" (seconds, as with openai.ChatCompletion)
+to override the client's read timeout for that call.
+
+AzureOpenAIClient talks to an Azure-style deployment instead: requests for a
+model go to its deployment's URL, authenticated with an api-key header.
+Several clients can be pooled behind one backend with endpoint_pool.py.
+
+OpenAIClient also drives the batch API (upload a JSONL file of requests,
+create a batch, poll it, download the results) for bulk.py.
+"""
+import os
+
+import httpx
+
+API_BASE = os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1")
+AZURE_API_VERSION = "2024-06-01"
+DEFAULT_TIMEOUT = 120.0                             # Seconds to wait for a response
+CONNECT_TIMEOUT = 10.0
+MAX_CONNECTIONS = 32                                # Enough for a draft report's parallel sections + hedges
+MAX_KEEPALIVE = 16
+BATCH_ENDPOINT = "/v1/chat/completions"             # What batch requests are sent to
+BATCH_COMPLETION_WINDOW = "24h"
+
+
+class APIError(Exception):
+    """The API answered with an error status."""
+
+    def __init__(self, status_code, message, retry_after=None):
+        super().__init__(f"{status_code}: {message}")
+        self.status_code = status_code
+        self.retry_after = retry_after              # Seconds, from the Retry-After header of a 429 / 503
+
+
+def _retry_after(response):
+    try:
+        return float(response.headers["retry-after"])
+    except (KeyError, ValueError):
+        return None
+
+
+def _error_message(response) -> str:
+    try:
+        return response.json()["error"]["message"]
+    except (ValueError, KeyError, TypeError):
+        return response.text[:500]
+
+
+class OpenAIClient:
+    def __init__(self, api_key=None, base_url=API_BASE, timeout=DEFAULT_TIMEOUT, max_connections=MAX_CONNECTIONS,
+                 max_keepalive=MAX_KEEPALIVE):
+        api_key = api_key or os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise ValueError("No OpenAI API key (pass api_key or set OPENAI_API_KEY)")
+
+        self.timeout = timeout
+        self._options = {
+            "base_url": base_url,
+            "headers": self._auth_headers(api_key),
+            "timeout": httpx.Timeout(timeout, connect=CONNECT_TIMEOUT),
+            "limits": httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive),
+        }
+        self._client = httpx.Client(**self._options)
+        self._async_client = None                   # Created on first async call, inside the caller's event loop
+
+    @staticmethod
+    def _auth_headers(api_key) -> dict:
+        return {"Authorization": f"Bearer {api_key}"}
+
+    def _url(self, request) -> str:
+        return "/chat/completions"
+
+    def _prepare(self, request):
+        body = dict(request)
+        timeout = body.pop("request_timeout", None)
+        return body, (httpx.Timeout(timeout, connect=CONNECT_TIMEOUT) if timeout else httpx.USE_CLIENT_DEFAULT)
+
+    @staticmethod
+    def _result(response) -> dict:
+        if response.status_code >= 400:
+            raise APIError(response.status_code, _error_message(response), _retry_after(response))
+        return response.json()
+
+    def chat_completion(self, request, timeout=None) -> dict:
+        body, request_timeout = self._prepare(request)
+        if timeout:
+            request_timeout = httpx.Timeout(timeout, connect=CONNECT_TIMEOUT)
+        return self._result(self._client.post(self._url(request), json=body, timeout=request_timeout))
+
+    __call__ = chat_completion
+
+    async def achat_completion(self, request, timeout=None) -> dict:
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(**self._options)
+        body, request_timeout = self._prepare(request)
+        if timeout:
+            request_timeout = httpx.Timeout(timeout, connect=CONNECT_TIMEOUT)
+        response = await self._async_client.post(self._url(request), json=body, timeout=request_timeout)
+        return self._result(response)
+
+    # ----------- Batch API -----------
+    def upload_batch_file(self, path) -> str:
+        """Upload a JSONL file of batch requests, returns its file id."""
+        with open(path, "rb") as f:
+            response = self._client.post("/files", data={"purpose": "batch"},
+                                         files={"file": (os.path.basename(path), f, "application/jsonl")})
+        return self._result(response)["id"]
+
+    def create_batch(self, input_file_id, metadata=None) -> dict:
+        return self._result(self._client.post("/batches", json={
+            "input_file_id": input_file_id,
+            "endpoint": BATCH_ENDPOINT,
+            "completion_window": BATCH_COMPLETION_WINDOW,
+            "metadata": metadata or {},
+        }))
+
+    def retrieve_batch(self, batch_id) -> dict:
+        return self._result(self._client.get(f"/batches/{batch_id}"))
+
+    def file_content(self, file_id) -> bytes:
+        response = self._client.get(f"/files/{file_id}/content")
+        if response.status_code >= 400:
+            raise APIError(response.status_code, _error_message(response), _retry_after(response))
+        return response.content
+
+    def close(self):
+        self._client.close()
+
+    async def aclose(self):
+        self._client.close()
+        if self._async_client is not None:
+            await self._async_client.aclose()
+
+
+class AzureOpenAIClient(OpenAIClient):
+    """
+    An Azure-style deployment. deployments maps model names (as routed by
+    routing.py) to deployment names; other models aren't served here.
+    """
+
+    def __init__(self, api_key, base_url, deployments, api_version=AZURE_API_VERSION, **options):
+        if not deployments:
+            raise ValueError("An Azure endpoint needs at least one model -> deployment mapping")
+        self.deployments = dict(deployments)
+        self.api_version = api_version
+        super().__init__(api_key, base_url=base_url.rstrip("/"), **options)
+
+    @staticmethod
+    def _auth_headers(api_key) -> dict:
+        return {"api-key": api_key}
+
+    def _url(self, request) -> str:
+        deployment = self.deployments[request["model"]]
+        return f"/openai/deployments/{deployment}/chat/completions?api-version={self.api_version}"
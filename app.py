@@ -1,118 +1,318 @@
 import streamlit as st
-from datetime import datetime, timedelta
-import openai
+from datetime import datetime
+from contextlib import contextmanager
+from functools import partial
+import hashlib
 import os
-import json
-import re
-from docx import Document
-from generate_action_plan import write_action_plan_docx
-from generate_strategy_3 import generate_strategy_docx
-from generate_one_pager import generate_one_pager_docx
+from docx_stream import read_minutes
+from generate_action_plan import action_plan_docx, build_prompt, ACTION_PLAN_INSTRUCTIONS
+from generate_strategy_3 import generate_strategy_docx, generate_strategy_sections
+from generate_one_pager import generate_one_pager_docx, generate_combined_summary
+from generate_one_pager import build_prompt as build_one_pager_prompt, ONE_PAGER_INSTRUCTIONS
+from api_client import OpenAIClient
+import cancellation
+import cassette
+import endpoint_pool
+import fair_share
+import ledger
+import llm
+import routing
+import single_flight
+import runs
+from runs import Run, finalize_in_background
+import speculation
+import minutes_digest
+import prompt_registry
+import prompt_tokens
+import profiling
+import token_count
+from condense_minutes import prepare_minutes
 # from dotenv import load_dotenv
 import tempfile
+import threading
+import uuid
 
-# MODEL = "gpt-4o-mini"
-MODEL = "gpt-4o"
+# Models are chosen per document in routing.py
 
 # === Setup ===
 # load_dotenv()
 # openai.api_key = os.getenv("OPENAI_API_KEY")
-OPENAI_API_KEY = st.secrets["openai_api_key"]
+OPENAI_API_KEY = st.secrets.get("openai_api_key")   # Or several keys / endpoints under [[endpoints]]
 CORRECT_PASSWORD = st.secrets["app_password"]
-
-# Set OpenAI key
-openai.api_key = OPENAI_API_KEY
+ADMIN_PASSWORD = st.secrets.get("admin_password")    # Also unlocks admin tools (profiling)
 
 st.set_page_config(page_title="Document Generator", layout="centered")
 
+# One pooled API client per server process (kept across reruns), used by every generator via llm.py
+@st.cache_resource
+def api_client():
+    if "endpoints" in st.secrets:
+        # Several keys / deployments: calls are spread over them, so allow more at once across sessions
+        client = endpoint_pool.from_config(st.secrets["endpoints"], default_max_in_flight=fair_share.MAX_IN_FLIGHT)
+        fair_share.limiter().resize(max(fair_share.MAX_IN_FLIGHT, client.max_in_flight))
+    else:
+        client = OpenAIClient(OPENAI_API_KEY)
+    # With MML_CASSETTE set, every call is recorded to (or replayed from) a cassette file
+    return cassette.from_env(client)
+
+llm.set_backend(api_client())
+
+# API calls from this browser session queue as one session in fair_share (the process-wide limiter).
+# Each script run has its own thread, so this holds for the whole run and the workers it starts.
+fair_share.set_session(st.session_state.setdefault("session_id", uuid.uuid4().hex[:8]))
+
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+PROJECTED_ONE_PAGER_TOKENS = 350                    # Six paragraphs of <= 35 words
+REJOIN_GRACE = 5.0                                  # Seconds a stopped script run has to rejoin its document job
+FINAL_POLL_INTERVAL = 2.0                           # Seconds between checks for a final version generating in the background
+
 # === Utilities ===
-def read_minutes(file_path):
-    doc = Document(file_path)
-    return "\n".join(p.text for p in doc.paragraphs if p.text.strip())
-
-def get_day_suffix(day):
-    if 11 <= day <= 13:
-        return "th"
-    last_digit = day % 10
-    return {1: "st", 2: "nd", 3: "rd"}.get(last_digit, "th")
-
-def convert_when_to_date():
-    target = datetime.today() + timedelta(weeks=4)
-    day = target.day
-    suffix = get_day_suffix(day)
-    return f"{target.strftime('%B')} {day}{suffix}"
-
-def extract_json_from_response(content):
-    match = re.search(r"\[\s*\{.*?\}\s*\]", content, re.DOTALL)
-    if match:
-        try:
-            return json.loads(match.group(0))
-        except json.JSONDecodeError:
-            return []
-    return []
-
-# === Prompt Template ===
-def build_prompt(minutes, company_name):
-    return f"""
-You are a professional business strategist who has just run a workshop for a business called "{company_name}". Below is the capture of their business planning workshop.
-
-All writing should use British English spelling and conventions. Where appropriate, expand upon the ideas captured during the workshop to ensure clarity, completeness, and usefulness.
-
-Your task is to create a structured Action Plan with the following columns:
-- Priority
-- What
-- Why
-- How
-- When
-- Success Criteria
-
-Order the actions by priority:
-- Red: High Priority
-- Yellow: Medium
-- Green: Low
-
-Before generating the actions:
-- Read the workshop capture below
-- Extract the business's **key focus areas** (they may be labelled "Focus Areas", "Actions", or "Action Plan")
-- Then generate **one action per focus area**, ordered by priority (high first, low last)
-- If fewer than 6 focus areas are found, add additional actions based on any other important themes or needs identified in the workshop (to ensure at least 6 total actions are included)
-
-Instructions:
-- The “How” field should use **concise bullet points**, each a single sentence (no full paragraphs)
-- The “When” field should use approximate default timeframes like “in 2 weeks” or “in 1 month” if no clear deadline is found in the minutes
-- The “Success Criteria” should describe how to know the action was completed successfully
-
-Return the result as a list of Python dictionaries, one per row, like this:
-[
-  {{
-    "Priority: "...",
-    "What": "...",
-    "Why": "...",
-    "How": ["...bullet point...", "...bullet point..."],
-    "When": "...",
-    "Success Criteria": "..."
-  }},
-  ...
-]
-
-Workshop Capture:
-\"\"\"
-{minutes}
-\"\"\"
-"""
+# Refused calls (ledger budgets) end the action with a message instead of a traceback
+@contextmanager
+def budget_errors():
+    try:
+        yield
+    except ledger.BudgetExceeded as e:
+        st.error(f"💸 Budget reached: {e}")
+        st.stop()
+
+# Queue position while this session's calls wait for API capacity behind other sessions
+def queue_message(queue):
+    return (f"⏳ Waiting for API capacity: {queue['in_flight']}/{queue['max_in_flight']} calls in flight, "
+            f"{queue['sessions_ahead']} other session(s) ahead of you")
+
+@contextmanager
+def queue_notice():
+    notice = st.empty()
+
+    def show(queue):
+        if queue is None:
+            notice.empty()
+        else:
+            notice.info(queue_message(queue))
+
+    with fair_share.wait_notice(show):
+        yield
+
+def failed_sections_warning(failed):
+    if failed:
+        st.warning(f"⚠️ {len(failed)} section(s) failed or timed out and are marked in the document: "
+                   f"{', '.join(failed)}. Generate again to regenerate only those sections.")
+
+def spend_report(run_id, projected=None):
+    actual = f"Spend ${ledger.run_spend(run_id):.4f}"
+    if projected is not None:
+        actual += f" (projected ${projected:.4f})"
+    return f"{actual} · {llm.cache_report(run_id)}"
+
+# Hotspots of a profiled run (MML_PROFILE or the admin toggle), nothing otherwise
+def profile_report(run_id):
+    result = profiling.result(run_id)
+    if result is None:
+        return
+    with st.expander(f"🔬 Profile: {result['wall_s']:.2f}s wall, {result['cpu_s']:.2f}s CPU, "
+                     f"{result['wait_s']:.2f}s waiting for API calls, {result['peak_mb']:.1f} MB peak traced"):
+        st.caption("Top functions by time spent in the function itself")
+        st.dataframe(result["hotspots"], hide_index=True)
+        st.caption("Top allocations, from the snapshot nearest the memory peak")
+        st.dataframe(result["allocations"], hide_index=True)
+        with open(result["pstats_path"], "rb") as f:
+            st.download_button("Download .pstats", f.read(), file_name=os.path.basename(result["pstats_path"]),
+                               key=f"pstats-{run_id}")
+
+# Draft / final versions of a run kept in session state
+def show_run_versions(run_key):
+    run = st.session_state.get(run_key)
+    if run is None:
+        return
+    # While the final version generates, this block reruns on its own and swaps it in once it is ready
+    polling = run.finalizing
+    st.fragment(run_every=FINAL_POLL_INTERVAL if polling else None)(run_versions)(run_key, polling)
+
+def run_versions(run_key, polling):
+    # A fragment rerun doesn't run the top of the script, which sets the session finalize_in_background copies
+    with fair_share.session_scope(st.session_state["session_id"]):
+        run = st.session_state[run_key]
+        if polling and not run.finalizing:
+            st.rerun()                              # Final version (or its error) is in, rerun the app to stop polling
+
+        latest = run.latest()
+        st.caption(spend_report(run.run_id))
+        profile_report(run.run_id)
+        failed_sections_warning(run.failed_sections())
+        st.download_button(
+            label=f"📄 Download {latest['kind'].title()} (v{latest['version']})",
+            data=latest["data"],
+            file_name=latest["filename"],
+            mime=DOCX_MIME,
+            key=f"{run_key}-{run.run_id}-v{latest['version']}")
+
+        if run.finalizing:
+            st.info("⏳ Final version is generating in the background, it will replace the draft when ready.")
+        elif run.error:
+            st.error(f"Final version failed: {run.error}")
+        elif not run.is_final():
+            if st.button("Finalize (full quality)", key=f"{run_key}-finalize"):
+                # Built from the draft's own inputs, whatever the page shows now
+                finalize_in_background(run, run.build_final, run.final_filename)
+                st.rerun()
+
+# Background work started before any button is pressed
+def speculative_jobs(minutes, company_name, digest=None):
+    def own_run(generate):
+        # Each job records under the run Speculation gives it, taken over by the document that uses its result
+        def job(cancel_token, status_area, run_id):
+            with llm.run_scope(run_id, company=company_name, doc_type="speculation"):
+                return generate(cancel_token, status_area)
+        return job
+
+    jobs = {
+        "strategy": own_run(lambda cancel_token, status_area: generate_strategy_sections(
+            minutes, company_name, status_area, cancel_token=cancel_token, digest=digest)),
+    }
+    # With a digest the one-pager is rendered straight from it, nothing to pre-generate
+    if digest is None:
+        jobs["one_pager"] = own_run(lambda cancel_token, status_area: generate_combined_summary(
+            minutes, company_name, cancel_token=cancel_token))
+    return jobs
+
+# Starts speculation once the inputs have settled. Reruns on its own until then, and keeps the status current
+@st.fragment(run_every=speculation.SETTLE_SECONDS)
+def show_speculation(minutes, company_name, digest, speculation_key):
+    # A fragment rerun doesn't run the top of the script, which sets the session
+    with fair_share.session_scope(st.session_state["session_id"]):
+        spec = speculation.speculate(st.session_state, speculation_key,
+                                     speculative_jobs(minutes, company_name, digest))
+    if spec is not None:
+        st.caption(f"One-Pager: {spec.status('one_pager')} · Strategy Report: {spec.status('strategy')}")
+    elif speculation.limit_reached(st.session_state):
+        st.caption("Background generation limit reached for this session.")
+    else:
+        st.caption("Background generation starts once the inputs stop changing.")
+
+# Result of a speculative job, waited for on the document job's thread (with its progress and cancel button).
+# A result that is used brings its spend along to the document's run, so the spend caption includes it.
+def speculative_result(spec, name, job):
+    result = spec.result(name, job, job.cancel_token) if spec is not None else None
+    if result is not None:
+        llm.adopt_run(spec.run_ids[name], llm.current_run())
+    return result
+
+# Documents being generated right now, shared by every session in this server process
+@st.cache_resource
+def document_jobs():
+    return single_flight.Group()
+
+# Sections finished by cancelled or partly failed strategy reports: document key -> {heading: content},
+# reused by the next attempt so only the missing sections are generated
+@st.cache_resource
+def kept_sections():
+    return {}
+
+def cancel_generation(subscription, doc_type):
+    if subscription.job.done():
+        return                                      # Finished before the click got here, nothing to cancel
+    subscription.leave()
+    st.session_state["cancelled"] = doc_type
+
+# Generate a document once for identical requests in flight (a double-click, two colleagues on the same minutes).
+# build(job, finished_sections) runs on the job's own thread, so a rerun doesn't kill it; callers relay its progress.
+# Returns (data, run_id): the run the calls were recorded under, the job owner's when this caller joined it.
+def generate_shared(doc_type, minutes, company_name, build, *options, status_area=None) -> tuple:
+    key = speculation.inputs_key(minutes, company_name, doc_type, prompt_version(doc_type), *options)
+    profile = profiling.PROFILE_ENABLED or st.session_state.get("profile_runs", False)
+
+    def run(job):
+        job.run_id = llm.current_run()
+        # Queue position goes through the job too: this thread can't touch the caller's Streamlit elements
+        waiting = {}
+
+        def show(queue):
+            if queue is not None:
+                waiting.setdefault("progress", job.progress)
+                job.text(queue_message(queue))
+            elif "progress" in waiting:
+                job.text(waiting.pop("progress"))
+
+        # build fills `kept` in place as sections finish, so they survive a cancel, an error or failed sections
+        kept = kept_sections().setdefault(key, {})
+        with fair_share.wait_notice(show), profiling.profile_run(llm.current_run(), doc_type, enabled=profile):
+            data = build(job, kept)
+        if not runs.failed_sections(llm.current_run()):
+            kept_sections().pop(key, None)
+        return data
+
+    subscription, joined = document_jobs().submit(key, run)
+    if joined:
+        st.info("🔗 An identical document is already being generated, waiting for it instead of starting again.")
+    # Only shown while waiting, cleared once the document is in
+    cancel_area = st.empty()
+    cancel_area.button("⏹ Cancel", key=f"cancel-{doc_type}", on_click=cancel_generation,
+                       args=(subscription, doc_type))
+    try:
+        data = subscription.wait(status_area or st.empty())
+    except cancellation.Cancelled:
+        st.warning("Generation was cancelled.")
+        st.stop()
+    except BaseException:
+        # Script run stopped (cancel button, another rerun, session closed): stop waiting for the document,
+        # unless the next run joins it again in time (a double-click)
+        threading.Timer(REJOIN_GRACE, subscription.leave).start()
+        raise
+    cancel_area.empty()
+    if status_area:
+        status_area.text("")
+    return data, subscription.job.run_id
+
+# Changes whenever a document's prompts do, so edited prompts never join an older job
+def prompt_version(doc_type):
+    if doc_type == "strategy_report":
+        return prompt_registry.get_registry().version
+    instructions = {"one_pager": ONE_PAGER_INSTRUCTIONS, "action_plan": ACTION_PLAN_INSTRUCTIONS}[doc_type]
+    return hashlib.sha256(instructions.encode("utf-8")).hexdigest()[:12]
+
+# Projected cost of each document from local token counts (full minutes, no API calls)
+@st.cache_data(show_spinner=False, max_entries=8)
+def projected_costs(minutes, company_name):
+    strategy = prompt_tokens.section_report(minutes, company_name, prompt_registry.get_registry())
+
+    one_pager_route = routing.route_for_document("one_pager")
+    one_pager_messages = build_one_pager_prompt(minutes, company_name)
+    action_route = routing.route_for_document("action_plan")
+    action_messages = build_prompt(minutes, company_name)
+    return {
+        "strategy_report": strategy["cost_cached"],
+        "one_pager": routing.estimate_cost(one_pager_route["model"],
+                                           token_count.count_messages(one_pager_messages, one_pager_route["model"]),
+                                           PROJECTED_ONE_PAGER_TOKENS),
+        # max_tokens is the ceiling, so this is an upper bound
+        "action_plan": routing.estimate_cost(action_route["model"],
+                                             token_count.count_messages(action_messages, action_route["model"]),
+                                             action_route["max_tokens"]),
+    }
 
 # === Streamlit UI ===
 # Create a password input field
 password = st.text_input("🔒 Enter password to access the app:", type="password")
 
 # Check if password is correct
-if password != CORRECT_PASSWORD:
+if password not in (CORRECT_PASSWORD, ADMIN_PASSWORD):
     st.warning("Access denied. Please enter the correct password to continue.")
     st.stop()
 
+if password == ADMIN_PASSWORD:
+    st.sidebar.toggle("🔬 Profile generation runs", key="profile_runs",
+                      help="Wraps this session's generations in cProfile and tracemalloc and shows the hotspots "
+                           f"under each document. Profiles are saved in {profiling.PROFILE_DIR}.")
+
 st.title("📋 Workshop Document Generator")
 st.write("Upload a `.docx` minutes document and choose a document to generate.")
 
+cancelled = st.session_state.pop("cancelled", None)
+if cancelled:
+    kept = " Finished sections are kept and reused if you generate it again." if cancelled == "strategy_report" else ""
+    st.warning(f"⏹ {cancelled.replace('_', ' ').title()} generation cancelled.{kept}")
+
 company_name = st.text_input("Company name", placeholder="e.g., Pal's Pickling Plant")
 uploaded_file = st.file_uploader("Upload workshop minutes (.docx)", type=["docx"])
 
@@ -123,26 +323,45 @@ if uploaded_file and company_name:
 
     minutes = read_minutes(minutes_path)
 
-    st.header("🧩 Generate Action Plan")
-    if st.button("Generate Action Plan"):
-        with st.spinner("Generating Action Plan..."):
-            prompt = build_prompt(minutes, company_name)
-            response = openai.ChatCompletion.create(
-                model=MODEL,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3,
-                max_tokens=1500
-            )
+    # Very long captures are condensed (map-reduce) so they fit alongside the instructions
+    with queue_notice(), st.spinner("Reading minutes..."):
+        minutes = prepare_minutes(minutes)
+
+    # Opt-in: extract the key facts once per upload and prompt with those instead of the full minutes
+    digest = None
+    if st.checkbox("📉 Use a shared minutes digest (fewer tokens)",
+                   help="Extracts vision, mission, customers, focus areas etc. once, then every document "
+                        "is generated from that digest plus targeted excerpts of the minutes."):
+        with queue_notice(), st.spinner("Extracting minutes digest..."):
+            digest = minutes_digest.get_digest(minutes, company_name)
+        if digest is None:
+            st.caption("Digest extraction failed, using the full minutes.")
 
-            content = response['choices'][0]['message']['content']
-            raw_rows = extract_json_from_response(content)
+    # Opt-in: start generating once the inputs are known and have stopped changing
+    speculation_key = speculation.inputs_key(minutes, company_name, digest is not None)
+    if st.checkbox("⚡ Pre-generate documents in the background",
+                   help="Starts the One-Pager and Strategy Report now so the buttons below return faster. "
+                        f"Limited to {speculation.MAX_SPECULATIONS_PER_SESSION} uploads per session."):
+        show_speculation(minutes, company_name, digest, speculation_key)
+    else:
+        speculation.cancel(st.session_state)
+    spec = speculation.running(st.session_state, speculation_key)
 
-            for row in raw_rows:
-                row["When"] = convert_when_to_date()
+    projected = projected_costs(minutes, company_name)
+    estimated = "" if token_count.exact() else " (estimated token counts)"
 
+    st.header("🧩 Generate Action Plan")
+    st.caption(f"Projected cost: up to ${projected['action_plan']:.4f}{estimated}")
+    if st.button("Generate Action Plan"):
+        with budget_errors(), st.spinner("Generating Action Plan..."):
             timestamp = datetime.now().strftime("%Y%m%d_%H%M")
             action_filename = f"{company_name} - Action Plan - {timestamp}.docx"
-            docx_buffer = write_action_plan_docx(action_filename, raw_rows)
+            with llm.run_scope(company=company_name, doc_type="action_plan"):
+                docx_buffer, usage_run = generate_shared(
+                    "action_plan", minutes, company_name,
+                    lambda job, _: action_plan_docx(minutes, company_name, action_filename, digest,
+                                                    job.cancel_token).getvalue(),
+                    digest is not None)
 
             st.download_button(
                 label="📄 Download Action Plan",
@@ -151,33 +370,101 @@ if uploaded_file and company_name:
                 mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document")
 
         st.success(f"✅ Action Plan Generated as: {action_filename}")
+        st.caption(spend_report(usage_run, projected["action_plan"]))
+        profile_report(usage_run)
 
     st.header("📄 Generate Strategy Report")
+    st.caption(f"Projected cost: ${projected['strategy_report']:.4f}{estimated}")
     if st.button("Generate Strategy Report"):
         status_area = st.empty()
-        with st.spinner("Generating Strategy Report..."):
+        with budget_errors(), st.spinner("Generating Strategy Report..."):
             timestamp = datetime.now().strftime("%Y%m%d_%H%M")
             strategy_filename = f"{company_name} - Strategy Report - {timestamp}.docx"
-            docx_buffer2 = generate_strategy_docx(minutes, strategy_filename, company_name, status_area)
+            with llm.run_scope(company=company_name, doc_type="strategy_report"):
+                docx_buffer2, usage_run = generate_shared(
+                    "strategy_report", minutes, company_name,
+                    lambda job, finished: generate_strategy_docx(
+                        minutes, strategy_filename, company_name, job,
+                        section_contents=speculative_result(spec, "strategy", job),
+                        digest=digest, cancel_token=job.cancel_token, finished_sections=finished).getvalue(),
+                    "final", digest is not None, status_area=status_area)
             st.download_button(
                 label="📄 Download Strategy Report",
                 data=docx_buffer2,
                 file_name=strategy_filename,
                 mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document")
-            status_area.text("")
         st.success(f"📄 Strategy Report Generated as: {strategy_filename}")
+        failed_sections_warning(runs.failed_sections(usage_run))
+        st.caption(spend_report(usage_run, projected["strategy_report"]))
+        profile_report(usage_run)
+
+    if st.button("Quick Draft Strategy Report"):
+        status_area = st.empty()
+        with budget_errors(), st.spinner("Generating Draft..."):
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M")
+            draft_filename = f"{company_name} - Strategy Report (Draft) - {timestamp}.docx"
+            final_filename = f"{company_name} - Strategy Report - {timestamp}.docx"
+            with llm.run_scope(company=company_name, doc_type="strategy_report"):
+                draft_data, draft_run = generate_shared(
+                    "strategy_report", minutes, company_name,
+                    lambda job, finished: generate_strategy_docx(
+                        minutes, draft_filename, company_name, job, mode="draft", digest=digest,
+                        cancel_token=job.cancel_token, finished_sections=finished).getvalue(),
+                    "draft", digest is not None, status_area=status_area)
+            # A joined draft belongs to the run that generated it
+            run = Run(company_name, "strategy_report", draft_run,
+                      build_final=partial(generate_strategy_docx, minutes, final_filename, company_name,
+                                          digest=digest),
+                      final_filename=final_filename)
+            run.add_version("draft", draft_data, draft_filename)
+            st.session_state["strategy_run"] = run
+
+    show_run_versions("strategy_run")
 
     st.header("📄 Generate One-Pager")
+    st.caption(f"Projected cost: ${projected['one_pager']:.4f}{estimated}")
     if st.button("Generate One-Pager"):
-        with st.spinner("Generating One-Pager..."):
+        with budget_errors(), st.spinner("Generating One-Pager..."):
             timestamp = datetime.now().strftime("%Y%m%d_%H%M")
             one_pager_filename = f"{company_name} - One-Pager - {timestamp}.docx"
-            docx_buffer2 = generate_one_pager_docx(minutes, one_pager_filename, company_name)
+            with llm.run_scope(company=company_name, doc_type="one_pager"):
+                docx_buffer2, usage_run = generate_shared(
+                    "one_pager", minutes, company_name,
+                    lambda job, _: generate_one_pager_docx(minutes, one_pager_filename, company_name,
+                                                           one_pager_text=speculative_result(spec, "one_pager", job),
+                                                           digest=digest,
+                                                           cancel_token=job.cancel_token).getvalue(),
+                    "final", digest is not None)
             st.download_button(
                 label="📄 Download One-Pager",
                 data=docx_buffer2,
                 file_name=one_pager_filename,
                 mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document")
         st.success(f"📄 One-Pager Generated as: {one_pager_filename}")
+        st.caption(spend_report(usage_run, projected["one_pager"]))
+        profile_report(usage_run)
+
+    if st.button("Quick Draft One-Pager"):
+        with budget_errors(), st.spinner("Generating Draft..."):
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M")
+            draft_filename = f"{company_name} - One-Pager (Draft) - {timestamp}.docx"
+            final_filename = f"{company_name} - One-Pager - {timestamp}.docx"
+            with llm.run_scope(company=company_name, doc_type="one_pager"):
+                draft_data, draft_run = generate_shared(
+                    "one_pager", minutes, company_name,
+                    lambda job, _: generate_one_pager_docx(minutes, draft_filename, company_name, mode="draft",
+                                                           digest=digest, cancel_token=job.cancel_token).getvalue(),
+                    "draft", digest is not None)
+            run = Run(company_name, "one_pager", draft_run,
+                      build_final=partial(generate_one_pager_docx, minutes, final_filename, company_name,
+                                          digest=digest),
+                      final_filename=final_filename)
+            run.add_version("draft", draft_data, draft_filename)
+            st.session_state["one_pager_run"] = run
+
+    show_run_versions("one_pager_run")
+else:
+    # File removed or company name cleared: nothing left to pre-generate for
+    speculation.cancel(st.session_state)
 
 # streamlit run app.py
\ No newline at end of file
@@ -0,0 +1,143 @@
+"""
+Per-call overhead of the API clients.
+
+Starts a local HTTP/1.1 server that answers /chat/completions with a canned
+response (optionally after --latency seconds), then makes the same calls
+through:
+ - openai-0.28: the legacy openai.ChatCompletion.create module API
+ - httpx-per-call: a new connection for every call (no shared session)
+ - pooled: api_client.OpenAIClient, one keep-alive pool
+ - pooled-async: OpenAIClient.achat_completion under asyncio
+Sequential calls show connection setup cost per call; --workers runs the same
+calls from a thread pool (or concurrently under asyncio).
+
+    python -m benchmarks.bench_client --calls 300 --workers 8
+
+The local server is plain HTTP, so this understates the saving against the
+real API, where every new connection also pays a TLS handshake.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+from api_client import OpenAIClient
+
+RESPONSE = json.dumps({
+    "id": "chatcmpl-bench", "object": "chat.completion", "model": "gpt-4o-mini",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "Benchmark response."},
+                 "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 10, "completion_tokens": 3, "total_tokens": 13},
+}).encode("utf-8")
+REQUEST = {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "Say something."}], "max_tokens": 5}
+
+
+def start_server(latency):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"               # Keep-alive
+        disable_nagle_algorithm = True              # Headers and body are separate writes
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if latency:
+                time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(RESPONSE)))
+            self.end_headers()
+            self.wfile.write(RESPONSE)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def openai_legacy(base_url):
+    import openai
+    openai.api_key = "bench"
+    openai.api_base = base_url
+    return lambda: openai.ChatCompletion.create(**REQUEST)
+
+
+def httpx_per_call(base_url):
+    def call():
+        with httpx.Client(base_url=base_url, headers={"Authorization": "Bearer bench"}) as client:
+            return client.post("/chat/completions", json=REQUEST).json()
+    return call
+
+
+def pooled(base_url):
+    client = OpenAIClient("bench", base_url=base_url)
+    return lambda: client(REQUEST)
+
+
+def time_calls(call, calls, workers) -> list:
+    def timed(_):
+        start = time.perf_counter()
+        call()
+        return time.perf_counter() - start
+
+    call()                                          # Warm up (imports, first connection)
+    if workers <= 1:
+        return [timed(i) for i in range(calls)]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(timed, range(calls)))
+
+
+def time_async(base_url, calls, workers) -> list:
+    async def run():
+        client = OpenAIClient("bench", base_url=base_url)
+        semaphore = asyncio.Semaphore(max(1, workers))
+
+        async def timed():
+            async with semaphore:
+                start = time.perf_counter()
+                await client.achat_completion(REQUEST)
+                return time.perf_counter() - start
+
+        await client.achat_completion(REQUEST)
+        results = await asyncio.gather(*(timed() for _ in range(calls)))
+        await client.aclose()
+        return results
+
+    return asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-call overhead of API clients.")
+    parser.add_argument("--calls", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=1, help="Concurrent callers (threads / async tasks)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Server-side delay per call (s)")
+    args = parser.parse_args()
+
+    server, base_url = start_server(args.latency)
+    clients = {"openai-0.28": openai_legacy, "httpx-per-call": httpx_per_call, "pooled": pooled}
+
+    print(f"{args.calls} calls, {args.workers} worker(s), server latency {args.latency * 1000:.0f} ms")
+    print(f"{'client':16} {'total s':>8} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for name in list(clients) + ["pooled-async"]:
+        start = time.perf_counter()
+        if name == "pooled-async":
+            latencies = time_async(base_url, args.calls, args.workers)
+        else:
+            latencies = time_calls(clients[name](base_url), args.calls, args.workers)
+        total = time.perf_counter() - start
+        latencies.sort()
+        print(f"{name:16} {total:>8.2f} {statistics.mean(latencies) * 1000:>8.2f} "
+              f"{latencies[len(latencies) // 2] * 1000:>8.2f} {latencies[int(len(latencies) * 0.95)] * 1000:>8.2f}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Measure map-reduce condensing of very long minutes (condense_minutes.py).
+
+Builds a synthetic ~100k-word workshop capture with ***Heading*** blocks, the
+Business Structure Mapping anchor and focus-area lists, then condenses it
+against the local fake LLM. Reports call counts, token reduction, wall time and
+checks that the verbatim blocks survived.
+
+    python -m benchmarks.bench_condense --words 100000 --latency 2.0
+"""
+import argparse
+import random
+import time
+
+import llm
+import condense_minutes
+from fake_llm import FakeLLM
+
+VOCABULARY = ("customer growth market product service pricing team hiring cashflow marketing brand "
+              "supplier partner channel online retail wholesale margin cost revenue subscription "
+              "community training quality delivery logistics website social referral funding").split()
+
+
+def synthetic_minutes(words=100_000, seed=1) -> str:
+    rng = random.Random(seed)
+    paragraphs = []
+    written = 0
+    custom = 0
+    while written < words:
+        roll = rng.random()
+        if roll < 0.01:
+            custom += 1
+            paragraphs.append(f"***Custom Topic {custom}***")
+            paragraphs.append(f"Notes captured under custom topic {custom}.")
+        elif roll < 0.015:
+            paragraphs.append("Focus Areas:")
+            paragraphs.extend(f"Improve {rng.choice(VOCABULARY)} {rng.choice(VOCABULARY)}" for _ in range(5))
+        else:
+            length = rng.randint(40, 120)
+            paragraphs.append(" ".join(rng.choice(VOCABULARY) for _ in range(length)).capitalize() + ".")
+            written += length
+        if written > words // 2 and "Business Structure Mapping" not in paragraphs:
+            paragraphs.append("Business Structure Mapping")
+    return "\n".join(paragraphs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark map-reduce condensing of long minutes.")
+    parser.add_argument("--words", type=int, default=100_000)
+    parser.add_argument("--latency", type=float, default=2.0, help="Median fake LLM latency per call (s)")
+    parser.add_argument("--jitter", type=float, default=0.3)
+    args = parser.parse_args()
+
+    minutes = synthetic_minutes(args.words)
+    fake = FakeLLM(latency=args.latency, jitter=args.jitter, seed=1)
+    llm.set_backend(fake)
+
+    start = time.perf_counter()
+    segments = condense_minutes.split_segments(minutes)
+    split_seconds = time.perf_counter() - start
+
+    stats = {}
+    start = time.perf_counter()
+    condensed = condense_minutes.condense(minutes, stats=stats)
+    total_seconds = time.perf_counter() - start
+
+    headings = [p for p in minutes.split("\n") if p.startswith("***")]
+    missing = [h for h in headings if h not in condensed]
+    anchor_kept = "Business Structure Mapping" in condensed
+
+    print(f"Input:            {len(minutes.split()):,} words, ~{stats['input_tokens']:,} tokens")
+    print(f"Segments:         {len(segments)} ({stats['verbatim_blocks']} verbatim)")
+    print(f"Split time:       {split_seconds * 1000:.1f} ms")
+    print(f"Map calls:        {stats['map_calls']} ({condense_minutes.MAP_WORKERS} in parallel)")
+    print(f"Reduce rounds:    {stats['reduce_rounds']}")
+    print(f"Fake LLM calls:   {fake.calls}")
+    print(f"Output:           ~{stats['output_tokens']:,} tokens "
+          f"({stats['output_tokens'] / stats['input_tokens']:.1%} of input)")
+    print(f"Wall time:        {total_seconds:.1f} s at {args.latency}s median latency")
+    print(f"Verbatim kept:    {len(headings) - len(missing)}/{len(headings)} headings, anchor {'kept' if anchor_kept else 'LOST'}")
+
+
+if __name__ == "__main__":
+    main()
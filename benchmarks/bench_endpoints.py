@@ -0,0 +1,75 @@
+"""
+Throughput of an endpoint pool as keys are added (endpoint_pool.py).
+
+Each endpoint is a FakeLLM behind its own per-key limits (--rpm and
+--max-in-flight), so a single key saturates the way a real project key does.
+The same burst of calls is sent through pools of 1, 2, 4 ... endpoints from
+--workers threads; throughput should grow with the number of keys until the
+workers are the limit. --error-rate makes every endpoint fail some calls,
+to show ejection and retry on the other keys.
+
+    python -m benchmarks.bench_endpoints --calls 200 --workers 32 --latency 0.5
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import endpoint_pool
+from endpoint_pool import Endpoint, EndpointPool
+from fake_llm import FakeLLM
+
+REQUEST = {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": "Summarise the workshop."}],
+           "max_tokens": 200}
+
+
+def run(pool, calls, workers):
+    def timed(_):
+        start = time.perf_counter()
+        try:
+            pool(REQUEST)
+            return time.perf_counter() - start, None
+        except Exception as e:
+            return time.perf_counter() - start, e
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(timed, range(calls)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark endpoint pool throughput against the number of keys.")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=32, help="Concurrent callers")
+    parser.add_argument("--endpoints", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--latency", type=float, default=0.5, help="Median fake LLM latency per call (s)")
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--rpm", type=int, default=None, help="Requests per minute per endpoint")
+    parser.add_argument("--max-in-flight", type=int, default=4, help="Concurrent calls per endpoint")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of calls each endpoint fails")
+    args = parser.parse_args()
+
+    endpoint_pool.EJECT_SECONDS = min(endpoint_pool.EJECT_SECONDS, args.latency * 4)  # Short run, come back soon
+
+    print(f"{args.calls} calls, {args.workers} workers, latency {args.latency * 1000:.0f} ms, "
+          f"per endpoint: {args.max_in_flight} in flight, rpm {args.rpm or 'unlimited'}")
+    print(f"{'endpoints':>9} {'total s':>8} {'calls/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}  calls per endpoint")
+    for count in args.endpoints:
+        pool = EndpointPool([
+            Endpoint(f"key-{i + 1}", FakeLLM(latency=args.latency, jitter=args.jitter,
+                                            error_rate=args.error_rate, seed=i),
+                     rpm=args.rpm, max_in_flight=args.max_in_flight)
+            for i in range(count)
+        ])
+        start = time.perf_counter()
+        results = run(pool, args.calls, args.workers)
+        total = time.perf_counter() - start
+        latencies = sorted(seconds for seconds, _ in results)
+        errors = sum(1 for _, error in results if error is not None)
+        spread = " ".join(str(endpoint["calls"]) for endpoint in pool.status())
+        print(f"{count:>9} {total:>8.2f} {args.calls / total:>8.1f} "
+              f"{statistics.median(latencies) * 1000:>8.0f} {latencies[int(len(latencies) * 0.95)] * 1000:>8.0f} "
+              f"{errors:>7}  {spread}")
+
+
+if __name__ == "__main__":
+    main()
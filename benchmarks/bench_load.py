@@ -0,0 +1,214 @@
+"""
+Concurrent-user load test of the document pipeline against the fake LLM.
+
+Simulates consultants sharing one app.py server process. Each user uploads
+a minutes .docx (read back with docx_stream, condensed if needed), generates
+documents through the same functions the app calls, and takes the bytes as
+the download. Every user is its own fair_share session and llm run, so the
+process-wide limiter, coalescing, the ledger and section deadlines all take
+part as they do in the app. Each --users level is run in turn and reported
+with document time p50 / p95 / p99, throughput, error rate, CPU and peak RSS.
+
+    python -m benchmarks.bench_load --users 1 4 16 32 --latency 1.5 --jitter 0.5
+
+The fake LLM's latency is lognormal (median --latency, sigma --jitter) plus
+--seconds-per-token of decode time, and --error-rate makes calls fail. Users
+get their own minutes and company, so nothing is coalesced unless
+--same-minutes. The ledger and section stats go to a temporary directory.
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+import fair_share
+import ledger
+import llm
+import runs
+import section_stats
+from benchmarks.bench_condense import synthetic_minutes
+from fake_llm import FakeLLM
+
+DOCUMENTS = ("strategy_report", "one_pager", "action_plan")
+RSS_SAMPLE_INTERVAL = 0.05                          # Seconds between peak memory samples
+
+
+# ----------- Measuring -----------
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # High-water mark, not current
+
+
+class PeakMemory:
+    """Highest RSS seen while the block runs, sampled on a background thread."""
+
+    def __enter__(self):
+        self.peak = rss_bytes()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(RSS_SAMPLE_INTERVAL):
+            self.peak = max(self.peak, rss_bytes())
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_bytes())
+
+
+def percentile(values, pct) -> float:
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(pct * len(values)))]
+
+
+# ----------- Simulated user -----------
+def write_minutes_docx(path, words, seed):
+    from docx import Document
+    doc = Document()
+    for paragraph in synthetic_minutes(words, seed).split("\n"):
+        doc.add_paragraph(paragraph)
+    doc.save(path)
+
+
+def action_plan_bytes(minutes, company_name) -> bytes:
+    from generate_action_plan import action_plan_docx
+    return action_plan_docx(minutes, company_name, "action_plan.docx").getvalue()
+
+
+class QuietStatus:
+    """Status area that drops progress messages (the generators print them otherwise)."""
+
+    def text(self, message):
+        pass
+
+
+def generate_document(doc_type, minutes, company_name, mode) -> bytes:
+    from generate_one_pager import generate_one_pager_docx
+    from generate_strategy_3 import generate_strategy_docx
+
+    if doc_type == "strategy_report":
+        return generate_strategy_docx(minutes, "report.docx", company_name, QuietStatus(), mode=mode).getvalue()
+    if doc_type == "one_pager":
+        return generate_one_pager_docx(minutes, "one_pager.docx", company_name, mode=mode).getvalue()
+    return action_plan_bytes(minutes, company_name)
+
+
+def simulate_user(user, minutes_path, company_name, documents, mode, results, start_barrier):
+    from condense_minutes import prepare_minutes
+    from docx_stream import read_minutes
+
+    start_barrier.wait()
+    with fair_share.session_scope(f"load-{user}"):
+        minutes = prepare_minutes(read_minutes(minutes_path))
+        for doc_type in documents:
+            start = time.perf_counter()
+            result = {"user": user, "doc_type": doc_type, "error": None, "failed_sections": 0}
+            try:
+                with llm.run_scope(company=company_name, doc_type=doc_type) as run_id:
+                    data = generate_document(doc_type, minutes, company_name, mode)
+                result["bytes"] = len(data)
+                result["failed_sections"] = len(runs.failed_sections(run_id))
+            except Exception as e:
+                result["error"] = f"{type(e).__name__}: {e}"
+            result["seconds"] = time.perf_counter() - start
+            results.append(result)
+
+
+def run_level(users, minutes_paths, documents, mode) -> dict:
+    results = []
+    start_barrier = threading.Barrier(users + 1)
+    threads = []
+    for user in range(users):
+        # Same minutes, same company: identical prompts, as with colleagues working on one workshop
+        upload = user % len(minutes_paths)
+        threads.append(threading.Thread(target=simulate_user, name=f"user-{user}",
+                                        args=(user, minutes_paths[upload], f"Load Test Company {upload}",
+                                              documents, mode, results, start_barrier)))
+    for thread in threads:
+        thread.start()
+
+    with PeakMemory() as memory:
+        cpu_start, wall_start = time.process_time(), time.perf_counter()
+        start_barrier.wait()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+
+    times = [r["seconds"] for r in results if r["error"] is None]
+    errors = [r for r in results if r["error"] is not None]
+    return {
+        "users": users,
+        "documents": len(results),
+        "p50": percentile(times, 0.50),
+        "p95": percentile(times, 0.95),
+        "p99": percentile(times, 0.99),
+        "throughput": len(times) / wall * 60 if wall else 0.0,
+        "error_rate": len(errors) / len(results) if results else 0.0,
+        "failed_sections": sum(r["failed_sections"] for r in results),
+        "cpu": cpu / wall if wall else 0.0,
+        "peak_rss_mb": memory.peak / 2 ** 20,
+        "wall": wall,
+        "first_error": errors[0]["error"] if errors else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the document pipeline with concurrent simulated users.")
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 4, 16], help="Concurrency levels to run")
+    parser.add_argument("--documents", nargs="+", choices=DOCUMENTS, default=list(DOCUMENTS),
+                        help="Documents each user generates, in order")
+    parser.add_argument("--mode", choices=["final", "draft"], default="final")
+    parser.add_argument("--words", type=int, default=3000, help="Words of minutes per user")
+    parser.add_argument("--same-minutes", action="store_true", help="Every user uploads the same minutes")
+    parser.add_argument("--latency", type=float, default=0.5, help="Median fake LLM latency per call (s)")
+    parser.add_argument("--jitter", type=float, default=0.4, help="Sigma of the lognormal latency spread")
+    parser.add_argument("--seconds-per-token", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--max-in-flight", type=int, default=fair_share.MAX_IN_FLIGHT,
+                        help="Process-wide cap on calls in flight (0 = none)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_load_")
+    ledger.LEDGER_PATH = os.path.join(workdir, "ledger.sqlite3")
+    section_stats.STATS_PATH = os.path.join(workdir, "section_stats.json")
+    fair_share.limiter().resize(args.max_in_flight)
+    fake = FakeLLM(latency=args.latency, jitter=args.jitter, seconds_per_token=args.seconds_per_token,
+                   error_rate=args.error_rate, seed=1)
+    llm.set_backend(fake)
+
+    count = 1 if args.same_minutes else max(args.users)
+    minutes_paths = []
+    for i in range(count):
+        path = os.path.join(workdir, f"minutes_{i}.docx")
+        write_minutes_docx(path, args.words, seed=i)
+        minutes_paths.append(path)
+
+    print(f"{', '.join(args.documents)} ({args.mode}) per user · fake LLM {args.latency * 1000:.0f} ms median, "
+          f"sigma {args.jitter}, {args.error_rate:.0%} errors · {args.max_in_flight or 'unlimited'} calls in flight")
+    print(f"{'users':>5} {'docs':>5} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} {'docs/min':>9} {'errors':>7} "
+          f"{'failed sec':>10} {'CPU':>6} {'peak MB':>8}")
+    for users in args.users:
+        calls_before = fake.calls
+        level = run_level(users, minutes_paths, args.documents, args.mode)
+        print(f"{level['users']:>5} {level['documents']:>5} {level['p50']:>7.2f} {level['p95']:>7.2f} "
+              f"{level['p99']:>7.2f} {level['throughput']:>9.1f} {level['error_rate']:>7.1%} "
+              f"{level['failed_sections']:>10} {level['cpu']:>6.0%} {level['peak_rss_mb']:>8.0f}"
+              f"   ({fake.calls - calls_before} calls)")
+        if level["first_error"]:
+            print(f"      first error: {level['first_error']}")
+    print(f"Coalesced calls: {llm.hedge_stats()['coalesced']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Compare the streaming minutes reader (docx_stream) with the python-docx path.
+
+Builds a synthetic minutes .docx of roughly --size-mb megabytes (mostly
+embedded, incompressible images, plus paragraphs, headings and tables), then
+reads it with each reader in a fresh subprocess and reports wall time and peak
+RSS.
+
+    python -m benchmarks.bench_read_minutes --size-mb 50
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+READERS = {
+    "python-docx": "from docx import Document\n"
+                   "doc = Document(path)\n"
+                   "text = '\\n'.join(p.text for p in doc.paragraphs if p.text.strip())\n",
+    "docx_stream": "from docx_stream import read_minutes\n"
+                   "text = read_minutes(path)\n",
+}
+
+# Peak RSS from VmHWM: ru_maxrss carries the parent's high-water mark across exec on Linux
+CHILD = """
+import json, sys, time
+path = sys.argv[1]
+start = time.perf_counter()
+{reader}
+seconds = time.perf_counter() - start
+with open("/proc/self/status") as f:
+    peak_kb = next(int(line.split()[1]) for line in f if line.startswith("VmHWM"))
+print(json.dumps({{"seconds": seconds, "peak_rss_mb": peak_kb / 1024, "chars": len(text)}}))
+"""
+
+
+def build_minutes_docx(path, size_mb, paragraphs=20_000, tables=50):
+    from docx import Document
+    from PIL import Image
+
+    rng = random.Random(1)
+    doc = Document()
+    words = "customer growth market product pricing team cashflow brand partner channel revenue".split()
+
+    # ~3 MB per 1000x1000 noise PNG
+    image_path = os.path.join(os.path.dirname(path), "noise.png")
+    images = max(1, int(size_mb / 3))
+    per_image = paragraphs // images
+    for i in range(paragraphs):
+        if i % 500 == 0:
+            doc.add_heading(f"Workshop Topic {i // 500}", level=1)
+        doc.add_paragraph(" ".join(rng.choice(words) for _ in range(rng.randint(20, 80))))
+        if i % per_image == 0 and images:
+            Image.frombytes("RGB", (1000, 1000), os.urandom(3_000_000)).save(image_path)
+            doc.add_picture(image_path)
+            images -= 1
+        if i % (paragraphs // tables) == 0:
+            table = doc.add_table(rows=3, cols=3)
+            for cell in table._cells:
+                cell.text = rng.choice(words)
+    doc.save(path)
+    os.remove(image_path)
+
+
+def run_reader(name, path) -> dict:
+    code = CHILD.format(reader=READERS[name])
+    env = dict(os.environ, PYTHONPATH=os.getcwd())
+    output = subprocess.run([sys.executable, "-c", code, path], capture_output=True, text=True, env=env, check=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark minutes readers on a large .docx.")
+    parser.add_argument("--size-mb", type=float, default=50)
+    parser.add_argument("--paragraphs", type=int, default=20_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "minutes.docx")
+        print("Building synthetic minutes...")
+        build_minutes_docx(path, args.size_mb, args.paragraphs)
+        print(f"File size: {os.path.getsize(path) / 1e6:.1f} MB, {args.paragraphs:,} paragraphs")
+
+        for name in READERS:
+            result = run_reader(name, path)
+            print(f"{name:12} {result['seconds']:7.2f} s   peak RSS {result['peak_rss_mb']:7.1f} MB   "
+                  f"{result['chars']:,} chars")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Rendering-scale micro-benchmarks for the .docx builders.
+
+Once the API is cached or faked (cassette.py, fake_llm.py), CPU time goes to
+python-docx. This feeds synthetic content of increasing size to each renderer
+and records time (best of --repeat) and memory: the growth of peak RSS over
+one more render in a forked child. (tracemalloc can't be used, python-docx
+builds its documents in lxml, whose C allocations it doesn't see.)
+
+    strategy_sections   render_strategy_docx, n typical sections (intro, bold bullets, closing paragraph)
+    strategy_bullets    render_strategy_docx, one section with n bullets
+    strategy_bold       render_strategy_docx, one section of n paragraphs heavy with **bold** markup
+    action_plan_rows    write_action_plan_docx, n rows with four "How" bullets each
+    one_pager_sections  generate_one_pager (Composer cover page), n headings
+
+    python -m benchmarks.bench_render --sizes 10 100 1000
+    python -m benchmarks.bench_render --save-baseline render_baseline.json
+    python -m benchmarks.bench_render --baseline render_baseline.json --threshold 0.25
+
+With --baseline, exits with status 1 if any case is more than --threshold
+slower (or uses that much more memory) than the baseline; differences under
+TIME_NOISE / MEMORY_NOISE are ignored so small cases don't flap. Run from the
+repository root, the renderers load template.docx and Logo3.png from there.
+"""
+import argparse
+import json
+import multiprocessing
+import random
+import resource
+import sys
+import time
+
+from benchmarks.bench_load import rss_bytes
+
+WORDS = ("customer growth market product service pricing team hiring cashflow marketing brand supplier partner "
+         "channel online retail wholesale margin cost revenue subscription community training quality").split()
+COMPANY = "Benchmark Company"
+TIME_NOISE = 0.01                                   # Seconds of slowdown never counted as a regression
+MEMORY_NOISE = 16.0                                 # MB of growth never counted as a regression
+
+
+# ----------- Synthetic content -----------
+def sentence(rng, words=14) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def bullet(rng) -> str:
+    return f"- **{rng.choice(WORDS).title()} {rng.choice(WORDS).title()}:** {sentence(rng)}"
+
+
+def section_text(rng, bullets=6) -> str:
+    # Shaped like generated sections: intro, bold-headed bullets, closing paragraph
+    lines = [sentence(rng, 40), *(bullet(rng) for _ in range(bullets)), sentence(rng, 30)]
+    return "\n" + "\n".join(lines)
+
+
+def bold_paragraph(rng, spans=10) -> str:
+    return " ".join(f"**{rng.choice(WORDS)}** {sentence(rng, 6)}" for _ in range(spans))
+
+
+def action_rows(rng, n) -> list:
+    return [{"Priority": rng.choice(["Red", "Yellow", "Green"]),
+             "What": sentence(rng, 5),
+             "Why": sentence(rng, 20),
+             "How": [sentence(rng, 10) for _ in range(4)],
+             "When": "in 1 month",
+             "Success Criteria": sentence(rng, 15)}
+            for _ in range(n)]
+
+
+# ----------- Cases -----------
+def strategy_sections(n):
+    from strategy_docx import render_strategy_docx
+    rng = random.Random(n)
+    contents = [(f"Section {i + 1}", section_text(rng)) for i in range(n)]
+    return lambda: render_strategy_docx(contents, COMPANY)
+
+
+def strategy_bullets(n):
+    from strategy_docx import render_strategy_docx
+    rng = random.Random(n)
+    contents = [("Recommendations", "\n" + "\n".join(bullet(rng) for _ in range(n)))]
+    return lambda: render_strategy_docx(contents, COMPANY)
+
+
+def strategy_bold(n):
+    from strategy_docx import render_strategy_docx
+    rng = random.Random(n)
+    contents = [("Key Activities", "\n" + "\n".join(bold_paragraph(rng) for _ in range(n)))]
+    return lambda: render_strategy_docx(contents, COMPANY)
+
+
+def action_plan_rows(n):
+    from generate_action_plan import write_action_plan_docx
+    rng = random.Random(n)
+    rows = action_rows(rng, n)
+    # The writer rewrites "When" in place, each call gets fresh rows
+    return lambda: write_action_plan_docx("action_plan.docx", [dict(row) for row in rows])
+
+
+def one_pager_sections(n):
+    from one_pager_docx import generate_one_pager
+    rng = random.Random(n)
+    content = {f"Heading {i + 1}": sentence(rng, 35) for i in range(n)}
+    return lambda: generate_one_pager(COMPANY, content, "one_pager.docx")
+
+
+CASES = {
+    "strategy_sections": strategy_sections,
+    "strategy_bullets": strategy_bullets,
+    "strategy_bold": strategy_bold,
+    "action_plan_rows": action_plan_rows,
+    "one_pager_sections": one_pager_sections,
+}
+
+
+# ----------- Measuring -----------
+def _render_in_child(render, queue):
+    start = rss_bytes()
+    render()
+    queue.put(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 - start)
+
+
+def peak_growth(render) -> int:
+    """Bytes the peak RSS grows by while render() runs, in a forked child so runs don't share a high-water mark."""
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    child = context.Process(target=_render_in_child, args=(render, queue))
+    child.start()
+    growth = queue.get()
+    child.join()
+    return max(growth, 0)
+
+
+def measure(render, repeat) -> dict:
+    render()                                        # Warm up (imports, template load)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        buffer = render()
+        times.append(time.perf_counter() - start)
+    return {"seconds": min(times), "peak_mb": peak_growth(render) / 2 ** 20,
+            "output_kb": len(buffer.getvalue()) / 1024}
+
+
+def regressions(results, baseline, threshold) -> list:
+    found = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        for metric, noise in (("seconds", TIME_NOISE), ("peak_mb", MEMORY_NOISE)):
+            if result[metric] > base[metric] * (1 + threshold) and result[metric] - base[metric] > noise:
+                found.append(f"{key} {metric}: {result[metric]:.3f} vs baseline {base[metric]:.3f} "
+                             f"(+{result[metric] - base[metric]:.3f})")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the .docx renderers at increasing input sizes.")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case, the fastest is kept")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown / memory growth (0.25 = 25%%)")
+    parser.add_argument("--save-baseline", metavar="PATH", help="Write these results as a baseline")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    print(f"{'case':20} {'n':>6} {'seconds':>9} {'ms/item':>8} {'+RSS MB':>8} {'docx KB':>8} {'vs base':>8}")
+    results = {}
+    for case in args.cases:
+        for n in args.sizes:
+            key = f"{case}:{n}"
+            result = results[key] = measure(CASES[case](n), args.repeat)
+            base = baseline.get(key)
+            change = f"{result['seconds'] / base['seconds'] - 1:+.0%}" if base and base["seconds"] else ""
+            print(f"{case:20} {n:>6} {result['seconds']:>9.3f} {result['seconds'] / n * 1000:>8.2f} "
+                  f"{result['peak_mb']:>8.1f} {result['output_kb']:>8.0f} {change:>8}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote baseline {args.save_baseline}")
+
+    found = regressions(results, baseline, args.threshold)
+    if found:
+        print(f"Regressions over {args.threshold:.0%}:")
+        for line in found:
+            print(f"  {line}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,514 @@
+"""
+Offline bulk generation through the provider's batch API.
+
+For the nightly backlog of workshops: every minutes file in a manifest gets
+its strategy report, one-pager and action plan without interactive latency,
+at batch pricing (routing.BATCH_DISCOUNT). Each step is a command working on
+one job directory, so a batch can be submitted in the evening and collected
+the next morning:
+
+    python bulk.py compile manifest.json .cache/bulk/2026-10-19   # requests.jsonl, one line per LLM call
+    python bulk.py submit .cache/bulk/2026-10-19                  # upload it and create the batch
+    python bulk.py poll .cache/bulk/2026-10-19 --wait             # until done, then download the results
+    python bulk.py ingest .cache/bulk/2026-10-19                  # results -> one section store per run
+    python bulk.py render .cache/bulk/2026-10-19                  # documents/*.docx, no API calls
+    python bulk.py run manifest.json .cache/bulk/2026-10-19       # all of the above
+
+The manifest is a JSON list of {"minutes": "path.docx", "company": "Name"}
+(company defaults to the file name, paths are relative to the manifest).
+
+Requests are built by the same code as interactive generation (plan_sections,
+section_request, routing, section_stats budgets) from the full minutes; only
+minutes too long for the prompt are condensed first, with live calls unless
+condense_minutes already has them cached. Every result is recorded in the
+ledger at the batch price. A section whose request failed is rendered as a
+placeholder, and a section cut off by max_tokens is kept as it is (there is
+no continuation call) and counted as a truncation in section_stats.
+
+--local swaps the batch API for LocalBatchProcessor, which takes the same
+files and answers them with fake_llm.FakeLLM, so the whole flow runs offline.
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import ledger
+import llm
+import routing
+import section_stats
+from api_client import BATCH_ENDPOINT
+
+DOCUMENTS = ("strategy_report", "one_pager", "action_plan")
+POLL_INTERVAL = 60.0                                # Seconds between status checks with --wait
+FINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+LOCAL_WORKERS = 8                                   # Requests LocalBatchProcessor answers at once
+
+JOBS_FILE = "jobs.json"                             # What was compiled: runs, sections, projected cost
+REQUESTS_FILE = "requests.jsonl"                    # Batch input
+BATCH_FILE = "batch.json"                           # Latest batch status
+OUTPUT_FILE = "output.jsonl"
+ERRORS_FILE = "errors.jsonl"
+RUNS_DIR = "runs"                                   # One section store per run
+DOCUMENTS_DIR = "documents"
+
+
+# ----------- Job directory -----------
+def _path(directory, name) -> str:
+    return os.path.join(directory, name)
+
+
+def _read_json(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_json(path, data):
+    # Written whole and swapped in, pollers may be reading it
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _read_jsonl(path) -> list:
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def load_manifest(path) -> list:
+    """[{"minutes": path, "company": name}] with paths resolved and company names filled in."""
+    base = os.path.dirname(os.path.abspath(path))
+    entries = []
+    for entry in _read_json(path):
+        minutes_path = os.path.join(base, entry["minutes"])
+        company = entry.get("company") or os.path.splitext(os.path.basename(minutes_path))[0]
+        entries.append({"minutes": minutes_path, "company": company})
+    return entries
+
+
+def load_minutes(path) -> str:
+    if path.lower().endswith(".docx"):
+        import docx_stream
+        return docx_stream.read_minutes(path)
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+# ----------- Compile -----------
+def _line(custom_id, body) -> dict:
+    return {"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": body}
+
+
+def _body(messages, model, temperature, max_tokens=None) -> dict:
+    body = {"model": model, "messages": messages, "temperature": temperature}
+    if max_tokens is not None:
+        body["max_tokens"] = max_tokens
+    return body
+
+
+def document_requests(job, minutes, documents=DOCUMENTS) -> list:
+    """
+    Batch lines for one run's documents. Records on job what ingest needs to
+    put the results back together (the strategy report's sections in order).
+    """
+    import generate_strategy_3 as strategy
+    import prompt_registry
+
+    run_id, company_name = job["run"], job["company"]
+    lines = []
+
+    if "strategy_report" in documents:
+        global_prompt = strategy.build_global(company_name)
+        job["sections"] = []
+        planned = strategy.plan_sections(minutes, prompt_registry.get_registry(), strategy.SECTIONS)
+        for i, planned_section in enumerate(planned):
+            heading = planned_section[0]
+            request = strategy.section_request(planned_section, global_prompt, minutes)
+            if request is None:
+                job["sections"].append([heading, None])     # Static text, no API call
+                continue
+            custom_id = f"{run_id}:strategy_report:{i}"
+            job["sections"].append([heading, custom_id])
+            lines.append(_line(custom_id, _body(request["messages"], request["model"], request["temperature"],
+                                                section_stats.max_tokens_for(heading, request["token_limit"]))))
+
+    if "one_pager" in documents:
+        from generate_one_pager import build_prompt as build_one_pager_prompt
+        route = routing.route_for_document("one_pager")
+        lines.append(_line(f"{run_id}:one_pager", _body(build_one_pager_prompt(minutes, company_name),
+                                                        route["model"], route["temperature"],
+                                                        route.get("max_tokens"))))
+
+    if "action_plan" in documents:
+        from generate_action_plan import build_prompt as build_action_plan_prompt
+        route = routing.route_for_document("action_plan")
+        lines.append(_line(f"{run_id}:action_plan", _body(build_action_plan_prompt(minutes, company_name),
+                                                          route["model"], route["temperature"],
+                                                          route.get("max_tokens"))))
+    return lines
+
+
+def compile_batch(entries, directory, documents=DOCUMENTS) -> dict:
+    """Write the batch input for every manifest entry. Returns the jobs file contents."""
+    import token_count
+    from condense_minutes import prepare_minutes
+
+    os.makedirs(directory, exist_ok=True)
+    jobs, projected, count = [], 0.0, 0
+    with open(_path(directory, REQUESTS_FILE), "w", encoding="utf-8") as f:
+        for entry in entries:
+            minutes = prepare_minutes(load_minutes(entry["minutes"]))
+            job = {"run": uuid.uuid4().hex[:8], "company": entry["company"], "minutes": entry["minutes"],
+                   "documents": list(documents)}
+            for line in document_requests(job, minutes, documents):
+                body = line["body"]
+                projected += routing.estimate_cost(
+                    body["model"], token_count.count_messages(body["messages"], body["model"]),
+                    body.get("max_tokens") or llm.PROJECTED_COMPLETION_TOKENS, batch=True)
+                f.write(json.dumps(line) + "\n")
+                count += 1
+            jobs.append(job)
+            print(f"Compiled {entry['company']} ({job['run']})")
+
+    compiled = {"created": time.time(), "requests": count, "projected_cost": projected, "jobs": jobs}
+    _write_json(_path(directory, JOBS_FILE), compiled)
+    print(f"{count} requests for {len(jobs)} minutes file(s), projected up to ${projected:.4f} at batch pricing")
+    return compiled
+
+
+# ----------- Submit / poll -----------
+def submit(directory, client) -> dict:
+    """Upload the compiled requests and create the batch. client: api_client.OpenAIClient or LocalBatchProcessor."""
+    compiled = _read_json(_path(directory, JOBS_FILE))
+    if ledger.budgets_enabled():
+        # Raises BudgetExceeded if the day's budget can't cover the whole batch
+        ledger.settle(None, ledger.reserve(None, compiled["projected_cost"]))
+
+    file_id = client.upload_batch_file(_path(directory, REQUESTS_FILE))
+    batch = client.create_batch(file_id, metadata={"description": f"Bulk documents for {len(compiled['jobs'])} "
+                                                                  f"workshop(s)"})
+    _write_json(_path(directory, BATCH_FILE), batch)
+    print(f"Submitted batch {batch['id']} ({compiled['requests']} requests)")
+    return batch
+
+
+def _download(client, file_id, path):
+    with open(path, "wb") as f:
+        f.write(client.file_content(file_id) if file_id else b"")
+
+
+def poll(directory, client, wait=False, interval=POLL_INTERVAL) -> dict:
+    """Latest batch status, downloading the results once it has finished. wait: keep polling until then."""
+    batch = _read_json(_path(directory, BATCH_FILE))
+    while True:
+        batch = client.retrieve_batch(batch["id"])
+        _write_json(_path(directory, BATCH_FILE), batch)
+        counts = batch.get("request_counts") or {}
+        print(f"Batch {batch['id']}: {batch['status']} ({counts.get('completed', 0)}/{counts.get('total', 0)} done, "
+              f"{counts.get('failed', 0)} failed)")
+        if batch["status"] in FINAL_STATUSES or not wait:
+            break
+        time.sleep(interval)
+
+    if batch["status"] in FINAL_STATUSES:
+        # Expired / cancelled batches still return what they finished
+        _download(client, batch.get("output_file_id"), _path(directory, OUTPUT_FILE))
+        _download(client, batch.get("error_file_id"), _path(directory, ERRORS_FILE))
+        for error in (batch.get("errors") or {}).get("data") or []:
+            print(f"Batch error: {error.get('message')}")
+    return batch
+
+
+# ----------- Ingest -----------
+def _error_message(line) -> str:
+    response = line.get("response") or {}
+    error = line.get("error") or (response.get("body") or {}).get("error") or {}
+    return error.get("message") or f"Status {response.get('status_code')}"
+
+
+def load_results(directory):
+    """custom_id -> response body for the requests that succeeded, and custom_id -> error for the rest."""
+    results, errors = {}, {}
+    for line in _read_jsonl(_path(directory, OUTPUT_FILE)) + _read_jsonl(_path(directory, ERRORS_FILE)):
+        response = line.get("response") or {}
+        if response.get("status_code") == 200 and not line.get("error"):
+            results[line["custom_id"]] = response["body"]
+        else:
+            errors[line["custom_id"]] = _error_message(line)
+    return results, errors
+
+
+def ingest(directory) -> list:
+    """
+    Put each run's results back together in runs/<run>.json: the strategy
+    report's (heading, content) in report order (None = failed), the one-pager
+    and action plan text, and what failed. Runs ingested before are skipped, so
+    nothing is recorded in the ledger twice. Refuses until poll has seen the
+    batch finish and downloaded its output; a run without a single result gets
+    no store, so it can be ingested once results for it exist. Returns the
+    stores written.
+    """
+    import generate_strategy_3 as strategy
+
+    batch_path = _path(directory, BATCH_FILE)
+    status = _read_json(batch_path).get("status") if os.path.exists(batch_path) else None
+    if status not in FINAL_STATUSES or not os.path.exists(_path(directory, OUTPUT_FILE)):
+        raise RuntimeError(f"Batch in {directory} has not finished (status: {status or 'not submitted'}), "
+                           "poll it until it has before ingesting")
+
+    compiled = _read_json(_path(directory, JOBS_FILE))
+    requests = {line["custom_id"]: line["body"] for line in _read_jsonl(_path(directory, REQUESTS_FILE))}
+    results, errors = load_results(directory)
+    os.makedirs(_path(directory, RUNS_DIR), exist_ok=True)
+
+    stores = []
+    for job in compiled["jobs"]:
+        store_path = os.path.join(directory, RUNS_DIR, f"{job['run']}.json")
+        if os.path.exists(store_path):
+            print(f"{job['company']} ({job['run']}) already ingested")
+            continue
+        custom_ids = [custom_id for _, custom_id in job.get("sections", ()) if custom_id is not None]
+        custom_ids += [f"{job['run']}:{doc_type}" for doc_type in ("one_pager", "action_plan")
+                       if doc_type in job["documents"]]
+        if not any(custom_id in results for custom_id in custom_ids):
+            print(f"{job['company']} ({job['run']}) has no results in the batch output, not ingested")
+            continue
+        store = {"run": job["run"], "company": job["company"], "failed": {}}
+
+        def answer(custom_id, doc_type, section):
+            body = results.get(custom_id)
+            if body is None:
+                store["failed"][section] = errors.get(custom_id, "No result in the batch output")
+                return None
+            usage = body.get("usage") or {}
+            model = requests[custom_id]["model"]    # The response names a dated snapshot, priced by its alias
+            cached = llm.cached_tokens(body)
+            ledger.record(model=model, prompt_tokens=usage.get("prompt_tokens", 0),
+                          completion_tokens=usage.get("completion_tokens", 0), cached_tokens=cached,
+                          cost=routing.estimate_cost(model, usage.get("prompt_tokens", 0),
+                                                     usage.get("completion_tokens", 0), cached_tokens=cached,
+                                                     batch=True),
+                          run_id=job["run"], company=job["company"], doc_type=doc_type, section=section)
+            return body
+
+        if "strategy_report" in job["documents"]:
+            store["strategy_report"] = []
+            for heading, custom_id in job["sections"]:
+                content = None
+                if custom_id is None:
+                    content = strategy.assemble_section(heading, job["company"])
+                else:
+                    body = answer(custom_id, "strategy_report", heading)
+                    if body is not None:
+                        truncated = body["choices"][0].get("finish_reason") == "length"
+                        section_stats.record_output(heading, (body.get("usage") or {}).get("completion_tokens", 0),
+                                                    truncated=truncated)
+                        content = strategy.assemble_section(heading, job["company"], llm.response_text(body))
+                store["strategy_report"].append([heading, content])
+
+        for doc_type, section in (("one_pager", "One-Pager"), ("action_plan", "Action Plan")):
+            if doc_type in job["documents"]:
+                body = answer(f"{job['run']}:{doc_type}", doc_type, section)
+                store[doc_type] = llm.response_text(body).strip() if body is not None else None
+
+        _write_json(store_path, store)
+        stores.append(store)
+        failed = f", failed: {', '.join(store['failed'])}" if store["failed"] else ""
+        print(f"Ingested {job['company']} ({job['run']}){failed}")
+    return stores
+
+
+# ----------- Render -----------
+def _filename(company_name, title, timestamp, run_id) -> str:
+    # The run id keeps a company listed twice in the manifest from overwriting its own documents
+    return re.sub(r'[\\/:*?"<>|]', "_", f"{company_name} - {title} - {timestamp} - {run_id}.docx")
+
+
+def render(directory) -> list:
+    """Lay out every ingested run's documents in documents/. Returns the paths written."""
+    from generate_action_plan import extract_json_from_response, write_action_plan_docx
+    from generate_one_pager import generate_one_pager, split_one_pager_sections
+    from generate_strategy_3 import render_strategy_docx
+
+    runs_dir, documents_dir = _path(directory, RUNS_DIR), _path(directory, DOCUMENTS_DIR)
+    os.makedirs(documents_dir, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M")
+    written = []
+
+    def save(title, build):
+        path = os.path.join(documents_dir, _filename(store["company"], title, timestamp, store["run"]))
+        with open(path, "wb") as f:
+            f.write(build(path).getvalue())
+        written.append(path)
+
+    for name in sorted(os.listdir(runs_dir)):
+        store = _read_json(os.path.join(runs_dir, name))
+        company_name = store["company"]
+        if "strategy_report" in store:
+            # Failed sections are laid out as placeholders
+            save("Strategy Report", lambda path: render_strategy_docx(
+                [(heading, content) for heading, content in store["strategy_report"]], company_name))
+        if store.get("one_pager"):
+            save("One-Pager", lambda path: generate_one_pager(
+                company_name, split_one_pager_sections(store["one_pager"]), path))
+        rows = extract_json_from_response(store["action_plan"]) if store.get("action_plan") else []
+        if rows:
+            save("Action Plan", lambda path: write_action_plan_docx(path, rows))
+        elif "action_plan" in store:
+            print(f"No action plan for {company_name}: the batch returned no usable rows")
+        if store["failed"]:
+            print(f"{company_name}: {len(store['failed'])} failed, marked or left out: {', '.join(store['failed'])}")
+    print(f"Wrote {len(written)} document(s) to {documents_dir}")
+    return written
+
+
+# ----------- Local stand-in -----------
+class LocalBatchProcessor:
+    """
+    Stand-in for the batch API, with the same methods as api_client.OpenAIClient's
+    batch interface and the same file formats. Requests are answered with an
+    llm.py backend (fake_llm.FakeLLM by default) on a background thread; files
+    and batch status are kept in <directory>/local_batch, so separate submit and
+    poll commands see the same batch.
+    """
+
+    def __init__(self, directory, backend=None, workers=LOCAL_WORKERS):
+        if backend is None:
+            from fake_llm import FakeLLM
+            backend = FakeLLM()
+        self.directory = os.path.join(directory, "local_batch")
+        self.backend = backend
+        self.workers = workers
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _file(self, file_id) -> str:
+        return os.path.join(self.directory, f"{file_id}.jsonl")
+
+    def _batch_path(self, batch_id) -> str:
+        return os.path.join(self.directory, f"{batch_id}.json")
+
+    def upload_batch_file(self, path) -> str:
+        file_id = f"file-local-{uuid.uuid4().hex[:12]}"
+        shutil.copyfile(path, self._file(file_id))
+        return file_id
+
+    def create_batch(self, input_file_id, metadata=None) -> dict:
+        lines = _read_jsonl(self._file(input_file_id))
+        batch = {
+            "id": f"batch_local_{uuid.uuid4().hex[:12]}",
+            "object": "batch",
+            "endpoint": BATCH_ENDPOINT,
+            "input_file_id": input_file_id,
+            "status": "in_progress",
+            "output_file_id": None,
+            "error_file_id": None,
+            "created_at": int(time.time()),
+            "metadata": metadata or {},
+            "request_counts": {"total": len(lines), "completed": 0, "failed": 0},
+        }
+        _write_json(self._batch_path(batch["id"]), batch)
+        # Not a daemon: a submit command run on its own still finishes the batch before it exits
+        threading.Thread(target=self._process, args=(batch, lines), name=f"local-{batch['id']}").start()
+        return dict(batch)
+
+    def _answer(self, batch, line) -> dict:
+        result = {"id": f"batch_req_{uuid.uuid4().hex[:12]}", "custom_id": line["custom_id"], "error": None}
+        try:
+            body = self.backend(line["body"])
+            result["response"] = {"status_code": 200, "request_id": result["id"], "body": body}
+            counter = "completed"
+        except Exception as e:
+            result["response"] = {"status_code": getattr(e, "status_code", None) or 500, "request_id": result["id"],
+                                  "body": {"error": {"message": str(e) or type(e).__name__}}}
+            counter = "failed"
+        with self._lock:
+            batch["request_counts"][counter] += 1
+            _write_json(self._batch_path(batch["id"]), batch)
+        return result
+
+    def _process(self, batch, lines):
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = list(executor.map(lambda line: self._answer(batch, line), lines))
+
+        outputs = [r for r in results if r["response"]["status_code"] == 200]
+        failures = [r for r in results if r["response"]["status_code"] != 200]
+        for name, rows in (("output_file_id", outputs), ("error_file_id", failures)):
+            if rows:
+                file_id = f"file-local-{uuid.uuid4().hex[:12]}"
+                with open(self._file(file_id), "w", encoding="utf-8") as f:
+                    f.writelines(json.dumps(row) + "\n" for row in rows)
+                batch[name] = file_id
+        with self._lock:
+            batch.update(status="completed", completed_at=int(time.time()))
+            _write_json(self._batch_path(batch["id"]), batch)
+
+    def retrieve_batch(self, batch_id) -> dict:
+        return _read_json(self._batch_path(batch_id))
+
+    def file_content(self, file_id) -> bytes:
+        with open(self._file(file_id), "rb") as f:
+            return f.read()
+
+
+# ----------- CLI -----------
+def batch_client(args):
+    if args.local:
+        from fake_llm import FakeLLM
+        return LocalBatchProcessor(args.directory, FakeLLM(latency=args.latency, error_rate=args.error_rate))
+    from api_client import OpenAIClient
+    return OpenAIClient()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate documents for many minutes files through the batch API.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def command(name, help, manifest=False, client=False):
+        sub = commands.add_parser(name, help=help)
+        if manifest:
+            sub.add_argument("manifest", help='JSON list of {"minutes": path, "company": name}')
+        sub.add_argument("directory", help="Job directory, e.g. .cache/bulk/2026-10-19")
+        if manifest:
+            sub.add_argument("--documents", nargs="+", choices=DOCUMENTS, default=list(DOCUMENTS))
+        if client:
+            sub.add_argument("--local", action="store_true", help="Answer the batch locally with the fake LLM")
+            sub.add_argument("--latency", type=float, default=0.0, help="Fake LLM seconds per call (--local)")
+            sub.add_argument("--error-rate", type=float, default=0.0, help="Fake LLM failed calls (--local)")
+        return sub
+
+    command("compile", "Write the batch requests for a manifest", manifest=True)
+    command("submit", "Upload the requests and create the batch", client=True)
+    command("poll", "Check the batch, downloading results once done", client=True).add_argument(
+        "--wait", action="store_true", help="Poll until the batch has finished")
+    command("ingest", "Store the results per run")
+    command("render", "Write the .docx documents of every ingested run")
+    command("run", "Compile, submit, wait, ingest and render", manifest=True, client=True)
+    args = parser.parse_args()
+
+    if args.command in ("compile", "run"):
+        compile_batch(load_manifest(args.manifest), args.directory, args.documents)
+    if args.command in ("submit", "run"):
+        submit(args.directory, batch_client(args))
+    if args.command in ("poll", "run"):
+        batch = poll(args.directory, batch_client(args), wait=args.command == "run" or args.wait,
+                     interval=1.0 if args.local else POLL_INTERVAL)
+        if batch["status"] not in FINAL_STATUSES:
+            return
+    if args.command in ("ingest", "run"):
+        ingest(args.directory)
+    if args.command in ("render", "run"):
+        render(args.directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Cooperative cancellation for document generation.
+
+A CancelToken is handed down from whoever may want to stop the work (the
+app's cancel button, speculation when the inputs change) through the
+generators to llm.chat_completion. Nothing is killed: each layer checks the
+token at its own safe points and raises Cancelled.
+ - llm: a call still queued for a fair_share slot leaves the queue; a call in
+   flight is abandoned, so the caller's worker thread is free immediately (the
+   HTTP request finishes on llm's pool and is still recorded in the ledger).
+ - generators: sections not yet started are skipped, finished ones are kept
+   on the exception (see generate_strategy_3.GenerationCancelled).
+
+CancelToken is a threading.Event, so code that only checks is_set() (or
+waits on it) works with either. A Deadline is a CancelToken that also cancels
+itself after a number of seconds, used for per-section time limits.
+"""
+import threading
+import time
+
+
+class Cancelled(Exception):
+    """The work was cancelled through its CancelToken."""
+
+
+class CancelToken(threading.Event):
+    def __init__(self):
+        super().__init__()
+        self._callbacks = []
+        self._callbacks_lock = threading.Lock()
+
+    def cancel(self):
+        self.set()
+
+    def set(self):
+        with self._callbacks_lock:
+            callbacks, self._callbacks = self._callbacks, []
+            super().set()
+        for callback in callbacks:
+            callback()
+
+    def on_cancel(self, callback):
+        """Call callback() once when the token is cancelled (straight away if it already is)."""
+        with self._callbacks_lock:
+            if not self.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback):
+        with self._callbacks_lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def raise_if_cancelled(self, what="Generation"):
+        if self.is_set():
+            raise Cancelled(f"{what} cancelled")
+
+
+def raise_if_cancelled(token, what="Generation"):
+    """Same as token.raise_if_cancelled(), for code where the token is optional."""
+    if token is not None and token.is_set():
+        raise Cancelled(f"{what} cancelled")
+
+
+class Deadline(CancelToken):
+    """Cancelled after `seconds`, or as soon as the parent token is. Call close() when done with it."""
+
+    def __init__(self, seconds, parent=None):
+        super().__init__()
+        self.expires = time.monotonic() + seconds
+        self._parent = parent
+        self._timer = threading.Timer(seconds, self.cancel)
+        self._timer.daemon = True
+        self._timer.start()
+        if parent is not None:
+            parent.on_cancel(self.cancel)
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires - time.monotonic())
+
+    def close(self):
+        self._timer.cancel()
+        if self._parent is not None:
+            self._parent.remove_callback(self.cancel)
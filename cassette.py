@@ -0,0 +1,222 @@
+"""
+Record / replay cassettes of LLM calls.
+
+A Recorder wraps an llm.py backend and appends every request / response pair
+to a cassette file (JSON lines, gzipped when the name ends in .gz); a Player
+serves them back, optionally sleeping for each call's recorded latency. A
+report regenerated from a cassette is deterministic and costs nothing, so
+rendering bugs can be reproduced, code versions compared on the same
+responses, and slow API timing replayed as it happened.
+
+    python cassette.py record minutes.docx report.cassette.gz --company "Pal's Pickling Plant"
+    python cassette.py replay minutes.docx report.cassette.gz --company "Pal's Pickling Plant" [--latency]
+
+Requests are matched on model, messages and temperature. max_tokens and
+request_timeout are left out: they come from section_stats and the section
+deadlines, which change from one run to the next. Identical requests are
+served in the order they were recorded (the last one again once they run out).
+A request not on the cassette raises CassetteMiss, which the strategy report
+renders as a failed section (without retrying it). Replayed calls cost
+nothing, so they are kept out of the ledger, the budgets and section_stats.
+
+The app records or replays everything it sends when MML_CASSETTE is set. Its
+recording is closed when the process exits; a cassette cut short by a killed
+process (a .gz without its end marker, a half-written last line) still
+replays the calls written before the cut.
+    MML_CASSETTE=calls.cassette.gz      cassette file
+    MML_CASSETTE_MODE=record            or replay
+    MML_CASSETTE_LATENCY=1              replay with the recorded latencies
+"""
+import argparse
+import atexit
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import llm
+
+CASSETTE_PATH = os.getenv("MML_CASSETTE")           # None = off
+CASSETTE_MODE = os.getenv("MML_CASSETTE_MODE", "record")
+CASSETTE_LATENCY = os.getenv("MML_CASSETTE_LATENCY", "0") == "1"
+UNMATCHED_FIELDS = ("max_tokens", "request_timeout")  # Vary between runs of the same report
+HINT_CHARS = 80                                     # Of the last message, to tell entries apart when debugging
+
+
+class CassetteMiss(llm.NotRetryable):
+    """A request that isn't on the cassette."""
+
+
+def _open(path, mode):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def match_key(request) -> str:
+    request = {k: v for k, v in request.items() if k not in UNMATCHED_FIELDS}
+    return hashlib.sha256(json.dumps(request, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+# ----------- Record -----------
+class Recorder:
+    """llm.py backend that passes requests to backend and records them. Call close() when done."""
+
+    def __init__(self, backend, path):
+        self.backend = backend
+        self.path = path
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._file = _open(path, "w")               # Written as calls return, a crashed run keeps what it had
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.backend(request)
+        entry = {
+            "key": match_key(request),
+            "model": request["model"],
+            "hint": request["messages"][-1]["content"][:HINT_CHARS],
+            "latency": round(time.perf_counter() - start, 4),
+            "response": response,
+        }
+        with self._lock:
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+            self.calls += 1
+        return response
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+# ----------- Replay -----------
+class Player:
+    """
+    llm.py backend serving responses from a cassette.
+    latency: sleep for each call's recorded latency, times latency_scale (0.1 = ten times faster).
+    """
+    replay = True                                   # See llm.is_replay
+
+    def __init__(self, path, latency=False, latency_scale=1.0):
+        self.latency = latency
+        self.latency_scale = latency_scale
+        self.calls = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = {}                          # key -> deque of entries, in recorded order
+        with _open(path, "r") as f:
+            try:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries.setdefault(entry["key"], deque()).append(entry)
+            except (EOFError, json.JSONDecodeError) as e:
+                # Recording never closed (process killed): every line is flushed whole, only the end is missing
+                print(f"Cassette {path} is truncated, replaying the {len(self)} calls before the cut: {e}")
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._entries.values())
+
+    def __call__(self, request):
+        with self._lock:
+            entries = self._entries.get(match_key(request))
+            if not entries:
+                self.misses += 1
+                raise CassetteMiss(f"No recorded response for this {request['model']} request: "
+                                   f"{request['messages'][-1]['content'][:HINT_CHARS]!r}")
+            # Keep the last one for any further identical requests
+            entry = entries.popleft() if len(entries) > 1 else entries[0]
+            self.calls += 1
+        if self.latency:
+            time.sleep(entry["latency"] * self.latency_scale)
+        return entry["response"]
+
+
+# ----------- Installing -----------
+@contextmanager
+def recording(path):
+    """Record every call llm.py makes inside the block. Yields the Recorder."""
+    recorder = Recorder(None, path)
+    recorder.backend = llm.set_backend(recorder)
+    try:
+        yield recorder
+    finally:
+        llm.set_backend(recorder.backend)
+        recorder.close()
+
+
+@contextmanager
+def replaying(path, latency=False, latency_scale=1.0):
+    """Serve every call llm.py makes inside the block from a cassette. Yields the Player."""
+    player = Player(path, latency, latency_scale)
+    previous = llm.set_backend(player)
+    try:
+        yield player
+    finally:
+        llm.set_backend(previous)
+
+
+def from_env(backend):
+    """backend wrapped as configured by MML_CASSETTE (unchanged when it isn't set)."""
+    if not CASSETTE_PATH:
+        return backend
+    if CASSETTE_MODE == "replay":
+        return Player(CASSETTE_PATH, latency=CASSETTE_LATENCY)
+    # Recording lasts as long as the process (a .gz is only complete once closed)
+    recorder = Recorder(backend, CASSETTE_PATH)
+    atexit.register(recorder.close)
+    return recorder
+
+
+# ----------- CLI -----------
+def main():
+    parser = argparse.ArgumentParser(description="Record a strategy report's LLM calls, or regenerate it from them.")
+    parser.add_argument("mode", choices=["record", "replay"])
+    parser.add_argument("minutes", help="Minutes .docx (or plain text)")
+    parser.add_argument("cassette", help="Cassette file (.gz to compress)")
+    parser.add_argument("--company", default="the business", help="Company name used in the prompts")
+    parser.add_argument("--draft", action="store_true", help="Quick draft instead of the final report")
+    parser.add_argument("--fake", action="store_true", help="Record from the local fake LLM instead of the API")
+    parser.add_argument("--latency", action="store_true", help="Replay with the recorded latencies")
+    parser.add_argument("--latency-scale", type=float, default=1.0)
+    parser.add_argument("--out", help="Write the report .docx here")
+    args = parser.parse_args()
+
+    from condense_minutes import prepare_minutes
+    from generate_strategy_3 import generate_strategy_sections, render_strategy_docx
+    from prompt_tokens import load_minutes
+
+    if args.fake:
+        from fake_llm import FakeLLM
+        llm.set_backend(FakeLLM(latency=0.2, jitter=0.3))
+
+    def generate():
+        start = time.perf_counter()
+        minutes = prepare_minutes(load_minutes(args.minutes))
+        sections = generate_strategy_sections(minutes, args.company, mode="draft" if args.draft else "final")
+        generated = time.perf_counter() - start
+        buffer = render_strategy_docx(sections, args.company)
+        print(f"Generated in {generated:.2f}s, rendered in {time.perf_counter() - start - generated:.2f}s")
+        # Same content hash = same report, whatever the docx timestamps say
+        print(f"Content hash: {hashlib.sha256(json.dumps(sections).encode('utf-8')).hexdigest()[:16]}")
+        if args.out:
+            with open(args.out, "wb") as f:
+                f.write(buffer.getvalue())
+
+    if args.mode == "record":
+        with recording(args.cassette) as recorder:
+            generate()
+        print(f"Recorded {recorder.calls} calls to {args.cassette}")
+    else:
+        with replaying(args.cassette, args.latency, args.latency_scale) as player:
+            generate()
+        print(f"Replayed {player.calls} calls, {player.misses} not on the cassette")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""
+Map-reduce condensing for minutes too long to send whole.
+
+Above CONDENSE_THRESHOLD tokens the minutes are split into segments on
+paragraph / heading boundaries:
+ - ***Heading*** blocks, the "Business Structure Mapping" anchor and focus-area
+   lists are kept verbatim (section placement and the action plan rely on them)
+ - everything else is chunked, chunks are summarised in parallel (map), and
+   neighbouring summaries are merged and re-summarised until the result fits
+   the budget (reduce)
+ - verbatim blocks have their own budget: past it, the bodies of the oldest
+   ones are summarised too (their heading lines stay verbatim)
+
+The result is bounded by max_tokens (TARGET_TOKENS + VERBATIM_TOKENS, or the
+threshold if lower). When only merging summaries across headings gets it
+there (hundreds of headings), that is done too.
+
+Segments stay in document order, so the condensed text can be used anywhere the
+minutes would have been.
+"""
+import contextvars
+import hashlib
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import llm
+import routing
+
+CONDENSE_THRESHOLD = int(os.getenv("MML_CONDENSE_THRESHOLD", "60000"))  # Tokens of minutes before condensing
+CHUNK_TOKENS = 6000                                 # Map input size
+TARGET_TOKENS = 20000                               # Budget for the condensed minutes (summaries)
+VERBATIM_TOKENS = 20000                             # Budget for verbatim blocks, the oldest bodies are summarised beyond it
+REDUCE_FANIN = 4                                    # Summaries merged per reduce call
+MAP_WORKERS = 8
+CACHE_DIR = os.getenv("MML_CONDENSE_CACHE", os.path.join(".cache", "condensed"))
+
+ANCHOR_PHRASE = "business structure mapping"
+HEADING_MARKER = re.compile(r"\*\*\*(.*?)\*\*\*")
+# A heading-like line: "Key Focus Areas", "**Actions**", "Action plan:", "Actions agreed:" (a few words need a colon)
+FOCUS_LIST_HEADING = re.compile(r"^[\s*#]*(key\s+)?(focus\s+areas?|actions?|action\s+plan|action\s+items?)"
+                                r"([\s*]*:?|(\s+[\w'-]+){1,3}[\s*]*:)[\s*]*$", re.IGNORECASE)
+FOCUS_ITEM_MAX_WORDS = 30                           # Longer paragraphs end a focus-area list
+VERBATIM_BODY_TOKENS = 1500                         # Body kept under a ***Heading***, the rest is summarised
+
+CHUNK_PROMPT = """You are condensing part of the capture of a business strategy workshop so it can be used to write a strategy report.
+
+Summarise the excerpt below in British English. Keep every concrete fact: names, numbers, products, customers, goals, problems, decisions and ideas. Drop repetition and filler. Use short paragraphs or hyphen bullet points. Do not add anything that is not in the excerpt.
+
+Excerpt:
+\"\"\"
+{text}
+\"\"\"
+"""
+
+
+def estimate_tokens(text) -> int:
+    # ~4 characters per token for English prose
+    return len(text) // 4
+
+
+def _is_heading_line(line) -> bool:
+    return bool(HEADING_MARKER.search(line)) or ANCHOR_PHRASE in line.lower()
+
+
+def split_segments(minutes) -> list:
+    """
+    [("verbatim" | "text", text), ...] in document order.
+    Text segments are at most ~CHUNK_TOKENS long and split on paragraph boundaries.
+    """
+    segments = []
+    buffer = []
+    buffer_tokens = 0
+
+    def flush():
+        nonlocal buffer, buffer_tokens
+        if buffer:
+            segments.append(("text", "\n".join(buffer)))
+        buffer, buffer_tokens = [], 0
+
+    paragraphs = minutes.split("\n")
+    i = 0
+    while i < len(paragraphs):
+        paragraph = paragraphs[i]
+
+        if HEADING_MARKER.search(paragraph):
+            # ***Heading*** and its body, up to the next heading line (bounded)
+            block = [paragraph]
+            body_tokens = 0
+            i += 1
+            while i < len(paragraphs) and not _is_heading_line(paragraphs[i]):
+                body_tokens += estimate_tokens(paragraphs[i])
+                if body_tokens > VERBATIM_BODY_TOKENS and len(block) > 1:
+                    break
+                block.append(paragraphs[i])
+                i += 1
+            flush()
+            segments.append(("verbatim", "\n".join(block)))
+            continue
+
+        if ANCHOR_PHRASE in paragraph.lower():
+            flush()
+            segments.append(("verbatim", paragraph))
+            i += 1
+            continue
+
+        if FOCUS_LIST_HEADING.match(paragraph):
+            # Focus-area list: the heading and the short items that follow it
+            block = [paragraph]
+            i += 1
+            while (i < len(paragraphs) and not _is_heading_line(paragraphs[i])
+                   and len(paragraphs[i].split()) <= FOCUS_ITEM_MAX_WORDS):
+                block.append(paragraphs[i])
+                i += 1
+            flush()
+            segments.append(("verbatim", "\n".join(block)))
+            continue
+
+        tokens = estimate_tokens(paragraph)
+        if buffer and buffer_tokens + tokens > CHUNK_TOKENS:
+            flush()
+        buffer.append(paragraph)
+        buffer_tokens += tokens
+        i += 1
+
+    flush()
+    return segments
+
+
+def summarise_chunk(text, backend=None) -> str:
+    route = routing.route_for_document("minutes_chunk_summary")
+    response = llm.chat_completion(
+        model=route["model"],
+        messages=[{"role": "user", "content": CHUNK_PROMPT.format(text=text)}],
+        max_tokens=route.get("max_tokens"),
+        temperature=route["temperature"],
+        tags={"section": "Minutes Summary", "doc_type": "minutes_chunk_summary"},
+        backend=backend
+    )
+    return llm.response_text(response).strip()
+
+
+def _summarise_all(texts, backend=None) -> list:
+    # Each worker gets a copy of this context, so calls keep the caller's fair_share session and llm.run_scope
+    with ThreadPoolExecutor(max_workers=MAP_WORKERS) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, summarise_chunk, text, backend) for text in texts]
+        return [future.result() for future in futures]
+
+
+def _summary_tokens(segments) -> int:
+    return sum(estimate_tokens(text) for kind, text in segments if kind == "summary")
+
+
+def _total_tokens(segments) -> int:
+    return estimate_tokens("\n".join(text for _, text in segments))
+
+
+def _summarise_verbatim_bodies(segments, budget, backend=None) -> list:
+    """Summarise the bodies of the oldest verbatim blocks until the verbatim text fits budget."""
+    verbatim = sum(estimate_tokens(text) for kind, text in segments if kind == "verbatim")
+    chosen = []
+    for i, (kind, text) in enumerate(segments):
+        if verbatim <= budget:
+            break
+        heading, _, body = text.partition("\n")
+        if kind == "verbatim" and body.strip():
+            chosen.append(i)
+            verbatim -= estimate_tokens(text) - estimate_tokens(heading)
+    if not chosen:
+        return segments
+
+    summaries = dict(zip(chosen, _summarise_all([segments[i][1].partition("\n")[2] for i in chosen], backend)))
+    result = []
+    for i, (kind, text) in enumerate(segments):
+        if i in summaries:
+            result += [("verbatim", text.partition("\n")[0]), ("summary", summaries[i])]
+        else:
+            result.append((kind, text))
+    return result
+
+
+def _reduce_until(segments, budget, backend=None) -> tuple:
+    """Reduce rounds until the summaries fit budget or nothing is left to merge. Returns (segments, rounds)."""
+    rounds = 0
+    while _summary_tokens(segments) > budget:
+        reduced = _reduce_round(segments, backend)
+        if len(reduced) == len(segments):
+            break                                   # Nothing left to merge
+        segments = reduced
+        rounds += 1
+    return segments, rounds
+
+
+def _reduce_round(segments, backend=None) -> list:
+    """Merge up to REDUCE_FANIN neighbouring summaries (never across a verbatim block) and re-summarise."""
+    groups = []                                     # (kind, [texts])
+    for kind, text in segments:
+        if kind == "summary" and groups and groups[-1][0] == "summary" and len(groups[-1][1]) < REDUCE_FANIN:
+            groups[-1][1].append(text)
+        else:
+            groups.append((kind, [text]))
+
+    to_merge = [i for i, (kind, texts) in enumerate(groups) if kind == "summary" and len(texts) > 1]
+    merged = _summarise_all(["\n\n".join(groups[i][1]) for i in to_merge], backend)
+    results = dict(zip(to_merge, merged))
+
+    return [(kind, results.get(i, texts[0])) for i, (kind, texts) in enumerate(groups)]
+
+
+def condense(minutes, stats=None, max_tokens=None, backend=None) -> str:
+    """
+    Condensed minutes, always condensing (see prepare_minutes for the threshold check).
+    stats: optional dict, filled with chunk / call counts for measurement.
+    max_tokens: bound on the result (default TARGET_TOKENS + VERBATIM_TOKENS).
+    backend: performs the summary calls (see llm.chat_completion), defaults to the process-wide one.
+    """
+    max_tokens = max_tokens or TARGET_TOKENS + VERBATIM_TOKENS
+    summary_budget = min(TARGET_TOKENS, max_tokens // 2)
+
+    segments = split_segments(minutes)
+    texts = [text for kind, text in segments if kind == "text"]
+    summaries = iter(_summarise_all(texts, backend))
+    segments = [("summary", next(summaries)) if kind == "text" else (kind, text) for kind, text in segments]
+
+    segments = _summarise_verbatim_bodies(segments, max_tokens - summary_budget, backend)
+    segments, rounds = _reduce_until(segments, summary_budget, backend)
+
+    merged_headings = _total_tokens(segments) > max_tokens
+    if merged_headings:
+        # Summaries can't merge across verbatim headings, with enough of them that is the only way down
+        print(f"Condensed minutes still over {max_tokens} tokens, merging summaries across headings")
+        segments, more_rounds = _reduce_until([("summary", text) for _, text in segments], max_tokens, backend)
+        rounds += more_rounds
+
+    if stats is not None:
+        stats.update({
+            "map_calls": len(texts),
+            "reduce_rounds": rounds,
+            "merged_headings": merged_headings,
+            "verbatim_blocks": sum(kind == "verbatim" for kind, _ in segments),
+            "input_tokens": estimate_tokens(minutes),
+        })
+
+    condensed = "\n".join(text for _, text in segments)
+    if stats is not None:
+        stats["output_tokens"] = estimate_tokens(condensed)
+    return condensed
+
+
+def prepare_minutes(minutes, threshold=CONDENSE_THRESHOLD, backend=None) -> str:
+    """
+    The minutes to put in prompts: unchanged when they fit, otherwise the
+    condensed version (cached on disk by content hash).
+    """
+    if estimate_tokens(minutes) <= threshold:
+        return minutes
+
+    path = os.path.join(CACHE_DIR, f"{hashlib.sha256(minutes.encode('utf-8')).hexdigest()}.txt")
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    condensed = condense(minutes, max_tokens=min(threshold, TARGET_TOKENS + VERBATIM_TOKENS), backend=backend)
+    if estimate_tokens(condensed) > threshold:
+        print(f"Condensed minutes are {estimate_tokens(condensed)} tokens, over the {threshold} threshold")
+    # Written then renamed, so a crash mid-write can't leave a half-written cache file
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(condensed)
+    os.replace(tmp_path, path)
+    return condensed
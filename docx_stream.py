@@ -0,0 +1,152 @@
+"""
+Streaming reader for .docx minutes.
+
+Iterparses word/document.xml straight from the zip instead of building the
+python-docx object model. Paragraphs and table cells come out in document
+order (tables are where many workshop templates capture the business model
+canvas), with heading levels from the paragraph styles. Text box paragraphs
+come out as their own blocks after the paragraph they are anchored in (only
+the mc:Choice copy, not the mc:Fallback one). Image parts are never opened and
+finished elements are freed as we go, so memory stays bounded on large uploads.
+"""
+import re
+import zipfile
+from collections import namedtuple
+
+from lxml import etree
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+BODY, P, TBL, TR, TC = W + "body", W + "p", W + "tbl", W + "tr", W + "tc"
+T, TAB, BR, CR, PSTYLE = W + "t", W + "tab", W + "br", W + "cr", W + "pStyle"
+VAL, STYLE, STYLE_ID, NAME = W + "val", W + "style", W + "styleId", W + "name"
+FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+
+# kind: "paragraph" or "cell", level: heading level (0 = Title) or None, table/row/col: cell position
+Block = namedtuple("Block", ["kind", "text", "level", "table", "row", "col"])
+
+
+def _heading_levels(archive) -> dict:
+    """styleId -> heading level, from word/styles.xml."""
+    try:
+        stream = archive.open("word/styles.xml")
+    except KeyError:
+        return {}
+
+    levels = {}
+    with stream:
+        for _, style in etree.iterparse(stream, tag=STYLE):
+            name = style.find(NAME)
+            name = name.get(VAL, "").lower() if name is not None else ""
+            match = re.match(r"heading (\d)$", name)
+            if match:
+                levels[style.get(STYLE_ID)] = int(match.group(1))
+            elif name == "title":
+                levels[style.get(STYLE_ID)] = 0
+            style.clear()
+    return levels
+
+
+def iter_blocks(file_path):
+    """Yield a Block per body paragraph and per (top-level) table cell, in document order."""
+    with zipfile.ZipFile(file_path) as archive:
+        levels = _heading_levels(archive)
+
+        with archive.open("word/document.xml") as stream:
+            table_depth = 0
+            table = -1
+            paragraphs = []                         # [parts, style] of open paragraphs, text boxes nest them
+            boxes = []                              # (text, style) of text box paragraphs in the open paragraph
+            fallback_depth = 0                      # Inside mc:Fallback: a second copy of a text box, skipped
+            row = col = -1
+            cell_parts = []
+
+            for event, elem in etree.iterparse(stream, events=("start", "end")):
+                tag = elem.tag
+
+                if tag == FALLBACK:
+                    fallback_depth += 1 if event == "start" else -1
+                    continue
+                if fallback_depth:
+                    continue
+
+                if event == "start":
+                    if tag == P:
+                        paragraphs.append([[], None])
+                    elif tag == TBL:
+                        table_depth += 1
+                        if table_depth == 1:
+                            table += 1
+                            row = -1
+                    elif tag == TR and table_depth == 1:
+                        row += 1
+                        col = -1
+                    elif tag == TC and table_depth == 1:
+                        col += 1
+                        cell_parts = []
+                    continue
+
+                if tag == T and paragraphs:
+                    paragraphs[-1][0].append(elem.text or "")
+                elif tag == TAB and paragraphs:
+                    paragraphs[-1][0].append("\t")
+                elif tag in (BR, CR) and paragraphs:
+                    paragraphs[-1][0].append("\n")
+                elif tag == PSTYLE and paragraphs:
+                    paragraphs[-1][1] = elem.get(VAL)
+                elif tag == P:
+                    parts, style = paragraphs.pop()
+                    if paragraphs:
+                        boxes.append(("".join(parts), style))   # Text box paragraph, after its host
+                        continue
+                    found, boxes = [("".join(parts), style)] + boxes, []
+                    for text, style in found:
+                        if table_depth:
+                            cell_parts.append(text)
+                        else:
+                            yield Block("paragraph", text, levels.get(style), None, None, None)
+                elif tag == TC and table_depth == 1:
+                    text = " ".join(part.strip() for part in cell_parts if part.strip())
+                    yield Block("cell", text, None, table, row, col)
+                elif tag == TBL:
+                    table_depth -= 1
+
+                # Free finished top-level elements so memory doesn't grow with the document
+                if tag in (P, TBL):
+                    parent = elem.getparent()
+                    if parent is not None and parent.tag == BODY:
+                        elem.clear()
+                        while elem.getprevious() is not None:
+                            del parent[0]
+
+
+def iter_lines(file_path):
+    """
+    Text lines of the minutes: non-empty paragraphs as-is, each table row as
+    "cell | cell | cell" (empty cells skipped).
+    """
+    row_cells = []
+    current_row = None
+
+    for block in iter_blocks(file_path):
+        if block.kind == "cell":
+            if (block.table, block.row) != current_row and row_cells:
+                yield " | ".join(row_cells)
+                row_cells = []
+            current_row = (block.table, block.row)
+            if block.text:
+                row_cells.append(block.text)
+            continue
+
+        if row_cells:
+            yield " | ".join(row_cells)
+            row_cells = []
+        current_row = None
+        if block.text.strip():
+            yield block.text
+
+    if row_cells:
+        yield " | ".join(row_cells)
+
+
+def read_minutes(file_path):
+    return "\n".join(iter_lines(file_path))
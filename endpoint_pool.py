@@ -0,0 +1,242 @@
+"""
+Load balancing across several API keys and endpoints.
+
+An EndpointPool is an llm.py backend (call it with a request dict) that
+spreads requests over a pool of clients: OpenAI project keys, Azure-style
+deployments (see api_client.py), or anything else that takes a request dict.
+Each endpoint has its own rate budget (requests and tokens per minute, and
+calls in flight); a request goes to the least-loaded endpoint that serves its
+model and has budget left, so throughput grows with the number of keys.
+
+An endpoint that fails with a rate limit, a server error or a connection
+error is ejected for a while (longer after repeated failures, or as long as
+its Retry-After asks) and the request is retried on another endpoint.
+A read timeout on a request that carried the caller's own request_timeout
+is retried elsewhere without ejecting: the caller's deadline was short, the
+endpoint isn't necessarily unhealthy. Request errors (400 etc.) are returned
+straight away.
+
+Configured in .streamlit/secrets.toml (app.py) or a JSON list in the file
+named by MML_ENDPOINTS (llm.py's default backend, for CLIs and workers):
+
+    [[endpoints]]
+    name = "project-a"
+    api_key = "sk-..."
+    rpm = 500                    # requests per minute
+    tpm = 200000                 # tokens per minute (prompt + max_tokens)
+
+    [[endpoints]]
+    name = "azure-uksouth"
+    type = "azure"
+    base_url = "https://example.openai.azure.com"
+    api_key = "..."
+    deployments = { "gpt-4o" = "gpt4o-prod", "gpt-4o-mini" = "gpt4o-mini-prod" }
+"""
+import json
+import threading
+import time
+from collections import deque
+
+import token_count
+
+RATE_WINDOW = 60.0                                  # Seconds, rpm / tpm are budgets per window
+DEFAULT_MAX_IN_FLIGHT = 8                           # Per endpoint
+EJECT_SECONDS = 15.0                                # First ejection, doubled per consecutive failure
+MAX_EJECT_SECONDS = 300.0
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+CREDENTIAL_STATUS = {401, 403}                      # Bad or revoked key: eject for the maximum
+PROJECTED_COMPLETION_TOKENS = 1000                  # For the token budget when max_tokens isn't set
+
+
+class NoEndpointAvailable(Exception):
+    """No endpoint in the pool serves the requested model."""
+
+
+class Endpoint:
+    def __init__(self, name, client, rpm=None, tpm=None, max_in_flight=DEFAULT_MAX_IN_FLIGHT, models=None):
+        """
+        client: callable taking a request dict (e.g. api_client.OpenAIClient).
+        rpm / tpm: requests / tokens per minute, None = unlimited.
+        models: models this endpoint serves, None = any.
+        """
+        self.name = name
+        self.client = client
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_in_flight = max_in_flight
+        self.models = set(models) if models else None
+        self.in_flight = 0
+        self.window = deque()                       # (timestamp, tokens) of requests in the last RATE_WINDOW
+        self.window_tokens = 0
+        self.ejected_until = 0.0
+        self.failures = 0                           # Consecutive
+        self.calls = 0
+        self.errors = 0
+
+    def serves(self, model) -> bool:
+        return self.models is None or model in self.models
+
+    def _expire(self, now):
+        while self.window and self.window[0][0] <= now - RATE_WINDOW:
+            self.window_tokens -= self.window.popleft()[1]
+
+    def load(self) -> float:
+        """Fraction of the tightest budget in use (calls in flight, requests or tokens this minute)."""
+        used = [self.in_flight / self.max_in_flight if self.max_in_flight else 0.0]
+        if self.rpm:
+            used.append(len(self.window) / self.rpm)
+        if self.tpm:
+            used.append(self.window_tokens / self.tpm)
+        return max(used)
+
+    def wait_for_budget(self, tokens, now) -> float:
+        """Seconds until this endpoint could take the request (0 = now)."""
+        self._expire(now)
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            return 0.05                             # Frees up when a call returns, poll shortly
+        waits = [0.0]
+        if self.rpm and len(self.window) >= self.rpm:
+            waits.append(self.window[0][0] + RATE_WINDOW - now)
+        if self.tpm and self.window_tokens + tokens > self.tpm and self.window:
+            # Oldest requests have to leave the window until this one fits
+            freed, until = self.tpm - self.window_tokens, now
+            for timestamp, used in self.window:
+                freed += used
+                until = timestamp + RATE_WINDOW
+                if freed >= tokens:
+                    break
+            waits.append(until - now)
+        return max(waits)
+
+    def status(self) -> dict:
+        return {
+            "name": self.name,
+            "in_flight": self.in_flight,
+            "requests_last_minute": len(self.window),
+            "tokens_last_minute": self.window_tokens,
+            "load": round(self.load(), 3),
+            "ejected_for": round(max(0.0, self.ejected_until - time.monotonic()), 1),
+            "calls": self.calls,
+            "errors": self.errors,
+        }
+
+
+def _retryable(error):
+    status = getattr(error, "status_code", None)
+    if status is None:
+        # Connection errors and timeouts from the HTTP client
+        return type(error).__module__.split(".")[0] in ("httpx", "httpcore") or isinstance(error, OSError)
+    return status in RETRYABLE_STATUS or status in CREDENTIAL_STATUS
+
+
+def _caller_timeout(error, request) -> bool:
+    # Read timeout of a request the caller gave its own (shorter) timeout
+    return ("request_timeout" in request and type(error).__name__ == "ReadTimeout"
+            and type(error).__module__.split(".")[0] in ("httpx", "httpcore"))
+
+
+class EndpointPool:
+    def __init__(self, endpoints):
+        if not endpoints:
+            raise ValueError("An endpoint pool needs at least one endpoint")
+        self.endpoints = list(endpoints)
+        self._lock = threading.Lock()
+        self._freed = threading.Condition(self._lock)
+
+    @property
+    def max_in_flight(self) -> int:
+        return sum(endpoint.max_in_flight for endpoint in self.endpoints)
+
+    def _acquire(self, model, tokens, tried) -> Endpoint:
+        # Least-loaded endpoint with budget for this request, waiting for budget if they are all busy
+        with self._lock:
+            while True:
+                now = time.monotonic()
+                candidates = [e for e in self.endpoints if e.serves(model) and e not in tried]
+                if not candidates:
+                    raise NoEndpointAvailable(f"No endpoint serves model {model}")
+
+                healthy = [e for e in candidates if e.ejected_until <= now]
+                if not healthy:
+                    # Everything is ejected: probe the one that comes back first rather than fail outright
+                    healthy = [min(candidates, key=lambda e: e.ejected_until)]
+
+                waits = {e: e.wait_for_budget(tokens, now) for e in healthy}
+                ready = [e for e in healthy if waits[e] <= 0]
+                if ready:
+                    endpoint = min(ready, key=Endpoint.load)
+                    endpoint.in_flight += 1
+                    endpoint.window.append((now, tokens))
+                    endpoint.window_tokens += tokens
+                    endpoint.calls += 1
+                    return endpoint
+                self._freed.wait(min(waits.values()))
+
+    def _release(self, endpoint, error=None, eject=True):
+        with self._lock:
+            endpoint.in_flight -= 1
+            if error is None:
+                endpoint.failures = 0
+            elif not eject:
+                endpoint.errors += 1
+            elif _retryable(error):
+                endpoint.errors += 1
+                endpoint.failures += 1
+                status = getattr(error, "status_code", None)
+                if status in CREDENTIAL_STATUS:
+                    seconds = MAX_EJECT_SECONDS
+                else:
+                    seconds = min(MAX_EJECT_SECONDS, EJECT_SECONDS * 2 ** (endpoint.failures - 1))
+                    seconds = max(seconds, getattr(error, "retry_after", None) or 0.0)
+                endpoint.ejected_until = time.monotonic() + seconds
+                print(f"Endpoint {endpoint.name} ejected for {seconds:.0f}s: {error}")
+            self._freed.notify_all()
+
+    def __call__(self, request):
+        tokens = (token_count.count_messages(request["messages"], request["model"])
+                  + (request.get("max_tokens") or PROJECTED_COMPLETION_TOKENS))
+        tried = set()
+        while True:
+            endpoint = self._acquire(request["model"], tokens, tried)
+            try:
+                response = endpoint.client(request)
+            except Exception as e:
+                # The caller's own deadline ran out, not the endpoint: hand it back rather than try another
+                caller_timeout = _caller_timeout(e, request)
+                self._release(endpoint, e, eject=not caller_timeout)
+                tried.add(endpoint)
+                if caller_timeout or not _retryable(e) or not any(x.serves(request["model"]) and x not in tried
+                                                for x in self.endpoints):
+                    raise
+                continue
+            self._release(endpoint)
+            return response
+
+    def status(self) -> list:
+        with self._lock:
+            return [endpoint.status() for endpoint in self.endpoints]
+
+
+def from_config(entries, default_max_in_flight=DEFAULT_MAX_IN_FLIGHT) -> EndpointPool:
+    """Pool from endpoint settings (dicts as in the module docstring)."""
+    from api_client import AzureOpenAIClient, OpenAIClient
+
+    endpoints = []
+    for i, entry in enumerate(entries):
+        entry = dict(entry)
+        name = entry.get("name") or f"endpoint-{i + 1}"
+        if entry.get("type", "openai") == "azure":
+            client = AzureOpenAIClient(entry["api_key"], entry["base_url"], entry["deployments"],
+                                       **({"api_version": entry["api_version"]} if "api_version" in entry else {}))
+            models = client.deployments
+        else:
+            client = OpenAIClient(entry["api_key"], **({"base_url": entry["base_url"]} if "base_url" in entry else {}))
+            models = entry.get("models")
+        endpoints.append(Endpoint(name, client, rpm=entry.get("rpm"), tpm=entry.get("tpm"),
+                                  max_in_flight=entry.get("max_in_flight", default_max_in_flight), models=models))
+    return EndpointPool(endpoints)
+
+
+def load_config(path) -> EndpointPool:
+    with open(path, "r", encoding="utf-8") as f:
+        return from_config(json.load(f))
@@ -0,0 +1,122 @@
+"""
+Offline evaluation of the routing table in routing.py.
+
+Uses responses recorded by llm.py (run the app or a report with
+MML_CALL_LOG=calls.jsonl) and compares latency, cost and output length per
+route, without making any API calls.
+
+    python evaluate_routes.py calls.jsonl [more.jsonl ...]
+
+Record a few reports with MML_ROUTES_FILE forcing each model to get samples of
+every section on both models, then compare.
+"""
+import argparse
+import json
+import statistics
+from collections import defaultdict
+
+import routing
+
+
+def load_calls(paths):
+    calls = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    calls.append(json.loads(line))
+    return calls
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    index = min(len(values) - 1, int(pct * len(values)))
+    return values[index]
+
+
+def summarise_routes(calls) -> dict:
+    """(section, model) -> latency, cost and output length stats."""
+    grouped = defaultdict(list)
+    for call in calls:
+        section = call.get("tags", {}).get("section") or "(untagged)"
+        grouped[(section, call["model"])].append(call)
+
+    summary = {}
+    for key, group in grouped.items():
+        latencies = [c["latency"] for c in group]
+        costs = [routing.estimate_cost(c["model"], c["prompt_tokens"], c["completion_tokens"]) for c in group]
+        tags = group[0].get("tags", {})
+        # Logs from before token_limit was tagged: max_tokens is token_limit * 1.3
+        max_tokens = max(c.get("max_tokens") or 0 for c in group)
+        token_limit = tags.get("token_limit") or (int(max_tokens / 1.3) if max_tokens else routing.SHORT_SECTION_LIMIT + 1)
+        summary[key] = {
+            "calls": len(group),
+            "doc_type": tags.get("doc_type"),
+            "custom": bool(tags.get("custom")),
+            "continuation": bool(tags.get("continuation")),
+            "token_limit": token_limit,
+            "latency_p50": percentile(latencies, 0.5),
+            "latency_p95": percentile(latencies, 0.95),
+            "cost_mean": statistics.mean(costs),
+            "completion_tokens_mean": statistics.mean(c["completion_tokens"] for c in group),
+            "output_chars_mean": statistics.mean(c["output_chars"] for c in group),
+            "truncated_rate": sum(c.get("finish_reason") == "length" for c in group) / len(group),
+        }
+    return summary
+
+
+def compare_policies(summary) -> dict:
+    """
+    Projected per-report totals (sequential latency, cost) for the current routing
+    table versus sending every section to the quality model. Only strategy report
+    sections are compared (not continuations or single-call documents). Sections
+    without a recording for the routed model are skipped and listed.
+    """
+    sections = {section: stats for (section, _), stats in summary.items()
+                if stats["doc_type"] == "strategy_report" and not stats["continuation"]}
+    totals = {"routed": {"latency": 0.0, "cost": 0.0}, "quality_only": {"latency": 0.0, "cost": 0.0}}
+    missing = []
+
+    for section, stats in sorted(sections.items()):
+        routed_model = routing.route_for_section(section, stats["token_limit"], custom=stats["custom"])["model"]
+        routed = summary.get((section, routed_model))
+        baseline = summary.get((section, routing.QUALITY_MODEL))
+        if routed is None or baseline is None:
+            missing.append(section)
+            continue
+        totals["routed"]["latency"] += routed["latency_p50"]
+        totals["routed"]["cost"] += routed["cost_mean"]
+        totals["quality_only"]["latency"] += baseline["latency_p50"]
+        totals["quality_only"]["cost"] += baseline["cost_mean"]
+
+    totals["missing"] = missing
+    return totals
+
+
+def print_report(summary, totals):
+    header = f"{'Section':32} {'Model':12} {'n':>4} {'p50 s':>7} {'p95 s':>7} {'$/call':>9} {'out tok':>8} {'chars':>7} {'trunc':>6}"
+    print(header)
+    print("-" * len(header))
+    for (section, model), stats in sorted(summary.items()):
+        print(f"{section[:32]:32} {model:12} {stats['calls']:>4} {stats['latency_p50']:>7.2f} {stats['latency_p95']:>7.2f} "
+              f"{stats['cost_mean']:>9.5f} {stats['completion_tokens_mean']:>8.0f} {stats['output_chars_mean']:>7.0f} "
+              f"{stats['truncated_rate']:>6.0%}")
+
+    print()
+    for policy in ("quality_only", "routed"):
+        print(f"{policy:14} sequential latency {totals[policy]['latency']:7.2f} s   cost ${totals[policy]['cost']:.4f}")
+    if totals["missing"]:
+        print(f"Not compared (no recording for both routes): {', '.join(totals['missing'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare model routes using recorded responses.")
+    parser.add_argument("logs", nargs="+", help="JSONL call logs written with MML_CALL_LOG")
+    args = parser.parse_args()
+
+    summary = summarise_routes(load_calls(args.logs))
+    print_report(summary, compare_policies(summary))
+
+
+if __name__ == "__main__":
+    main()
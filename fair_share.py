@@ -0,0 +1,212 @@
+"""
+Process-wide fair-share limiter for API calls.
+
+Every Streamlit session runs in the same server process and, without this,
+fires its calls independently: a draft strategy report alone sends all of its
+sections at once, and several consultants generating after a workshop day hit
+the organisation rate limit together.
+
+llm.chat_completion takes a slot here before each request. At most
+MAX_IN_FLIGHT requests are in flight across the process; the rest queue per
+session and free slots are handed out round-robin across sessions, one call
+per session per turn, so one user's 30-section report can't starve another
+user's one-pager.
+
+The session is taken from the context (set_session / session_scope), and is
+copied into worker threads the same way as llm.run_scope.
+
+    MML_MAX_IN_FLIGHT=8      process-wide cap, 0 = no limit
+"""
+import contextvars
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from cancellation import Cancelled
+
+MAX_IN_FLIGHT = int(os.getenv("MML_MAX_IN_FLIGHT", "8"))
+NOTICE_INTERVAL = 0.5                               # Seconds between queue-position updates while waiting
+
+_current_session = contextvars.ContextVar("fair_share_session", default=None)
+_current_notice = contextvars.ContextVar("fair_share_notice", default=None)  # (thread id, callback)
+
+
+# ----------- Session -----------
+def set_session(session_id):
+    """Attribute calls made in this context (and copies of it) to a session. Returns a reset token."""
+    return _current_session.set(session_id)
+
+
+@contextmanager
+def session_scope(session_id):
+    token = _current_session.set(session_id)
+    try:
+        yield session_id
+    finally:
+        _current_session.reset(token)
+
+
+def current_session():
+    return _current_session.get()
+
+
+@contextmanager
+def wait_notice(callback):
+    """
+    While the block runs, callback(status) is called every NOTICE_INTERVAL
+    seconds while one of this thread's calls is queued, and callback(None)
+    once it gets a slot. Only calls made on this thread report: worker threads
+    with a copy of the context can't touch the caller's Streamlit elements.
+    A call that waits for its slot on another thread (llm.py hands cancellable
+    calls to a pool) takes current_notice() on this thread and passes it to
+    slot(), the callback is then called from that thread.
+    """
+    token = _current_notice.set((threading.get_ident(), callback))
+    try:
+        yield
+    finally:
+        _current_notice.reset(token)
+
+
+def current_notice():
+    """The wait_notice callback for calls made on this thread, None if there is none."""
+    notice = _current_notice.get()
+    if notice is None or notice[0] != threading.get_ident():
+        return None
+    return notice[1]
+
+
+# ----------- Limiter -----------
+class _Waiter:
+    def __init__(self, session):
+        self.session = session
+        self.event = threading.Event()
+        self.granted = False
+
+
+class FairShareLimiter:
+    def __init__(self, max_in_flight=MAX_IN_FLIGHT):
+        self.max_in_flight = max_in_flight
+        self._lock = threading.Lock()
+        self._in_flight = {}                        # session -> calls in flight
+        self._queues = {}                           # session -> deque of _Waiter, oldest first
+        self._rotation = deque()                    # Sessions with queued calls, next to be served first
+
+    def resize(self, max_in_flight):
+        """Change the cap (e.g. once an endpoint pool with more capacity is configured)."""
+        with self._lock:
+            self.max_in_flight = max_in_flight
+            self._dispatch()
+
+    def _total_in_flight(self) -> int:
+        return sum(self._in_flight.values())
+
+    def _dispatch(self):
+        # Caller holds the lock
+        while self._rotation and self._total_in_flight() < self.max_in_flight:
+            session = self._rotation.popleft()
+            queue = self._queues[session]
+            waiter = queue.popleft()
+            if queue:
+                self._rotation.append(session)      # Back of the line for its next call
+            else:
+                del self._queues[session]
+            self._in_flight[session] = self._in_flight.get(session, 0) + 1
+            waiter.granted = True
+            waiter.event.set()
+
+    def _release(self, session):
+        with self._lock:
+            remaining = self._in_flight[session] - 1
+            if remaining:
+                self._in_flight[session] = remaining
+            else:
+                del self._in_flight[session]
+            self._dispatch()
+
+    def _abandon(self, waiter):
+        # Interrupted while queued: drop the waiter, or give back the slot it was just granted
+        with self._lock:
+            queue = self._queues.get(waiter.session)
+            if queue is not None and waiter in queue:
+                queue.remove(waiter)
+                if not queue:
+                    del self._queues[waiter.session]
+                    self._rotation.remove(waiter.session)
+                return
+        self._release(waiter.session)
+
+    def _status(self, session) -> dict:
+        # Caller holds the lock
+        queued = len(self._queues.get(session, ()))
+        return {
+            "in_flight": self._total_in_flight(),
+            "max_in_flight": self.max_in_flight,
+            "session_in_flight": self._in_flight.get(session, 0),
+            "session_queued": queued,
+            # Round-robin: this many sessions are served before this one's next call
+            "sessions_ahead": list(self._rotation).index(session) if queued else 0,
+            "queued_sessions": len(self._rotation),
+        }
+
+    def status(self, session=None) -> dict:
+        with self._lock:
+            return self._status(session)
+
+    @contextmanager
+    def slot(self, session=None, cancel_token=None, notice=None):
+        """
+        Hold one of the in-flight slots for the block, queueing fairly if none is free.
+        cancel_token: cancellation.CancelToken, raises Cancelled (leaving the queue) once it is cancelled.
+        notice: queue-position callback (see wait_notice), defaults to this thread's current_notice().
+        """
+        if self.max_in_flight <= 0:
+            yield
+            return
+
+        waiter = _Waiter(session)
+        with self._lock:
+            if session in self._queues:
+                self._queues[session].append(waiter)
+            else:
+                self._queues[session] = deque([waiter])
+                self._rotation.append(session)
+            self._dispatch()
+
+        notice = notice or current_notice()
+        if cancel_token is not None:
+            cancel_token.on_cancel(waiter.event.set)
+        try:
+            notified = False
+            while not waiter.event.wait(NOTICE_INTERVAL if notice else None):
+                notice(self.status(session))
+                notified = True
+            if notified:
+                notice(None)
+            # Granted and cancelled at about the same time: the slot goes back
+            if not waiter.granted or (cancel_token is not None and cancel_token.is_set()):
+                raise Cancelled("Cancelled while waiting for API capacity")
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        finally:
+            if cancel_token is not None:
+                cancel_token.remove_callback(waiter.event.set)
+
+        try:
+            yield
+        finally:
+            self._release(session)
+
+
+_limiter = FairShareLimiter()
+
+
+def limiter() -> FairShareLimiter:
+    """The limiter shared by every session in this process."""
+    return _limiter
+
+
+def status(session=None) -> dict:
+    return _limiter.status(current_session() if session is None else session)
@@ -0,0 +1,143 @@
+"""
+Local stand-in for the chat completions API.
+
+FakeLLM is an llm.py backend: it takes a request dict and returns an
+OpenAI-style response dict, shaped after the kind of prompt it receives
+(strategy section, one-pager, action plan JSON, minutes digest JSON, minutes
+summary). Latency and errors are configurable, so benchmarks and load tests can
+run the real pipeline offline. Like the real API it reports cached prompt tokens
+when a leading system message (>= CACHE_MIN_TOKENS) was already seen for the
+model:
+
+    import llm
+    from fake_llm import FakeLLM
+    llm.set_backend(FakeLLM(latency=1.5, jitter=0.4))
+"""
+import json
+import math
+import random
+import threading
+import time
+
+
+CACHE_MIN_TOKENS = 1024                             # Provider minimum for prefix caching
+CACHE_INCREMENT = 128                               # Cached length is a multiple of this
+
+
+class FakeLLMError(Exception):
+    """Simulated API failure."""
+
+    status_code = 500                               # Like api_client.APIError, so retry / failover logic treats it as a server error
+
+
+def _tokens(text) -> int:
+    return max(1, len(text) // 4)
+
+
+class FakeLLM:
+    def __init__(self, latency=0.0, jitter=0.0, seconds_per_token=0.0, error_rate=0.0, seed=None):
+        """
+        latency: median seconds per call
+        jitter: sigma of a lognormal spread around the median (0 = fixed latency)
+        seconds_per_token: extra time per completion token (decode speed)
+        error_rate: fraction of calls that raise FakeLLMError
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.seconds_per_token = seconds_per_token
+        self.error_rate = error_rate
+        self.calls = 0
+        self._prefixes = set()                      # (model, system message) already seen
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _delay(self, completion_tokens) -> float:
+        with self._lock:
+            spread = math.exp(self._random.gauss(0, self.jitter)) if self.jitter else 1.0
+        return self.latency * spread + self.seconds_per_token * completion_tokens
+
+    def __call__(self, request):
+        with self._lock:
+            self.calls += 1
+            fail = self._random.random() < self.error_rate
+        prompt = "\n".join(m["content"] for m in request["messages"])
+        content = self._content(prompt, request.get("max_tokens") or 1000)
+        completion_tokens = _tokens(content)
+        cached = self._cached_tokens(request)
+
+        time.sleep(self._delay(completion_tokens))
+        if fail:
+            raise FakeLLMError("Simulated API error")
+
+        return {
+            "model": request["model"],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": _tokens(prompt),
+                "completion_tokens": completion_tokens,
+                "total_tokens": _tokens(prompt) + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": cached},
+            },
+        }
+
+    def _cached_tokens(self, request) -> int:
+        first = request["messages"][0]
+        prefix_tokens = _tokens(first["content"])
+        if first["role"] != "system" or prefix_tokens < CACHE_MIN_TOKENS:
+            return 0
+        key = (request["model"], first["content"])
+        with self._lock:
+            seen = key in self._prefixes
+            self._prefixes.add(key)
+        return prefix_tokens // CACHE_INCREMENT * CACHE_INCREMENT if seen else 0
+
+    # ----------- Canned responses -----------
+    def _content(self, prompt, max_tokens) -> str:
+        if "Return ONLY a JSON object" in prompt:
+            return json.dumps(fake_digest())
+        if "structured Action Plan" in prompt:
+            return json.dumps(fake_action_rows())
+        if "one-page summary" in prompt:
+            return fake_one_pager()
+        if "condensing part of the capture" in prompt:
+            excerpt = prompt.split('"""')[1] if '"""' in prompt else prompt
+            words = excerpt.split()
+            return " ".join(words[:min(len(words) // 10 + 20, int(max_tokens * 0.75))])
+        return fake_section(int(max_tokens * 0.7))
+
+
+def fake_section(words=200) -> str:
+    bullets = max(2, words // 40)
+    lines = ["The workshop highlighted how this area shapes the **direction** of the business. Below are our key points:"]
+    for i in range(bullets):
+        lines.append(f"- **Point {i + 1}:** A concise explanation of a finding raised during the workshop.")
+    lines.append("Together these points give the business a clear and practical focus for the months ahead.")
+    return "\n".join(lines)
+
+
+def fake_one_pager() -> str:
+    headings = ["Vision Statement", "Mission Statement", "Customers", "Value Proposition",
+                "Products and Services", "Definition of Success"]
+    return "\n\n".join(f"**{h}**\nA short, clear statement about the {h.lower()} of the business." for h in headings)
+
+
+def fake_action_rows(count=6) -> list:
+    priorities = ["Red", "Red", "Yellow", "Yellow", "Green", "Green"]
+    return [{
+        "Priority": priorities[i % len(priorities)],
+        "What": f"Action {i + 1}",
+        "Why": "Addresses a focus area identified in the workshop.",
+        "How": ["Agree an owner.", "Set a budget.", "Review progress weekly."],
+        "When": "in 1 month",
+        "Success Criteria": "The action is complete and its outcome is measured.",
+    } for i in range(count)]
+
+
+def fake_digest() -> dict:
+    fields = ["purpose", "vision", "mission", "goals", "customers", "value_proposition",
+              "products_services", "success_definition"]
+    digest = {field: {"summary": f"A short statement of the business {field.replace('_', ' ')}.", "sources": [1]}
+              for field in fields}
+    digest["focus_areas"] = [{"name": f"Focus Area {i + 1}", "detail": "Raised in the workshop.", "sources": [1]}
+                             for i in range(4)]
+    return digest
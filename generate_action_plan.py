@@ -9,6 +9,57 @@ from docx.enum.text import WD_ALIGN_PARAGRAPH
 from docx.enum.section import WD_ORIENT
 from docx.oxml import OxmlElement, ns
 
+import docx_stream
+import llm
+import minutes_digest
+import prompt_layout
+import routing
+
+# Prompt (shared by app.py and bulk.py)
+ACTION_PLAN_INSTRUCTIONS = """Your task is to create a structured Action Plan with the following columns:
+- Priority
+- What
+- Why
+- How
+- When
+- Success Criteria
+
+Order the actions by priority:
+- Red: High Priority
+- Yellow: Medium
+- Green: Low
+
+Before generating the actions:
+- Read the workshop capture
+- Extract the business's **key focus areas** (they may be labelled "Focus Areas", "Actions", or "Action Plan")
+- Then generate **one action per focus area**, ordered by priority (high first, low last)
+- If fewer than 6 focus areas are found, add additional actions based on any other important themes or needs identified in the workshop (to ensure at least 6 total actions are included)
+
+Instructions:
+- The “How” field should use **concise bullet points**, each a single sentence (no full paragraphs)
+- The “When” field should use approximate default timeframes like “in 2 weeks” or “in 1 month” if no clear deadline is found in the minutes
+- The “Success Criteria” should describe how to know the action was completed successfully
+
+Return the result as a list of Python dictionaries, one per row, like this:
+[
+  {
+    "Priority: "...",
+    "What": "...",
+    "Why": "...",
+    "How": ["...bullet point...", "...bullet point..."],
+    "When": "...",
+    "Success Criteria": "..."
+  },
+  ...
+]"""
+
+# Shared header + minutes first (cached across documents), action plan instructions after
+def build_prompt(minutes, company_name, excerpts=None):
+    instructions = ACTION_PLAN_INSTRUCTIONS
+    if excerpts:
+        instructions = f"=== Relevant Excerpts From The Minutes ===\n{excerpts}\n\n{instructions}"
+    return prompt_layout.build_messages(prompt_layout.shared_header(company_name), minutes, instructions)
+
 def add_markdown_bold_paragraph(doc, text, style="Normal"):
     paragraph = doc.add_paragraph(style=style)
     paragraph.paragraph_format.space_after = Pt(0)
@@ -34,8 +85,8 @@ def add_markdown_bold_paragraph(doc, text, style="Normal"):
     return paragraph
 
 def read_minutes(file_path):
-    doc = Document(file_path)
-    return "\n".join(p.text for p in doc.paragraphs if p.text.strip())
+    # Streams paragraphs and table rows without building the python-docx model
+    return docx_stream.read_minutes(file_path)
 
 def extract_json_from_response(content):
     match = re.search(r"\[\s*\{.*?\}\s*\]", content, re.DOTALL)
@@ -219,4 +270,23 @@ def write_action_plan_docx(file_path, action_plan) -> BytesIO:
     buffer = BytesIO()
     doc.save(buffer)
     buffer.seek(0)  # Move back to the beginning so Streamlit can read it
-    return buffer
\ No newline at end of file
+    return buffer
+
+# Action plan rows from the minutes (or the digest plus excerpts), laid out as a docx (app.py, benchmarks)
+def action_plan_docx(minutes, company_name, filename, digest=None, cancel_token=None, backend=None) -> BytesIO:
+    if digest:
+        messages = build_prompt(minutes_digest.format_digest(digest), company_name,
+                                minutes_digest.action_plan_excerpts(minutes, digest))
+    else:
+        messages = build_prompt(minutes, company_name)
+    route = routing.route_for_document("action_plan")
+    response = llm.chat_completion(
+        model=route["model"],
+        messages=messages,
+        temperature=route["temperature"],
+        max_tokens=route["max_tokens"],
+        tags={"section": "Action Plan", "doc_type": "action_plan"},
+        cancel_token=cancel_token,
+        backend=backend
+    )
+    return write_action_plan_docx(filename, extract_json_from_response(llm.response_text(response)))
@@ -3,189 +3,60 @@ For app.py integration
 """
 import os
 import re
-import openai
 
 from io import BytesIO
-from docxcompose.composer import Composer
 
-from docx import Document
-from docx.shared import Inches, Pt, RGBColor
-from docx.enum.section import WD_ORIENT
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.oxml import OxmlElement
-from docx.oxml.ns import qn
+# No Streamlit or python-docx at import time, rendering lives in one_pager_docx.py
+import llm
+import minutes_digest
+import prompt_layout
+import routing
 
-import streamlit as st
+# API access goes through llm.py (pooled client injected by the app, or OPENAI_API_KEY from the environment)
 
-
-OPENAI_API_KEY = st.secrets["openai_api_key"]
-CORRECT_PASSWORD = st.secrets["app_password"]
-
-# Set OpenAI key
-openai.api_key = OPENAI_API_KEY
-
-# MODEL = "gpt-4o-mini"
-MODEL = "gpt-4o"
+# Model is chosen in routing.py ("one_pager")
 
 def generate_one_pager(company_name, content_dict, output_path) -> BytesIO:
-    doc = Document("template.docx")
-    
-    # Set to portrait and A4
-    section = doc.sections[0]
-    section.orientation = WD_ORIENT.PORTRAIT
-    section.page_height = Inches(11.69)
-    section.page_width = Inches(8.27)
-
-    # Set standard margins (optional tweak)
-    section.top_margin = section.bottom_margin = Pt(72)  # 1 inch
-    section.left_margin = section.right_margin = Pt(72)
-
-    # Set default font
-    style = doc.styles['Normal']
-    font = style.font
-    font.name = 'Calibri'
-    font.size = Pt(12)
-
-    # Set global line spacing to 1.3
-    paragraph_format = style.paragraph_format
-    paragraph_format.space_after = Pt(0)
-    paragraph_format.line_spacing = 1.15
-
-    # Add each section
-    for heading, text in content_dict.items():
-        # Heading
-        heading_para = doc.add_paragraph()
-        heading_run = heading_para.add_run(heading)
-        heading_run.font.name = 'Calibri'
-        heading_run.font.size = Pt(18)
-        heading_run.font.bold = True
-        heading_run.font.color.rgb = RGBColor(255, 153, 0)
-
-        # Content
-        # Add quotes for Vision and Mission Statements
-        if heading == "Vision Statement" or heading == "Mission Statement":
-            text = "“" + text + "”"  
-
-        body_para = doc.add_paragraph(text)
-        for run in body_para.runs:
-            run.font.name = 'Calibri'
-            run.font.size = Pt(12)
-
-        # Double New Lines between Paragraph and New Heading (except at the very last heading)
-        if heading != "Definition of Success":
-            doc.add_paragraph()
-            doc.add_paragraph()
-
-    # Save
-    # doc.save(output_path)
-    doc_cover = Document()
-    section = doc_cover.sections[0]
-    section.orientation = WD_ORIENT.PORTRAIT
-    section.page_height = Inches(11.69)
-    section.page_width = Inches(8.27)
-
-    # Set standard margins (optional tweak)
-    section.top_margin = section.bottom_margin = Pt(72)  # 1 inch
-    section.left_margin = section.right_margin = Pt(72)
-
-    style = doc_cover.styles['Normal']
-    font = style.font
-    font.name = 'Calibri'
-    font.size = Pt(12)
-
-    # Set global line spacing to 1.3
-    paragraph_format = style.paragraph_format
-    paragraph_format.space_after = Pt(0)
-    paragraph_format.line_spacing = 1.15
-
-    insert_cover_page(doc_cover, company_name=company_name, logo_path="Logo3.png")
-    composer = Composer(doc_cover)
-
-    composer.append(doc)
-
-    # doc_cover.save(output_path)
-    buffer = BytesIO()
-    doc_cover.save(buffer)
-    buffer.seek(0)  # Move back to the beginning so Streamlit can read it
-    return buffer
-
-def build_prompt(minutes, company_name):
-    combined_prompt_template = f"""
-    You are a professional business strategist who has just run a workshop for a business called "{company_name}"
+    # python-docx / docxcompose are only imported once a document is actually rendered
+    import one_pager_docx
+    return one_pager_docx.generate_one_pager(company_name, content_dict, output_path)
 
-    All writing should use British English spelling and conventions. Where appropriate, expand upon the ideas captured during the workshop to ensure clarity, completeness, and usefulness.
+ONE_PAGER_INSTRUCTIONS = """You are helping summarize a business strategy workshop. You do not need to create a title, as we have a cover page already made.
 
-    Write this in a professional tone using clear, direct language. Avoid overly formal or common ChatGPT phrases like "delve," "poise," "robust," etc.
+You are to use the workshop minutes to generate a concise, high-level, compelling one-page summary document. You will be summarising 6 six secitons, each as a succinct paragraph in 35 words or less. The sections are:
 
-    You are helping summarize a business strategy workshop. You do not need to create a title, as we have a cover page already made.
+ - **Vision Statement** Write a single sentence that communicates a clear and inspiring long-term vision for the organization.
 
-    You are to use the workshop minutes, provided below, to generate a concise, high-level, compelling one-page summary document. You will be summarising 6 six secitons, each as a succinct paragraph in 35 words or less. The sections are:
+ - **Mission Statement** Write a compelling mission statement.
 
-     - **Vision Statement** Write a single sentence that communicates a clear and inspiring long-term vision for the organization.
+ - **Customers** Summarize the key customers discussed, written as a succinct paragraph.
 
-     - **Mission Statement** Write a compelling mission statement.
+ - **Value Proposition** Generate a clear, concise, and non-repetitive value proposition statement.
 
-     - **Customers** Summarize the key customers discussed, written as a succinct paragraph.
+ - **Products and Services** Write a brief, clear description of the organization's core products and services.
 
-     - **Value Proposition** Generate a clear, concise, and non-repetitive value proposition statement.
+ - **Definition of Success** Define what success looks like for the organization based on the workshop discussion."""
 
-     - **Products and Services** Write a brief, clear description of the organization's core products and services.
-
-     - **Definition of Success** Define what success looks like for the organization based on the workshop discussion.
-
-    --- WORKSHOP MINUTES START ---
-
-    {minutes}
-
-    --- WORKSHOP MINUTES END ---
-    """
-    return combined_prompt_template
+# Shared header + minutes first (cached across documents), one-pager instructions after
+def build_prompt(minutes, company_name):
+    return prompt_layout.build_messages(prompt_layout.shared_header(company_name), minutes, ONE_PAGER_INSTRUCTIONS)
 
-def generate_combined_summary(minutes, company_name):
+def generate_combined_summary(minutes, company_name, draft=False, cancel_token=None, backend=None):
     """Generates the entire one-pager using the combined prompt."""
-    prompt = build_prompt(minutes, company_name)
-    response = openai.ChatCompletion.create(
-        model=MODEL,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.7
+    messages = build_prompt(minutes, company_name)
+    route = routing.route_for_document("one_pager")
+    if draft:
+        route.update(model=routing.DRAFT_MODEL, max_tokens=routing.DRAFT_ONE_PAGER_MAX_TOKENS)
+    response = llm.chat_completion(
+        model=route["model"],
+        messages=messages,
+        max_tokens=route.get("max_tokens"),
+        temperature=route["temperature"],
+        tags={"section": "One-Pager", "doc_type": "one_pager"},
+        cancel_token=cancel_token,
+        backend=backend
     )
-    return response['choices'][0]['message']['content'].strip()
-
-def insert_cover_page(doc, company_name, logo_path=None):
-    # Add blank lines to push text down
-    for _ in range(10):  # Adjust number as needed for vertical spacing
-        doc.add_paragraph()
-
-    # Add Company Name (centered, large, orange, bold)
-    para1 = doc.add_paragraph()
-    run1 = para1.add_run(company_name)
-    run1.font.name = 'Calibri'
-    run1.font.size = Pt(44)
-    run1.font.color.rgb = RGBColor(255, 153, 0)  # Orange (#FF9900)
-    run1.bold = True
-    para1.alignment = WD_ALIGN_PARAGRAPH.CENTER
-
-    # Add "Strategy Report" below
-    para2 = doc.add_paragraph()
-    run2 = para2.add_run("1-Page Strategy")
-    run2.font.name = 'Calibri'
-    run2.font.size = Pt(44)
-    run2.font.color.rgb = RGBColor(255, 153, 0)  # Orange (#FF9900)
-    run2.bold = True
-    para2.alignment = WD_ALIGN_PARAGRAPH.CENTER
-
-    # Optional spacing before logo
-    doc.add_paragraph()
-
-    # Insert logo if provided
-    if logo_path:
-        logo_para = doc.add_paragraph()
-        logo_run = logo_para.add_run()
-        logo_run.add_picture(logo_path, width=Inches(2))
-        logo_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-
-    # Add a page break after the cover page
-    doc.add_page_break()
+    return llm.response_text(response).strip()
 
 def split_one_pager_sections(text: str) -> dict:
     """
@@ -214,9 +85,17 @@ def split_one_pager_sections(text: str) -> dict:
     return content_dict
 
 
-def generate_one_pager_docx(minutes, filename, company_name) -> BytesIO:
-    one_pager_text = generate_combined_summary(minutes, company_name)
-    content_dict  = split_one_pager_sections(one_pager_text)
+def generate_one_pager_docx(minutes, filename, company_name, mode="final", one_pager_text=None, digest=None,
+                            cancel_token=None, backend=None) -> BytesIO:
+    # one_pager_text: already generated summary (e.g. from speculation), skips the API call
+    # digest: minutes_digest digest, the one-pager is rendered straight from it
+    if one_pager_text is None and digest is not None:
+        content_dict = minutes_digest.one_pager_content(digest)
+    else:
+        if one_pager_text is None:
+            one_pager_text = generate_combined_summary(minutes, company_name, draft=mode == "draft",
+                                                       cancel_token=cancel_token, backend=backend)
+        content_dict  = split_one_pager_sections(one_pager_text)
     buffer = generate_one_pager(company_name, content_dict, filename)
 
     return buffer
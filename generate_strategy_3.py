@@ -10,37 +10,43 @@ Should be the last major update before tweaking starts
 """
 
 import os
-import json
 import re
-import openai
 
-from dotenv import load_dotenv
 from datetime import datetime       # for file signature
 from io import BytesIO
-
-from docx import Document
-from docx.shared import Inches, Pt, RGBColor
-from docx.enum.section import WD_ORIENT
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.oxml import OxmlElement
-from docx.oxml.ns import qn
-
-import streamlit as st
-
-# Load API key from .env
-# load_dotenv()
-# openai.api_key = os.getenv("OPENAI_API_KEY")
-
-OPENAI_API_KEY = st.secrets["openai_api_key"]
-CORRECT_PASSWORD = st.secrets["app_password"]
-
-# Set OpenAI key
-openai.api_key = OPENAI_API_KEY
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+# No Streamlit, python-docx or lxml at import time: workers and CLIs import this module too.
+# Rendering lives in strategy_docx.py, secrets in app.py (the Streamlit adapter).
+import cancellation
+import fair_share
+import ledger
+import llm
+import minutes_digest
+import prompt_layout
+import prompt_registry
+from minutes_outline import build_outline, clean_heading
+import routing
+import runs
+import section_stats
+
+# API access goes through llm.py (pooled client injected by the app, or OPENAI_API_KEY from the environment)
 
 # ----------- Config -----------
-MODEL = "gpt-4o"
-# MODEL = "gpt-4o-mini"
+# Models are chosen per section in routing.py
 MAX_TOKENS = 800                                    # Per section - roughly 600-700 words MAX
+FINAL_MAX_WORKERS = 1                               # Sections generated at once for the full report
+CONTINUATION_TOKENS = 200                           # Budget for finishing a section cut off by max_tokens
+CONTINUATION_PROMPT = ("Your previous response was cut off. Continue exactly where it stopped, "
+                       "without repeating anything already written, and finish the section concisely.")
+
+# Time limits: a section that fails or runs out of time is rendered as a placeholder, not fatal to the report
+SECTION_DEADLINE = float(os.getenv("MML_SECTION_DEADLINE", "120"))  # Seconds per section, retries included
+SECTION_CALL_TIMEOUT = float(os.getenv("MML_SECTION_CALL_TIMEOUT", "60"))  # Seconds per API call
+REPORT_DEADLINE = float(os.getenv("MML_REPORT_DEADLINE", "900"))  # Seconds for every section of a report
+RETRY_BACKOFF = 2.0                                 # Seconds before the first retry, doubled after each
+MIN_ATTEMPT_SECONDS = 5.0                           # Don't start a retry with less time than this left
 
 # Sections to generate
 TESTING = False
@@ -79,114 +85,47 @@ else:
         ["Conclusion", 150+50]
     ]
 
-BM_SECTIONS = ["Customer Segments", "Value Proposition", "Channels", "Customer Relationships",
-               "Revenue Streams", "Key Resources", "Key Activities", "Key Partners", "Cost Structure"]
+# Fail at startup if the prompts file doesn't cover every section
+prompt_registry.get_registry().check(heading for heading, _ in SECTIONS)
 
 # ----------- Functions -----------
-def add_page_number(paragraph):
-    run = paragraph.add_run()
-    fldChar1 = OxmlElement('w:fldChar')
-    fldChar1.set(qn('w:fldCharType'), 'begin')
-
-    instrText = OxmlElement('w:instrText')
-    instrText.text = "PAGE"
-
-    fldChar2 = OxmlElement('w:fldChar')
-    fldChar2.set(qn('w:fldCharType'), 'end')
-
-    run._r.append(fldChar1)
-    run._r.append(instrText)
-    run._r.append(fldChar2)
-
-    # Optional styling
-    run.font.name = 'Calibri'
-    run.font.size = Pt(10)
-
-def clean_heading(heading):
-    # Trim leading/trailing whitespace
-    heading = heading.strip()
+def insert_new_sections_and_prompts(SECTIONS: list, prompts, outline, default_token_limit=300):
+    """
+    Add the ***Heading*** sections found in the minutes outline: headings before the
+    Business Structure Mapping anchor go after "Product Service Offering", the rest after
+    "Cost Structure". Built by slicing so thousands of headings stay linear.
+    """
+    # Find anchor points
+    insert_after_product = next((i for i, (h, _) in enumerate(SECTIONS) if h == "Product Service Offering"), None)
+    insert_after_cost = next((i for i, (h, _) in enumerate(SECTIONS) if h == "Cost Structure"), None)
 
-    # Remove leading number/dot patterns, with or without space (e.g., "2. ", "2.1.", "10.2. ")
-    heading = re.sub(r'^\d+(?:\.\d+)*\.?\s*', '', heading)
+    if insert_after_product is None or insert_after_cost is None:
+        raise ValueError("Required anchor headings not found in SECTIONS.")
 
-    # Remove trailing colon ":  "
-    heading = heading.rstrip(':')
+    before_bsm = outline.before_anchor()
+    after_bsm = outline.after_anchor()
 
-    # Final strip to catch " :  "
-    heading = heading.strip()
+    def new_sections(names):
+        return [(name, default_token_limit) for name in names]
 
-    # Smart capitalize
-    return smart_capitalize(heading)
+    def new_prompts(names):
+        return [prompt_registry.render_instructions(generate_new_section_prompt(name)) for name in names]
 
-def insert_new_sections_and_prompts(SECTIONS: list, prompts, before_bsm, after_bsm, default_token_limit=300):
-    # prompts_list = list(prompts.values()) # No longer a dict, parsed as a list
-
-    updated_sections = SECTIONS.copy()
-    updated_prompts = prompts.copy()
-    
-    # Find anchor points
-    insert_after_product = next((i for i, (h, _) in enumerate(updated_sections) if h == "Product Service Offering"), None)
-    insert_after_cost = next((i for i, (h, _) in enumerate(updated_sections) if h == "Cost Structure"), None)
-
-    if insert_after_product is None or insert_after_cost is None:
-        raise ValueError("Required anchor headings not found in SECTIONS.")
-    
-    # === Insert before_bsm ===
-    for offset, heading in enumerate(before_bsm):
-        heading = clean_heading(heading)
-        insert_index = insert_after_product + 1 + offset
-        updated_sections.insert(insert_index, (heading, default_token_limit))
-        updated_prompts.insert(insert_index, generate_new_section_prompt(heading))
-
-    # Adjust cost index if before_bsm added elements
-    insert_after_cost += len(before_bsm)
-
-    # === Insert after_bsm ===
-    for offset, heading in enumerate(after_bsm):
-        heading = clean_heading(heading)
-        insert_index = insert_after_cost + 1 + offset
-        updated_sections.insert(insert_index, (heading, default_token_limit))
-        updated_prompts.insert(insert_index, generate_new_section_prompt(heading))
+    cut1, cut2 = insert_after_product + 1, insert_after_cost + 1
+    updated_sections = (list(SECTIONS[:cut1]) + new_sections(before_bsm) + list(SECTIONS[cut1:cut2])
+                        + new_sections(after_bsm) + list(SECTIONS[cut2:]))
+    updated_prompts = (list(prompts[:cut1]) + new_prompts(before_bsm) + list(prompts[cut1:cut2])
+                       + new_prompts(after_bsm) + list(prompts[cut2:]))
 
     return updated_sections, updated_prompts
 
 def find_section_position(minutes: str, heading: str, anchor_phrase="Business Structure Mapping") -> str:
-    # Find position of the anchor
-    anchor_index = minutes.lower().find(anchor_phrase.lower())
-    
-    # Find position of the heading in the minutes (in ***Heading*** format)
-    heading_pattern = f"***{heading}***"
-    heading_index = minutes.lower().find(heading_pattern.lower())
-    
-    if heading_index == -1:
-        return "unknown"
-    if anchor_index == -1:
-        return "before"
-    
-    return "before" if heading_index < anchor_index else "after"
-
-def smart_capitalize(text):
-    text = text.lower()
-    result = ''
-    capitalize_next = True
-    for char in text:
-        if capitalize_next and char.isalpha():
-            result += char.upper()
-            capitalize_next = False
-        else:
-            result += char
-        if char == ' ':
-            capitalize_next = True
-    return result
+    # Outlines are cached per minutes text, so repeated calls don't rescan the minutes
+    return build_outline(minutes, anchor_phrase).position(clean_heading(heading))
 
 def find_new_headings(minutes):
-    # Locates headings like: ***New Heading***
-    matches = re.findall(r'\*\*\*(.*?)\*\*\*', minutes)
-
-    # Clean and title-case each match
-    new_headings = [smart_capitalize(match) for match in matches]
-
-    return new_headings
+    # Locates headings like: ***New Heading*** (each heading once, in order of first appearance)
+    return [heading.name for heading in build_outline(minutes).headings]
 
 def generate_new_section_prompt(heading: str) -> str:
     return f"""Write the content for the '{heading}' section for the strategy report.
@@ -215,34 +154,22 @@ def load_section_from_file(file_path: str) -> str:
         content = f.read()
     return re.sub(r"\n{2,}", "\n", content.strip())
 
-# Load prompt library from JSON file
+# Load prompt library from JSON file (compiled, keyed by section heading)
 def load_prompt_library(filepath):
-    with open(filepath, "r", encoding="utf-8") as file:
-        return json.load(file)
+    return prompt_registry.get_registry(filepath)
 
 def build_global(company_name):
-
-    GLOBAL_PROMPT = f"""
-    You are a professional business strategist who has just run a workshop for a business called "{company_name}". You've gathered key insights that now need to be turned into a professional, high-quality report.
-
-    The objective is to generate a well-written, detailed, and structured section of a business strategy report based on the provided workshop minutes. The writing must be clear, actionable, and appropriate for a professional audience.
-
-    All writing should use British English spelling and conventions. Where appropriate, expand upon the ideas captured during the workshop to ensure clarity, completeness, and usefulness.
-    
-    Write this in a professional tone using clear, direct language. Avoid overly formal or common ChatGPT phrases like "delve," "poise," "robust," etc.
-    """
-    return GLOBAL_PROMPT
-
-# Build the full prompt for a section
-def build_prompt(global_prompt, minutes, section_prompt, token_limit):
-    section_prompt += "\n\nDo not include a section heading at the start of your response."
-
-    return (
-        f"{global_prompt}\n\n"
-        f"=== Workshop Minutes ===\n{minutes}\n\n"
-        f"=== Section Instructions ===\n{section_prompt}\n\n"
-        f"Please limit your response to approximately {token_limit} tokens or fewer."
-    )
+    # Same header as the one-pager and action plan, so the minutes prefix is cached across all of them
+    return prompt_layout.shared_header(company_name)
+
+# Build the messages for a section: shared prefix first, everything section specific after it
+def build_prompt(global_prompt, minutes, section_instructions, token_limit, excerpts=None):
+    # section_instructions: pre-rendered by prompt_registry (render_instructions)
+    instructions = section_instructions
+    if excerpts:
+        instructions += f"\n\n=== Relevant Excerpts From The Minutes ===\n{excerpts}"
+    instructions += f"\n\nPlease limit your response to approximately {token_limit} tokens or fewer."
+    return prompt_layout.build_messages(global_prompt, minutes, instructions)
 
 def normalize_newlines(text: str) -> str:
     """
@@ -261,339 +188,372 @@ def generate_static_scope_section(company_name):
     content = f"\nDear {company_name},\n\nThank you for giving us the opportunity to work with you during this workshop. Your enthusiastic and committed participation in the workshop was instrumental in shaping this report. Your dedication to {quoted_company} mission and your willingness to engage in collaborative strategic planning has been truly inspiring.\n"
     return content
 
-def insert_cover_page(doc, company_name, logo_path=None):
-    # Add blank lines to push text down
-    for _ in range(4):  # Adjust number as needed for vertical spacing
-        doc.add_paragraph()
-
-    # Add Company Name (centered, large, orange, bold)
-    para1 = doc.add_paragraph()
-    run1 = para1.add_run(company_name)
-    run1.font.name = 'Calibri'
-    run1.font.size = Pt(44)
-    run1.font.color.rgb = RGBColor(255, 153, 0)  # Orange (#FF9900)
-    run1.bold = True
-    para1.alignment = WD_ALIGN_PARAGRAPH.CENTER
-
-    # Add "Strategy Report" below
-    para2 = doc.add_paragraph()
-    run2 = para2.add_run("Strategy Report")
-    run2.font.name = 'Calibri'
-    run2.font.size = Pt(44)
-    run2.font.color.rgb = RGBColor(255, 153, 0)  # Orange (#FF9900)
-    run2.bold = True
-    para2.alignment = WD_ALIGN_PARAGRAPH.CENTER
-
-    # Optional spacing before logo
-    doc.add_paragraph()
-
-    # Insert logo if provided
-    if logo_path:
-        logo_para = doc.add_paragraph()
-        logo_run = logo_para.add_run()
-        logo_run.add_picture(logo_path, width=Inches(2))
-        logo_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-
-    # Add a page break after the cover page
-    doc.add_page_break()
-
-def extract_company_name(minutes, model="gpt-4o-mini"):
+def extract_company_name(minutes, model=None, backend=None):
+    route = routing.route_for_document("company_name")
     prompt = (
         "Extract the name of the company or client mentioned in the following workshop minutes.\n"
         "Only return the company name. No explanation, no punctuation.\n\n"
         f"{minutes}"
     )
 
-    response = openai.ChatCompletion.create(
-        model=model,
+    response = llm.chat_completion(
+        model=model or route["model"],
         messages=[{"role": "user", "content": prompt}],
-        max_tokens=20,
-        temperature=0
+        max_tokens=route["max_tokens"],
+        temperature=route["temperature"],
+        tags={"section": "Company Name", "doc_type": "company_name"},
+        backend=backend
     )
-    return response["choices"][0]["message"]["content"].strip()
+    return llm.response_text(response).strip()
 
-def insert_table_of_contents(doc):
+class GenerationCancelled(cancellation.Cancelled):
     """
-     - Does not work, XML field codes don't work.
-     - Table of Contents not accessible
-     - Can't even generate a Blank or Empty ToC to be manually update
-
-     - Solution: Insert a blank page and manually insert ToC and Update it.
-    
+    Raised when a run is cancelled before all sections were generated.
+    completed: {heading: content} of the sections that did finish, to pass back as finished_sections.
     """
-    heading_para = doc.add_paragraph()
-    run = heading_para.add_run("Contents Page")
-    run.font.name = 'Calibri'
-    run.font.size = Pt(34)
-    run.font.color.rgb = RGBColor(255, 153, 0)
-    run.bold = True
-    # paragraph = doc.add_paragraph()
-    # run = paragraph.add_run()
-
-    # fldChar1 = OxmlElement('w:fldChar')
-    # fldChar1.set(qn('w:fldCharType'), 'begin')
-
-    # instrText = OxmlElement('w:instrText')
-    # instrText.set(qn('xml:space'), 'preserve')
-    # instrText.text = 'TOC \\o "1-3" \\h \\z \\u'
-
-    # fldChar2 = OxmlElement('w:fldChar')
-    # fldChar2.set(qn('w:fldCharType'), 'separate')
-
-    # fldChar3 = OxmlElement('w:fldChar')
-    # fldChar3.set(qn('w:fldCharType'), 'end')
-
-    # r_element = run._r
-    # r_element.append(fldChar1)
-    # r_element.append(instrText)
-    # r_element.append(fldChar2)
-    # r_element.append(fldChar3)
-
-    doc.add_paragraph()  # Optional spacing
-    doc.add_page_break()
-
-def is_bullet_point(line):
-    stripped = line.strip()
-    return bool(re.match(r"^[-–—•●]\s+", stripped))
-
-def add_markdown_bold_paragraph(doc, text, style="Normal"):
-    paragraph = doc.add_paragraph(style=style)
-    paragraph.paragraph_format.space_after = Pt(0)
-
-    # Indent bullets only
-    if style == "List Bullet":
-        paragraph.paragraph_format.left_indent = Inches(0.5)
-
-    # Split into parts by bold markers (**...**)
-    parts = re.split(r"(\*\*.*?\*\*)", text)
-
-    for part in parts:
-        run = paragraph.add_run()
-        run.font.name = 'Calibri'
-        run.font.size = Pt(12)
-
-        if part.startswith("**") and part.endswith("**"):
-            run.text = part[2:-2]
-            run.bold = True
-        else:
-            run.text = part
-
-    return paragraph
-
-def insert_logo(doc, image_path, width_in_inches=2):
-    if image_path:
-        para = doc.add_paragraph()
-        run = para.add_run()
-        run.add_picture(image_path, width=Inches(width_in_inches))
-        para.alignment = WD_ALIGN_PARAGRAPH.LEFT
+    def __init__(self, heading, completed=None):
+        super().__init__(f"Cancelled at {heading}")
+        self.completed = completed or {}
 
-# Helper function: add landscape section break
-def set_landscape(document):
-    section = document.sections[-1]
-    
-    # Set A4 size
-    section.page_width = Inches(11.69)
-    section.page_height = Inches(8.27)
-    section.orientation = WD_ORIENT.LANDSCAPE
+# Work out the final section list (including ***Heading*** sections from the minutes)
+def plan_sections(minutes, prompt_library, sections):
+    """
+    prompt_library: prompt_registry.PromptRegistry
+    Returns a list of (heading, token_limit, section_instructions, custom) in report order.
+    """
+    # Prompts, looked up by heading
+    prompt_values = [prompt_library.instructions(heading) for heading, _ in sections]
+
+    # Custom ***Heading*** sections, placed before/after the business model by the outline
+    outline = build_outline(minutes)
+
+    base_headings = {h for h, _ in sections}
+    updated_sections, updated_prompts = insert_new_sections_and_prompts(sections, prompt_values, outline)
+
+    return [(heading, token_limit, updated_prompts[i], heading not in base_headings)
+            for i, (heading, token_limit) in enumerate(updated_sections)]
+
+# Request for the generated part of a section, None for static sections (also compiled into batches by bulk.py)
+def section_request(planned_section, global_prompt, minutes, model=None, token_scale=1.0, digest=None):
+    """Returns {"messages", "token_limit", "model", "temperature"} for generate_section."""
+    heading, token_limit, section_instructions, custom = planned_section
+    if heading == "Our Approach":
+        return None
+
+    # With a digest, prompts get the digest (shared by every section) + targeted excerpts instead of the full minutes
+    excerpts = None
+    if digest is not None:
+        excerpts = minutes_digest.section_excerpts(minutes, digest, heading) or "(none)"
+        minutes = minutes_digest.format_digest(digest)
+
+    route = routing.route_for_section(heading, token_limit, custom=custom)
+    # Drafts shrink the budget
+    token_limit = int(token_limit * token_scale)
+    return {
+        "messages": build_prompt(global_prompt, minutes, section_instructions, token_limit, excerpts),
+        "token_limit": token_limit,
+        "model": model or route["model"],
+        "temperature": route["temperature"],
+    }
+
+# Wrap the generated text of a section (None for static sections) as it goes in the report
+def assemble_section(heading, company_name, generated=None) -> str:
+    if heading == "Our Approach":
+        return generate_static_approach_section(company_name)
+    if heading == "Scope of Project":
+        # raw_content = static_content + "\n" + gen_content
+        # content = normalize_newlines(raw_content)
+        return generate_static_scope_section(company_name) + "\n" + generated
+
+    # Add in extra new line
+    content = "\n" + generated
+    if heading == "Conclusion":
+        content = content + "\n"
+    return content
 
-# Main writing function
-def write_to_docx(file_path, global_prompt, minutes, prompt_library, sections, company_name, status_area=None) -> BytesIO:
-    doc = Document()
-    set_landscape(doc)
-
-    # Set normal margins
-    section = doc.sections[-1]
-    inch = Inches(1)
-    section.top_margin = inch
-    section.bottom_margin = inch
-    section.left_margin = inch
-    section.right_margin = inch
-
-    # Set default font
-    style = doc.styles['Normal']
-    font = style.font
-    font.name = 'Calibri'
-    font.size = Pt(12)
-
-    # Set global line spacing to 1.3
-    paragraph_format = style.paragraph_format
-    paragraph_format.space_after = Pt(0)
-    paragraph_format.line_spacing = 1.3
-
-    # company_name = extract_company_name(minutes)
-    insert_cover_page(doc, company_name=company_name, logo_path="Logo3.png")
-    # Currently jsut a blank page
-    insert_table_of_contents(doc)
-
-    # Prompts
-    prompt_values = list(prompt_library.values())
-
-    # Track whether we've already added the "Business Model" heading
-    inserted_bm_heading = False
-
-    # Check for new headings / sections
-    new_sections = find_new_headings(minutes)
-    new_section_limit = 300                     # tokens
-
-    # For rough positioning in document
-    before_bm = []
-    after_bm = []
-
-    for heading in new_sections:
-        pos = find_section_position(minutes, heading)
-        if pos == "before":
-            before_bm.append(heading)
-        elif pos == "after":
-            after_bm.append(heading)
-
-    updated_sections, updated_prompts = insert_new_sections_and_prompts(sections, prompt_values, before_bm, after_bm)
-    sections = updated_sections
-    prompt_values = updated_prompts
-
-    for i, (heading, token_limit) in enumerate(sections):
+# Generate the text of a single planned section
+def generate_section_content(planned_section, global_prompt, minutes, company_name, model=None, token_scale=1.0,
+                             digest=None, cancel_token=None, timeout=None, backend=None) -> str:
+    heading = planned_section[0]
+    request = section_request(planned_section, global_prompt, minutes, model, token_scale, digest)
+    generated = None
+    if request is not None:
+        # Drafts' lengths shouldn't feed the section stats
+        generated = generate_section(request["messages"], request["token_limit"], model=request["model"],
+                                     heading=heading, temperature=request["temperature"], custom=planned_section[3],
+                                     track_length=token_scale == 1.0, cancel_token=cancel_token, timeout=timeout,
+                                     backend=backend)
+    return assemble_section(heading, company_name, generated)
+
+# Generate one section within its deadline, retrying failed attempts while there is time left
+def generate_section_within_deadline(planned_section, global_prompt, minutes, company_name, deadline,
+                                     cancel_token=None, **options) -> str:
+    """
+    deadline: cancellation.Deadline for this section (cancelled with the run's cancel_token too).
+    Raises Cancelled if cancel_token was cancelled, and the last error once the deadline has passed.
+    BudgetExceeded and llm.NotRetryable are never retried.
+    """
+    backoff = RETRY_BACKOFF
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            return generate_section_content(planned_section, global_prompt, minutes, company_name,
+                                            cancel_token=deadline,
+                                            timeout=max(1.0, min(SECTION_CALL_TIMEOUT, deadline.remaining())),
+                                            **options)
+        except (ledger.BudgetExceeded, llm.NotRetryable):
+            raise                                   # Would fail the same way again (e.g. cassette.CassetteMiss)
+        except Exception as e:
+            cancellation.raise_if_cancelled(cancel_token)
+            if deadline.is_set():
+                raise TimeoutError(f"No response within {SECTION_DEADLINE:.0f}s") from None
+            if deadline.remaining() < backoff + MIN_ATTEMPT_SECONDS:
+                raise
+            print(f"Section {planned_section[0]} failed (attempt {attempt}): {e}, retrying in {backoff:.0f}s")
+            if deadline.wait(backoff):
+                cancellation.raise_if_cancelled(cancel_token)
+                raise TimeoutError(f"No response within {SECTION_DEADLINE:.0f}s") from None
+            backoff *= 2
+
+# Generate every planned section, optionally several at once
+def generate_section_contents(planned, global_prompt, minutes, company_name, status_area=None,
+                              max_workers=1, model=None, token_scale=1.0, cancel_token=None, digest=None,
+                              finished_sections=None, backend=None) -> list:
+    """
+    Returns a list of (heading, content) in report order. Content is None for a section that still failed
+    after retrying within its deadline; those are recorded with runs.record_failed_sections for the
+    current run and rendered as placeholders.
+    cancel_token: optional cancellation.CancelToken. Once it is cancelled, sections not yet started are
+    skipped, calls in flight are abandoned and GenerationCancelled is raised with the finished sections.
+    finished_sections: {heading: content} kept from an earlier (cancelled or partly failed) run with the
+    same inputs. Not regenerated, and updated in place with the sections this run finishes.
+    backend: performs the API calls (see llm.chat_completion), defaults to the process-wide one.
+    """
+    def report(message):
         if status_area:
-            status_area.text(f"Generating {heading}...")
-        else:
-            print(f"Generating section: {heading}...")
-        
-        if heading == "Our Approach":
-            content = generate_static_approach_section(company_name)
-        elif heading == "Scope of Project":
-            section_prompt = prompt_values[i]
-            full_prompt = build_prompt(global_prompt, minutes, section_prompt, token_limit)
-            static_content = generate_static_scope_section(company_name)
-            gen_content = generate_section(full_prompt, token_limit, model=MODEL)
-            # raw_content = static_content + "\n" + gen_content
-            # content = normalize_newlines(raw_content)
-            content = static_content + "\n" + gen_content
+            status_area.text(message)
         else:
-            section_prompt = prompt_values[i]
-            full_prompt = build_prompt(global_prompt, minutes, section_prompt, token_limit)
-            # raw_content = generate_section(full_prompt, token_limit, model=MODEL)
-            # content = normalize_newlines(raw_content)
-
-            content = generate_section(full_prompt, token_limit, model=MODEL)
-            # Add in extra new line
-            content = "\n" + content
-
-            if heading == "Conclusion":
-                content = content + "\n"
-
-        # Add styled heading
-        if heading in BM_SECTIONS:
-            # Insert "Business Model" heading once
-            if not inserted_bm_heading:
-                bm_para = doc.add_paragraph("Business Model", style='Heading 1')
-                bm_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                bm_run = bm_para.runs[0]
-                bm_run.font.name = 'Calibri'
-                bm_run.font.size = Pt(34)
-                bm_run.font.color.rgb = RGBColor(255, 153, 0)
-                bm_run.bold = True
-                inserted_bm_heading = True
-
-            # Create unstyled heading (NOT "Heading 1") for BM section
-            heading_para = doc.add_paragraph()
-            run = heading_para.add_run(heading)
-            run.font.name = 'Calibri'
-            run.font.size = Pt(34)
-            run.font.color.rgb = RGBColor(255, 153, 0)
-            run.bold = True
+            print(message)
+
+    failures = {}                                   # heading -> error, for sections given up on
+
+    def generate(planned_section):
+        cancellation.raise_if_cancelled(cancel_token)
+        # Each section gets SECTION_DEADLINE, capped by what is left of the report's
+        deadline = cancellation.Deadline(min(SECTION_DEADLINE, report_deadline.remaining()), parent=report_deadline)
+        try:
+            content = generate_section_within_deadline(planned_section, global_prompt, minutes, company_name,
+                                                       deadline, cancel_token, model=model,
+                                                       token_scale=token_scale, digest=digest, backend=backend)
+        except (ledger.BudgetExceeded, cancellation.Cancelled):
+            raise
+        except Exception as e:
+            print(f"Section {planned_section[0]} failed, rendering a placeholder: {e}")
+            failures[planned_section[0]] = str(e) or type(e).__name__
+            return None
+        finally:
+            deadline.close()
+        finished_sections[planned_section[0]] = content
+        return content
+
+    if finished_sections is None:
+        finished_sections = {}
+    contents = [finished_sections.get(planned_section[0]) for planned_section in planned]
+    todo = [i for i, content in enumerate(contents) if content is None]
+    report_deadline = cancellation.Deadline(REPORT_DEADLINE, parent=cancel_token)
+
+    def cancelled(i):
+        completed = {planned[j][0]: content for j, content in enumerate(contents) if content is not None}
+        return GenerationCancelled(planned[i][0], completed)
+
+    try:
+        if max_workers <= 1:
+            for i in todo:
+                report(f"Generating {planned[i][0]}...")
+                try:
+                    contents[i] = generate(planned[i])
+                except cancellation.Cancelled:
+                    raise cancelled(i) from None
+        elif todo:
+            # Status updates stay on this thread, Streamlit elements can't be touched from workers
+            report(f"Generating {len(todo)} sections...")
+            executor = ThreadPoolExecutor(max_workers=max_workers)
+            # Each worker gets a copy of this context, so calls stay attributed to the caller's llm.run_scope
+            futures = {executor.submit(contextvars.copy_context().run, generate, planned[i]): i for i in todo}
+            try:
+                pending, done = set(futures), 0
+                progress = shown = f"Generating {len(todo)} sections..."
+                while pending:
+                    finished, pending = wait(pending, timeout=fair_share.NOTICE_INTERVAL,
+                                             return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        i = futures[future]
+                        try:
+                            contents[i] = future.result()
+                        except cancellation.Cancelled:
+                            continue                # Collected below, once every worker has stopped
+                        done += 1
+                        status = "Generated" if contents[i] is not None else "Failed (placeholder)"
+                        progress = f"{status} {planned[i][0]} ({done}/{len(todo)})"
+                    if cancel_token is not None and cancel_token.is_set():
+                        # Queued sections never start, in-flight calls raise Cancelled straight away
+                        executor.shutdown(wait=True, cancel_futures=True)
+                        for future, i in futures.items():
+                            if contents[i] is None and not future.cancelled() and future.exception() is None:
+                                contents[i] = future.result()
+                        missing = [i for i in todo if contents[i] is None]
+                        if missing:
+                            raise cancelled(missing[0])
+                        break
+                    # Calls held back by the process-wide limiter (other sessions are generating too)
+                    queue = fair_share.status()
+                    message = progress
+                    if queue["session_queued"]:
+                        message += (f" · {queue['session_queued']} waiting for API capacity, "
+                                    f"{queue['sessions_ahead']} other session(s) ahead")
+                    if message != shown:
+                        report(message)
+                        shown = message
+            finally:
+                executor.shutdown(wait=False, cancel_futures=True)
+    finally:
+        report_deadline.close()
+
+    # Recorded even when empty, so a regenerated run no longer lists sections that now succeeded
+    runs.record_failed_sections(llm.current_run(), failures)
+
+    return [(planned_section[0], content) for planned_section, content in zip(planned, contents)]
+
+# Lay out generated sections as the strategy report docx
+def render_strategy_docx(section_contents, company_name) -> BytesIO:
+    # python-docx is only imported once a document is actually rendered
+    import strategy_docx
+    return strategy_docx.render_strategy_docx(section_contents, company_name)
 
-        else:
-            # Styled heading that WILL appear in the table of contents
-            heading_para = doc.add_paragraph(heading, style='Heading 1')
-            run = heading_para.runs[0]
-            run.font.name = 'Calibri'
-            run.font.size = Pt(34)
-            run.font.color.rgb = RGBColor(255, 153, 0)
-            run.bold = True
-
-        # Add normal body text
-        # doc.add_paragraph(content)
-        # Should do bolding AND bullet points
-        # save_raw_text(heading, content)
-
-        for line in content.split("\n"):
-            stripped = line.strip()
-
-            if not stripped:
-                doc.add_paragraph()
-                continue
-
-            if is_bullet_point(stripped):
-                # Strip hyphen/bullet prefix
-                bullet_text = re.sub(r"^[-–—•●]\s+", "", stripped)
-                # Handle markdown-style bold within the bullet
-                add_markdown_bold_paragraph(doc, bullet_text, style="List Bullet")
-            else:
-                add_markdown_bold_paragraph(doc, stripped)
-
-        if i != len(sections) - 1:
-            doc.add_page_break()
-
-    insert_logo(doc, "Logo3.png")
-    # Add "Momentum Mind Lab Team" below the logo
-    team_para = doc.add_paragraph()
-    team_run = team_para.add_run("\nMomentum Mind Lab Team")
-    team_run.font.name = 'Calibri'
-    team_run.font.size = Pt(12)
-
-    # Add page number to footer of *all* sections
-    for section in doc.sections:
-        footer = section.footer
-        paragraph = footer.paragraphs[0]
-        paragraph.alignment = 2  # Right?
-        add_page_number(paragraph)
-
-    buffer = BytesIO()
-    doc.save(buffer)
-    buffer.seek(0)  # Move back to the beginning so Streamlit can read it
-    return buffer
+
+# Main writing function
+def write_to_docx(file_path, global_prompt, minutes, prompt_library, sections, company_name, status_area=None,
+                  max_workers=1, model=None, token_scale=1.0, cancel_token=None, backend=None) -> BytesIO:
+    planned = plan_sections(minutes, prompt_library, sections)
+    section_contents = generate_section_contents(planned, global_prompt, minutes, company_name, status_area,
+                                                 max_workers=max_workers, model=model, token_scale=token_scale,
+                                                 cancel_token=cancel_token, backend=backend)
+    return render_strategy_docx(section_contents, company_name)
 
 # Call OpenAI API to generate a section
-def generate_section(full_prompt, token_limit, model=MODEL):
-    response = openai.ChatCompletion.create(
+def generate_section(messages, token_limit, model=routing.QUALITY_MODEL, heading=None, temperature=0.7,
+                     track_length=True, cancel_token=None, timeout=None, custom=False, backend=None):
+    # messages: from build_prompt, shared prefix first
+    # custom: a ***Heading*** section from the minutes (tagged so evaluate_routes.py routes it as one)
+    response = llm.chat_completion(
+        model=model,
+        messages=messages,
+        # Observed length, capped at +30%
+        max_tokens=section_stats.max_tokens_for(heading, token_limit) if track_length else int(token_limit * 1.3),
+        temperature=temperature,  # Slight randomness, can adjust
+        # Hedge delay is tracked per section, the rest is for evaluate_routes.py
+        tags={"section": heading, "doc_type": "strategy_report", "custom": custom, "token_limit": token_limit},
+        cancel_token=cancel_token,
+        timeout=timeout,
+        backend=backend
+    )
+    content = llm.response_text(response)
+    completion_tokens = (response.get("usage") or {}).get("completion_tokens", 0)
+    truncated = response["choices"][0].get("finish_reason") == "length"
+
+    if truncated:
+        # Finish the cut-off section rather than regenerating it
+        print(f"Section {heading} hit max_tokens, requesting continuation...")
+        continuation = continue_section(messages, content, model, heading, temperature, cancel_token, timeout,
+                                        backend)
+        content = join_continuation(content, llm.response_text(continuation))
+        completion_tokens += (continuation.get("usage") or {}).get("completion_tokens", 0)
+
+    # A replayed response says nothing new about the section's length
+    if track_length and not llm.is_replay(backend):
+        section_stats.record_output(heading, completion_tokens, truncated=truncated)
+    return content
+
+def join_continuation(partial, continuation) -> str:
+    # The continuation rarely starts with the whitespace at the cut, a bullet needs its own line
+    if not partial or not continuation or partial[-1].isspace() or continuation[0].isspace():
+        return partial + continuation
+    separator = "\n" if continuation.startswith(("- ", "* ")) else " "
+    return partial + separator + continuation
+
+def continue_section(messages, partial_content, model, heading, temperature, cancel_token=None, timeout=None,
+                     backend=None):
+    response = llm.chat_completion(
         model=model,
-        messages=[{"role": "user", "content": full_prompt}],
-        max_tokens=int(token_limit * 1.3),  # 30% buffer
-        temperature=0.7  # Slight randomness, can adjust
+        messages=messages + [
+            {"role": "assistant", "content": partial_content},
+            {"role": "user", "content": CONTINUATION_PROMPT},
+        ],
+        max_tokens=CONTINUATION_TOKENS,
+        temperature=temperature,
+        tags={"section": f"{heading} (continuation)", "doc_type": "strategy_report", "continuation": True},
+        cancel_token=cancel_token,
+        timeout=timeout,
+        backend=backend
     )
-    return response["choices"][0]["message"]["content"]
+    if response["choices"][0].get("finish_reason") == "length":
+        print(f"Section {heading} still truncated after continuation.")
+    return response
 
 # Optional: Generate all sections in order (if needed later)
-def generate_all_sections(global_prompt, minutes, prompt_library, sections, model=MODEL):
+def generate_all_sections(global_prompt, minutes, prompt_library, sections, model=None):
     results = []
 
-    prompt_values = list(prompt_library.values())  # Rely on index order
-
-    for i, (heading, token_limit) in enumerate(sections):
-        section_prompt = prompt_values[i]
-        full_prompt = build_prompt(global_prompt, minutes, section_prompt, token_limit)
-        section_text = generate_section(full_prompt, token_limit, model=model)
+    for heading, token_limit in sections:
+        full_prompt = build_prompt(global_prompt, minutes, prompt_library.instructions(heading), token_limit)
+        route = routing.route_for_section(heading, token_limit)
+        section_text = generate_section(full_prompt, token_limit, model=model or route["model"],
+                                        heading=heading, temperature=route["temperature"])
         results.append((heading, section_text))
 
     return results  # List of (heading, generated_text)
 
 def read_minutes(file_path):
-    doc = Document(file_path)
-    return "\n".join(p.text for p in doc.paragraphs if p.text.strip())
+    # Streams paragraphs and table rows without building the python-docx model
+    import docx_stream
+    return docx_stream.read_minutes(file_path)
 
-# Shitty Wrapper Function (I <3 Overhead)
-def generate_strategy_docx(minutes, file_path, company_name, status_area=None) -> BytesIO:
-    with open("prompts.json", "r", encoding="utf-8") as f:
-        prompts = json.load(f)
+# Generate the text of every section without rendering (used by speculative pre-generation)
+def generate_strategy_sections(minutes, company_name, status_area=None, mode="final", cancel_token=None,
+                               digest=None, finished_sections=None, backend=None) -> list:
+    """
+    mode="draft" gives a quick preview: fast model, shortened sections, all sections at once.
+    mode="final" is the full quality report.
+    digest: minutes_digest digest to prompt with instead of the full minutes.
+    cancel_token / finished_sections / backend: see generate_section_contents.
+    """
+    prompts = prompt_registry.get_registry()      # Reloaded if prompts.json changed
 
     GLOBAL_PROMPT = build_global(company_name)
 
-    buffer = write_to_docx(
-    file_path=file_path,
-    global_prompt=GLOBAL_PROMPT,
-    minutes=minutes,
-    prompt_library=prompts,
-    sections=SECTIONS,
-    company_name=company_name,
-    status_area=status_area)
+    if mode == "draft":
+        generation = {"max_workers": len(SECTIONS), "model": routing.DRAFT_MODEL,
+                      "token_scale": routing.DRAFT_TOKEN_SCALE}
+    else:
+        generation = {"max_workers": FINAL_MAX_WORKERS}
 
+    planned = plan_sections(minutes, prompts, SECTIONS)
+    return generate_section_contents(planned, GLOBAL_PROMPT, minutes, company_name, status_area,
+                                     cancel_token=cancel_token, digest=digest, finished_sections=finished_sections,
+                                     backend=backend, **generation)
 
-    return buffer
+# Shitty Wrapper Function (I <3 Overhead)
+def generate_strategy_docx(minutes, file_path, company_name, status_area=None, mode="final",
+                           section_contents=None, digest=None, cancel_token=None, finished_sections=None,
+                           backend=None) -> BytesIO:
+    # section_contents: already generated sections (e.g. from speculation), skips the API calls
+    if section_contents is not None and any(content is None for _, content in section_contents):
+        # Only the sections that failed are generated again
+        finished_sections = {heading: content for heading, content in section_contents if content is not None}
+        section_contents = None
+    if section_contents is None:
+        section_contents = generate_strategy_sections(minutes, company_name, status_area, mode=mode, digest=digest,
+                                                      cancel_token=cancel_token,
+                                                      finished_sections=finished_sections, backend=backend)
+    return render_strategy_docx(section_contents, company_name)
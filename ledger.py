@@ -0,0 +1,159 @@
+"""
+Token and cost ledger (SQLite), with per-run and per-day budgets.
+
+llm.chat_completion records every call here, tagged with the run, company,
+document type and section. Before a call is sent, its projected cost (prompt
+tokens counted locally + max_tokens of output) is checked against the budgets
+and reserved, so parallel sections of the same run can't all slip under the
+limit at once; BudgetExceeded is raised instead of dispatching.
+
+Budgets are off unless configured:
+    MML_RUN_BUDGET=1.50      USD per run (one document generation)
+    MML_DAILY_BUDGET=20      USD per calendar day, across all runs
+"""
+import os
+import sqlite3
+import threading
+import time
+from datetime import date
+
+LEDGER_PATH = os.getenv("MML_LEDGER", os.path.join(".cache", "ledger.sqlite3"))
+RUN_BUDGET = float(os.getenv("MML_RUN_BUDGET", "0")) or None
+DAILY_BUDGET = float(os.getenv("MML_DAILY_BUDGET", "0")) or None
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls (
+    id INTEGER PRIMARY KEY,
+    timestamp REAL NOT NULL,
+    day TEXT NOT NULL,
+    run_id TEXT,
+    company TEXT,
+    doc_type TEXT,
+    section TEXT,
+    model TEXT NOT NULL,
+    prompt_tokens INTEGER NOT NULL,
+    cached_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    cost REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS calls_run ON calls (run_id);
+CREATE INDEX IF NOT EXISTS calls_day ON calls (day);
+"""
+
+
+class BudgetExceeded(Exception):
+    """A call was refused because it would take a run or the day over budget."""
+
+
+_lock = threading.Lock()
+_connection = None
+_reserved_runs = {}                                 # run_id -> USD reserved by calls in flight
+_reserved_day = 0.0
+
+
+def _connect():
+    global _connection
+    if _connection is None:
+        directory = os.path.dirname(LEDGER_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        _connection = sqlite3.connect(LEDGER_PATH, check_same_thread=False)
+        _connection.executescript(SCHEMA)
+    return _connection
+
+
+def _today() -> str:
+    return date.today().isoformat()
+
+
+def _spend(where, *params) -> float:
+    row = _connect().execute(f"SELECT COALESCE(SUM(cost), 0) FROM calls WHERE {where}", params).fetchone()
+    return row[0]
+
+
+def run_spend(run_id) -> float:
+    with _lock:
+        return _spend("run_id = ?", run_id)
+
+
+def day_spend(day=None) -> float:
+    with _lock:
+        return _spend("day = ?", day or _today())
+
+
+def company_spend(company) -> float:
+    with _lock:
+        return _spend("company = ?", company)
+
+
+def budgets_enabled() -> bool:
+    return RUN_BUDGET is not None or DAILY_BUDGET is not None
+
+
+def reserve(run_id, projected_cost) -> float:
+    """
+    Check a call's projected cost against the budgets and hold it until settle().
+    Raises BudgetExceeded if either budget would be exceeded. Returns the reserved amount.
+    """
+    global _reserved_day
+    with _lock:
+        if RUN_BUDGET is not None and run_id is not None:
+            committed = _spend("run_id = ?", run_id) + _reserved_runs.get(run_id, 0.0)
+            if committed + projected_cost > RUN_BUDGET:
+                raise BudgetExceeded(f"Run {run_id} would exceed its ${RUN_BUDGET:.2f} budget "
+                                     f"(spent or in flight ${committed:.4f}, next call ~${projected_cost:.4f})")
+        if DAILY_BUDGET is not None:
+            committed = _spend("day = ?", _today()) + _reserved_day
+            if committed + projected_cost > DAILY_BUDGET:
+                raise BudgetExceeded(f"Daily budget of ${DAILY_BUDGET:.2f} would be exceeded "
+                                     f"(spent or in flight ${committed:.4f}, next call ~${projected_cost:.4f})")
+
+        if run_id is not None:
+            _reserved_runs[run_id] = _reserved_runs.get(run_id, 0.0) + projected_cost
+        _reserved_day += projected_cost
+    return projected_cost
+
+
+def settle(run_id, reserved):
+    """Release a reservation (after the call was recorded, or failed)."""
+    global _reserved_day
+    if not reserved:
+        return
+    with _lock:
+        _reserved_day = _reserved_day - reserved if _reserved_day - reserved > 1e-12 else 0.0
+        if run_id is not None:
+            remaining = _reserved_runs.get(run_id, 0.0) - reserved
+            if remaining > 1e-12:
+                _reserved_runs[run_id] = remaining
+            else:
+                _reserved_runs.pop(run_id, None)
+
+
+def record(model, prompt_tokens, completion_tokens, cost, cached_tokens=0, run_id=None, company=None,
+           doc_type=None, section=None):
+    timestamp = time.time()
+    with _lock:
+        connection = _connect()
+        connection.execute(
+            "INSERT INTO calls (timestamp, day, run_id, company, doc_type, section, model, prompt_tokens, "
+            "cached_tokens, completion_tokens, cost) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (timestamp, _today(), run_id, company, doc_type, section, model, prompt_tokens, cached_tokens,
+             completion_tokens, cost))
+        connection.commit()
+
+
+def move_run(from_run, to_run):
+    """Re-attribute every call recorded for from_run to to_run."""
+    with _lock:
+        connection = _connect()
+        connection.execute("UPDATE calls SET run_id = ? WHERE run_id = ?", (to_run, from_run))
+        connection.commit()
+
+
+def breakdown(run_id=None, company=None) -> list:
+    """(doc_type, section, calls, tokens, cost) rows for a run or a company, most expensive first."""
+    where, params = ("run_id = ?", (run_id,)) if run_id is not None else ("company = ?", (company,))
+    with _lock:
+        return _connect().execute(
+            f"SELECT doc_type, section, COUNT(*), SUM(prompt_tokens + completion_tokens), SUM(cost) "
+            f"FROM calls WHERE {where} GROUP BY doc_type, section ORDER BY SUM(cost) DESC", params).fetchall()
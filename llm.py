@@ -0,0 +1,485 @@
+"""
+Shared LLM call layer for all document generators.
+
+Every generator goes through chat_completion() instead of calling the API
+directly, so cross-cutting behaviour lives here:
+ - Backend: requests go to a pooled api_client.OpenAIClient (or an
+   endpoint_pool.EndpointPool spreading them over several keys). A caller
+   can pass its own as backend= (the generators take it too and hand it
+   down); otherwise the process default is used, which the app sets with
+   set_backend() and which is created from MML_ENDPOINTS or OPENAI_API_KEY
+   when nobody did.
+ - Hedged requests: if a call is slower than the usual latency for its section,
+   a duplicate is sent and the first success wins.
+ - Call log: with MML_CALL_LOG set, every response is appended as one JSON line
+   (see evaluate_routes.py).
+ - Run usage: calls made inside run_scope() are totalled per run, including
+   the prompt tokens the provider served from its prefix cache (see
+   prompt_layout.py for why prompts start with the same prefix).
+ - Ledger: every call sent is recorded in ledger.py with its run, company,
+   document type and section (both calls of a hedge race, the loser included),
+   and its projected cost is reserved against the run / daily budgets before
+   it is sent. Replayed responses (a backend with replay = True, such as
+   cassette.Player) cost nothing: they are neither reserved, recorded nor
+   added to the call log.
+ - Fair share: every request waits for a slot from fair_share.py, which caps
+   calls in flight across the process and serves sessions round-robin.
+ - Coalescing: a request identical to one already in flight (same model,
+   messages and parameters) waits for that call's response instead of being
+   sent again (single_flight.py). Only the call that was sent is recorded.
+ - Cancellation: a call given a cancellation.CancelToken raises Cancelled as
+   soon as the token is cancelled, whether it is still queued or in flight
+   (see cancellation.py).
+"""
+import contextvars
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque, OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import fair_share
+from cancellation import Cancelled, CancelToken
+import ledger
+import routing
+import single_flight
+import token_count
+
+# ----------- Config -----------
+DEFAULT_MODEL = routing.QUALITY_MODEL
+
+# Hedging is opt-in: MML_HEDGE=1 to switch on
+HEDGE_ENABLED = os.getenv("MML_HEDGE", "0") == "1"
+HEDGE_PERCENTILE = float(os.getenv("MML_HEDGE_PERCENTILE", "0.9"))  # Hedge once slower than p90
+HEDGE_MIN_SAMPLES = 5                               # Need this many latencies before trusting the percentile
+HEDGE_DEFAULT_DELAY = float(os.getenv("MML_HEDGE_DEFAULT_DELAY", "30"))  # Seconds, used until we have samples
+HEDGE_FALLBACK_MODEL = os.getenv("MML_HEDGE_MODEL") or None  # None = duplicate goes to the same model
+LATENCY_WINDOW = 50                                 # Latencies kept per section
+
+CALL_LOG_PATH = os.getenv("MML_CALL_LOG")           # JSONL file of recorded responses, None = off
+ENDPOINTS_PATH = os.getenv("MML_ENDPOINTS")         # JSON list of endpoints for the default backend (endpoint_pool.py)
+RUN_USAGE_LIMIT = 200                               # Runs whose usage is kept in memory
+PROJECTED_COMPLETION_TOKENS = 1000                  # Output assumed for budget checks when max_tokens isn't set
+
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm-hedge")
+_call_executor = ThreadPoolExecutor(max_workers=64, thread_name_prefix="llm-call")  # Cancellable calls run here
+_lock = threading.Lock()
+_latencies = {}                                     # key -> deque of seconds
+_stats = {"calls": 0, "hedged": 0, "hedge_wins": 0, "wasted_calls": 0, "wasted_tokens": 0, "coalesced": 0}
+_run_usage = OrderedDict()                          # run_id -> usage totals, oldest first
+_current_scope = contextvars.ContextVar("llm_run_scope", default=None)  # {"run": id, "company": ..., ...}
+_in_flight = single_flight.Group()                  # Identical requests being sent right now
+
+
+# ----------- Backend -----------
+_client_lock = threading.Lock()
+_default_client = None
+
+
+def _default_backend(request):
+    # Created on first use, so importing llm needs no API key
+    global _default_client
+    with _client_lock:
+        if _default_client is None and ENDPOINTS_PATH:
+            import endpoint_pool
+            _default_client = endpoint_pool.load_config(ENDPOINTS_PATH)
+            # More keys, more calls at once
+            limiter = fair_share.limiter()
+            limiter.resize(max(limiter.max_in_flight, _default_client.max_in_flight))
+        elif _default_client is None:
+            from api_client import OpenAIClient  # httpx is only imported once a call is made
+            _default_client = OpenAIClient()
+    return _default_client(request)
+
+_backend = _default_backend
+
+
+def set_backend(backend):
+    """
+    Swap the default function that actually performs a request (takes a request
+    dict, returns an OpenAI-style response dict), used by calls not given a
+    backend of their own. Returns the previous backend.
+    """
+    global _backend
+    previous = _backend
+    _backend = backend
+    return previous
+
+
+class NotRetryable(Exception):
+    """Raised by a backend for a request that would fail the same way again (e.g. cassette.CassetteMiss)."""
+
+
+def is_replay(backend=None) -> bool:
+    """True if backend (default: the process-wide one) serves recorded responses instead of calling the API."""
+    return getattr(backend or _backend, "replay", False)
+
+
+# ----------- Helpers -----------
+def response_text(response) -> str:
+    return response["choices"][0]["message"]["content"]
+
+
+def response_tokens(response) -> int:
+    usage = response.get("usage") or {}
+    return usage.get("total_tokens", 0)
+
+
+def cached_tokens(response) -> int:
+    """Prompt tokens served from the provider's prefix cache (0 when not reported)."""
+    usage = response.get("usage") or {}
+    details = usage.get("prompt_tokens_details") or {}
+    return details.get("cached_tokens") or 0
+
+
+def _latency_key(request, tags):
+    if tags and tags.get("section"):
+        return tags["section"]
+    return request["model"]
+
+
+def record_latency(key, seconds):
+    with _lock:
+        _latencies.setdefault(key, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+
+def hedge_delay(key, percentile=HEDGE_PERCENTILE) -> float:
+    """Seconds to wait before hedging a call for this key."""
+    with _lock:
+        samples = sorted(_latencies.get(key, ()))
+    if len(samples) < HEDGE_MIN_SAMPLES:
+        return HEDGE_DEFAULT_DELAY
+    index = min(len(samples) - 1, int(percentile * len(samples)))
+    return samples[index]
+
+
+def hedge_stats() -> dict:
+    """Counters for tuning hedge thresholds."""
+    with _lock:
+        stats = dict(_stats)
+    stats["hedge_rate"] = stats["hedged"] / stats["calls"] if stats["calls"] else 0.0
+    return stats
+
+
+def reset_hedge_stats():
+    with _lock:
+        for key in _stats:
+            _stats[key] = 0
+        _latencies.clear()
+
+
+def _bump(name, amount=1):
+    with _lock:
+        _stats[name] += amount
+
+
+# ----------- Run usage -----------
+@contextmanager
+def run_scope(run_id=None, company=None, doc_type=None):
+    """
+    Attribute every call made inside the block (and in threads started with a
+    copy of this context) to one run, tagged with its company and document
+    type. Yields the run id.
+    """
+    run_id = run_id or uuid.uuid4().hex[:8]
+    scope = {"run": run_id}
+    if company:
+        scope["company"] = company
+    if doc_type:
+        scope["doc_type"] = doc_type
+    token = _current_scope.set(scope)
+    try:
+        yield run_id
+    finally:
+        _current_scope.reset(token)
+
+
+def current_run():
+    scope = _current_scope.get()
+    return scope["run"] if scope else None
+
+
+def _record_usage(run_id, response):
+    usage = response.get("usage") or {}
+    with _lock:
+        totals = _run_usage.get(run_id)
+        if totals is None:
+            totals = _run_usage[run_id] = {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+            while len(_run_usage) > RUN_USAGE_LIMIT:
+                _run_usage.popitem(last=False)
+        totals["calls"] += 1
+        totals["prompt_tokens"] += usage.get("prompt_tokens", 0)
+        totals["cached_tokens"] += cached_tokens(response)
+        totals["completion_tokens"] += usage.get("completion_tokens", 0)
+
+
+def adopt_run(from_run, to_run):
+    """
+    Re-attribute a finished run's usage and ledger spend to another run, e.g. a
+    speculative result taken over by the document run that uses it.
+    """
+    if from_run is None or to_run is None or from_run == to_run:
+        return
+    with _lock:
+        moved = _run_usage.pop(from_run, None)
+        if moved is not None:
+            totals = _run_usage.setdefault(to_run, {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0,
+                                                    "completion_tokens": 0})
+            for name, value in moved.items():
+                totals[name] += value
+    ledger.move_run(from_run, to_run)
+
+
+def run_usage(run_id) -> dict:
+    """Token totals for a run, with the share of prompt tokens that were cache hits."""
+    with _lock:
+        usage = dict(_run_usage.get(run_id) or {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0,
+                                                 "completion_tokens": 0})
+    usage["cache_hit_ratio"] = usage["cached_tokens"] / usage["prompt_tokens"] if usage["prompt_tokens"] else 0.0
+    return usage
+
+
+def cache_report(run_id) -> str:
+    usage = run_usage(run_id)
+    return (f"{usage['calls']} calls · {usage['prompt_tokens']:,} prompt tokens, "
+            f"{usage['cached_tokens']:,} cached ({usage['cache_hit_ratio']:.0%}) · "
+            f"{usage['completion_tokens']:,} completion tokens")
+
+
+def _record_ledger(request, tags, response):
+    usage = response.get("usage") or {}
+    tags = tags or {}
+    prompt_tokens = usage.get("prompt_tokens", 0)
+    completion_tokens = usage.get("completion_tokens", 0)
+    cached = cached_tokens(response)
+    ledger.record(
+        model=request["model"],
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        cached_tokens=cached,
+        cost=routing.estimate_cost(request["model"], prompt_tokens, completion_tokens, cached_tokens=cached),
+        run_id=tags.get("run"),
+        company=tags.get("company"),
+        doc_type=tags.get("doc_type"),
+        section=tags.get("section"),
+    )
+
+
+def _log_call(request, tags, seconds, response):
+    usage = response.get("usage") or {}
+    choice = response["choices"][0]
+    entry = {
+        "timestamp": time.time(),
+        "model": request["model"],
+        "tags": tags or {},
+        "max_tokens": request.get("max_tokens"),
+        "latency": round(seconds, 3),
+        "prompt_tokens": usage.get("prompt_tokens", 0),
+        "cached_tokens": cached_tokens(response),
+        "completion_tokens": usage.get("completion_tokens", 0),
+        "output_chars": len(choice["message"]["content"] or ""),
+        "finish_reason": choice.get("finish_reason"),
+    }
+    with _lock:
+        with open(CALL_LOG_PATH, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+
+def _reserve(request, run_id, backend) -> float:
+    """Hold a call's projected cost against the budgets (raises BudgetExceeded). Returns the amount to settle."""
+    if not ledger.budgets_enabled() or is_replay(backend):
+        return 0.0
+    model = request["model"]
+    projected = routing.estimate_cost(model, token_count.count_messages(request["messages"], model),
+                                      request.get("max_tokens") or PROJECTED_COMPLETION_TOKENS)
+    return ledger.reserve(run_id, projected)
+
+
+def _timed_call(request, key, backend, tags=None, session=None, started=None, cancel_token=None, reserved=0.0,
+                notice=None, rival=None):
+    # Every response is recorded, whether or not anyone still waits for it; reserved is released after that
+    # rival: CancelToken of the hedge backup, cancelled on success before this call's slot goes to anyone else
+    try:
+        # Time spent queued for a slot is not the endpoint's latency
+        with fair_share.limiter().slot(session, cancel_token, notice):
+            if started is not None:
+                started.set()
+            start = time.perf_counter()
+            response = backend(request)
+            seconds = time.perf_counter() - start
+            if rival is not None:
+                rival.cancel()
+        if not is_replay(backend):
+            _record_ledger(request, tags, response)
+    finally:
+        ledger.settle((tags or {}).get("run"), reserved)
+    record_latency(key, seconds)
+    if CALL_LOG_PATH and not is_replay(backend):
+        _log_call(request, tags, seconds, response)
+    return response
+
+
+def _count_wasted(future):
+    # Loser of a hedge race: whatever it used is wasted (nothing, if it was still queued for a slot)
+    if future.cancelled() or isinstance(future.exception(), Cancelled):
+        return
+    _bump("wasted_calls")
+    if future.exception() is None:
+        _bump("wasted_tokens", response_tokens(future.result()))
+
+
+def _hedged_call(request, key, backend, tags, hedge_model, session=None, cancel_token=None, reserved=0.0,
+                 notice=None):
+    # The backup has its own token: a primary win pulls it out of the fair_share queue before it is sent
+    backup_token = CancelToken()
+    started = threading.Event()
+    primary = _executor.submit(_timed_call, request, key, backend, tags, session, started, cancel_token, reserved,
+                               notice, backup_token)
+    primary.add_done_callback(lambda _: started.set())
+
+    # The hedge delay runs from when the primary got a slot, not from when it was queued
+    started.wait()
+    done, _ = wait([primary], timeout=hedge_delay(key))
+    if done:
+        return primary.result()
+
+    # Primary is a straggler, race a duplicate against it (if the budgets can cover one more call)
+    backup_request = dict(request, model=hedge_model or request["model"])
+    run_id = (tags or {}).get("run")
+    try:
+        backup_reserved = _reserve(backup_request, run_id, backend)
+    except ledger.BudgetExceeded:
+        return primary.result()
+    _bump("hedged")
+    if cancel_token is not None:
+        cancel_token.on_cancel(backup_token.cancel)
+    backup = _executor.submit(_timed_call, backup_request, key, backend, tags, session, None, backup_token,
+                              backup_reserved)
+
+    try:
+        pending = {primary, backup}
+        errors = []
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    errors.append(future.exception())
+                    continue
+
+                # First success wins, cancel (or write off) the other one. A backup still queued for a slot has
+                # left the queue already (the primary cancelled backup_token) and settled its reservation
+                for loser in pending:
+                    if loser.cancel():
+                        ledger.settle(run_id, backup_reserved)  # Only the backup can still be waiting to start
+                    else:
+                        loser.add_done_callback(_count_wasted)
+                if future is backup:
+                    _bump("hedge_wins")
+                return future.result()
+
+        raise errors[0]
+    finally:
+        if cancel_token is not None:
+            cancel_token.remove_callback(backup_token.cancel)
+
+
+def request_key(request) -> str:
+    """Identity of a request for coalescing: equal keys would send exactly the same API call."""
+    return hashlib.sha256(json.dumps(request, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _cancellable(fn, cancel_token):
+    """
+    fn() on the call pool, returning its result, or raising Cancelled as soon
+    as cancel_token is cancelled. An abandoned fn() still runs to completion
+    there (so a call already sent is still recorded), but nobody waits for it.
+    """
+    if cancel_token is None:
+        return fn()
+    cancel_token.raise_if_cancelled("Call")
+
+    finished = threading.Event()
+    future = _call_executor.submit(fn)
+    future.add_done_callback(lambda _: finished.set())
+    cancel_token.on_cancel(finished.set)
+    try:
+        finished.wait()
+    finally:
+        cancel_token.remove_callback(finished.set)
+    if not future.done():
+        future.cancel()
+        raise Cancelled("Call cancelled")
+    return future.result()
+
+
+def _send(request, backend, tags, run_id, hedge, hedge_model, session=None, cancel_token=None, notice=None):
+    # Refuse before sending if the run / day budget can't cover this call
+    reserved = _reserve(request, run_id, backend)
+
+    key = _latency_key(request, tags)
+    _bump("calls")
+
+    if hedge is None:
+        hedge = HEDGE_ENABLED
+    if hedge:
+        return _hedged_call(request, key, backend, tags, hedge_model, session, cancel_token, reserved, notice)
+    return _timed_call(request, key, backend, tags, session, cancel_token=cancel_token, reserved=reserved,
+                       notice=notice)
+
+
+# ----------- Main entry point -----------
+def chat_completion(messages, model=DEFAULT_MODEL, max_tokens=None, temperature=0.7,
+                    tags=None, hedge=None, hedge_model=HEDGE_FALLBACK_MODEL, timeout=None, cancel_token=None,
+                    backend=None):
+    """
+    Send a chat completion request and return the OpenAI-style response dict.
+
+    tags: metadata about the call, e.g. {"section": "Recommendations"}
+    hedge: override HEDGE_ENABLED for this call
+    hedge_model: model for the duplicate request (defaults to the same model)
+    timeout: seconds to wait for this response (defaults to the client's timeout)
+    cancel_token: cancellation.CancelToken, raises Cancelled once it is cancelled (queued or in flight)
+    backend: performs the request (see set_backend), defaults to the process-wide one
+    """
+    backend = backend or _backend
+    request = {"model": model, "messages": messages, "temperature": temperature}
+    if max_tokens is not None:
+        request["max_tokens"] = max_tokens
+    if timeout is not None:
+        request["request_timeout"] = timeout
+
+    # Tags passed by the caller win over the run scope's
+    scope = _current_scope.get()
+    run_id = scope["run"] if scope else None
+    if scope:
+        tags = {**scope, **(tags or {})}
+
+    # Identical requests in flight (a double-click, colleagues on the same minutes) share one response
+    session = fair_share.current_session()
+    # Taken here: with a cancel_token (or hedging) the call waits for its slot on a pool thread
+    notice = fair_share.current_notice()
+    # Only calls to the same backend can share (a cassette replay must not join a live call)
+    key = f"{id(backend):x}:{request_key(request)}"
+    while True:
+        try:
+            response, shared = _cancellable(
+                lambda: _in_flight.do(key, lambda: _send(request, backend, tags, run_id, hedge, hedge_model,
+                                                         session, cancel_token, notice)),
+                cancel_token)
+            break
+        except Cancelled:
+            if cancel_token is not None and cancel_token.is_set():
+                raise
+            # Joined an identical call whose own caller cancelled it, send it ourselves
+
+    if shared:
+        _bump("coalesced")
+        return response
+
+    if run_id is not None:
+        _record_usage(run_id, response)
+    return response
@@ -0,0 +1,243 @@
+"""
+Structured "minutes digest" shared by all document generators.
+
+One extraction call per upload pulls the facts every document needs (vision,
+mission, customers, value proposition, focus areas, success...) out of the
+minutes into a compact, validated JSON digest. Each fact keeps references to
+the minutes paragraphs it came from, so prompts can send the digest plus a few
+targeted excerpts instead of the full minutes.
+
+Digests are cached on disk next to the other run caches, keyed by a hash of the
+minutes and company name.
+"""
+import hashlib
+import json
+import os
+import re
+
+import llm
+import routing
+from cancellation import Cancelled
+from minutes_outline import build_outline
+
+CACHE_DIR = os.getenv("MML_DIGEST_CACHE", os.path.join(".cache", "digests"))
+MAX_EXCERPT_PARAGRAPHS = 12                         # Per prompt, keeps excerpts targeted
+
+# Single-statement facts
+TEXT_FIELDS = ["purpose", "vision", "mission", "goals", "customers", "value_proposition",
+               "products_services", "success_definition"]
+
+# Strategy sections -> the digest fields their excerpts come from
+SECTION_FIELDS = {
+    "Scope of Project": ["purpose", "focus_areas"],
+    "Definition of Success": ["success_definition", "goals"],
+    "Purpose of Starting the Business": ["purpose"],
+    "Vision": ["vision"],
+    "Mission": ["mission"],
+    "Goals": ["goals"],
+    "Product Service Offering": ["products_services"],
+    "Customer Segments": ["customers"],
+    "Value Proposition": ["value_proposition"],
+    "Channels": ["customers", "products_services"],
+    "Customer Relationships": ["customers"],
+    "Revenue Streams": ["products_services"],
+    "Key Resources": ["products_services", "focus_areas"],
+    "Key Activities": ["products_services", "focus_areas"],
+    "Key Partners": ["products_services"],
+    "Cost Structure": ["products_services", "focus_areas"],
+    "Recommendations": ["focus_areas", "success_definition"],
+    "Conclusion": ["vision", "focus_areas"],
+}
+
+# One-pager headings, in order, straight from the digest
+ONE_PAGER_FIELDS = [
+    ("Vision Statement", "vision"),
+    ("Mission Statement", "mission"),
+    ("Customers", "customers"),
+    ("Value Proposition", "value_proposition"),
+    ("Products and Services", "products_services"),
+    ("Definition of Success", "success_definition"),
+]
+
+
+def number_paragraphs(minutes) -> str:
+    return "\n".join(f"[P{i}] {paragraph}" for i, paragraph in enumerate(minutes.split("\n"), start=1))
+
+
+def build_prompt(minutes, company_name):
+    return f"""
+You are a professional business strategist who has just run a workshop for a business called "{company_name}". Below is the capture of the workshop, with every paragraph numbered like [P12].
+
+Extract the key facts into JSON. Every statement must be grounded in the minutes. Use British English spelling.
+
+Return ONLY a JSON object with exactly these keys:
+{{
+  "purpose": {{"summary": "...", "sources": [1, 2]}},
+  "vision": {{"summary": "...", "sources": []}},
+  "mission": {{"summary": "...", "sources": []}},
+  "goals": {{"summary": "...", "sources": []}},
+  "customers": {{"summary": "...", "sources": []}},
+  "value_proposition": {{"summary": "...", "sources": []}},
+  "products_services": {{"summary": "...", "sources": []}},
+  "success_definition": {{"summary": "...", "sources": []}},
+  "focus_areas": [{{"name": "...", "detail": "...", "sources": []}}]
+}}
+
+Rules:
+- Each "summary" is a polished statement of 35 words or less, written for a client-facing one-page strategy
+- "vision" is a single inspiring sentence
+- "sources" lists the paragraph numbers (the number from [P12]) the fact was taken from
+- "focus_areas" lists every focus area / action area named in the minutes, in priority order
+- If something was not discussed, write the most reasonable summary from the rest of the minutes and leave "sources" empty
+
+Workshop Capture:
+\"\"\"
+{number_paragraphs(minutes)}
+\"\"\"
+"""
+
+
+def _clean_sources(sources, paragraph_count):
+    if not isinstance(sources, list):
+        return []
+    return sorted({s for s in sources if isinstance(s, int) and 1 <= s <= paragraph_count})
+
+
+def validate_digest(data, paragraph_count) -> dict:
+    """
+    Check the shape of a digest and drop paragraph references that don't exist.
+    Raises ValueError if a required field is missing.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Digest is not a JSON object.")
+
+    digest = {}
+    for field in TEXT_FIELDS:
+        entry = data.get(field)
+        if not isinstance(entry, dict) or not isinstance(entry.get("summary"), str) or not entry["summary"].strip():
+            raise ValueError(f"Digest field '{field}' is missing or empty.")
+        digest[field] = {"summary": entry["summary"].strip(),
+                         "sources": _clean_sources(entry.get("sources"), paragraph_count)}
+
+    focus_areas = data.get("focus_areas")
+    if not isinstance(focus_areas, list):
+        raise ValueError("Digest field 'focus_areas' is missing.")
+    digest["focus_areas"] = [
+        {"name": str(area.get("name", "")).strip(),
+         "detail": str(area.get("detail", "")).strip(),
+         "sources": _clean_sources(area.get("sources"), paragraph_count)}
+        for area in focus_areas if isinstance(area, dict) and area.get("name")
+    ]
+    return digest
+
+
+def extract_json_object(content):
+    match = re.search(r"\{.*\}", content, re.DOTALL)
+    if not match:
+        raise ValueError("No JSON object in digest response.")
+    try:
+        return json.loads(match.group(0))
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Digest response is not valid JSON: {e}")
+
+
+def extract_digest(minutes, company_name, backend=None) -> dict:
+    route = routing.route_for_document("minutes_digest")
+    response = llm.chat_completion(
+        model=route["model"],
+        messages=[{"role": "user", "content": build_prompt(minutes, company_name)}],
+        max_tokens=route.get("max_tokens"),
+        temperature=route["temperature"],
+        tags={"section": "Minutes Digest", "doc_type": "minutes_digest"},
+        backend=backend
+    )
+    data = extract_json_object(llm.response_text(response))
+    return validate_digest(data, len(minutes.split("\n")))
+
+
+def cache_key(minutes, company_name) -> str:
+    return hashlib.sha256(f"{company_name}\n{minutes}".encode("utf-8")).hexdigest()
+
+
+def get_digest(minutes, company_name, backend=None):
+    """
+    Cached digest for these minutes, extracting it on first use.
+    Returns None if extraction fails (a bad response, an API error, a budget
+    refusal), callers then fall back to the full minutes. Cancelled is re-raised.
+    """
+    path = os.path.join(CACHE_DIR, f"{cache_key(minutes, company_name)}.json")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        print(f"Unreadable digest cache {path}, extracting again: {e}")
+
+    try:
+        digest = extract_digest(minutes, company_name, backend)
+    except Cancelled:
+        raise
+    except Exception as e:
+        print(f"Minutes digest failed, using full minutes: {type(e).__name__}: {e}")
+        return None
+
+    # Written then renamed, so a crash mid-write can't leave a half-written cache file
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(digest, f, indent=2)
+    os.replace(tmp_path, path)
+    return digest
+
+
+# ----------- Consuming the digest -----------
+def format_digest(digest) -> str:
+    lines = []
+    for field in TEXT_FIELDS:
+        lines.append(f"{field.replace('_', ' ').title()}: {digest[field]['summary']}")
+    lines.append("Focus Areas:")
+    for area in digest["focus_areas"]:
+        lines.append(f"- {area['name']}: {area['detail']}")
+    return "\n".join(lines)
+
+
+def field_sources(digest, fields) -> list:
+    sources = set()
+    for field in fields:
+        if field == "focus_areas":
+            for area in digest["focus_areas"]:
+                sources.update(area["sources"])
+        else:
+            sources.update(digest[field]["sources"])
+    return sorted(sources)
+
+
+def excerpts(minutes, sources, limit=MAX_EXCERPT_PARAGRAPHS) -> str:
+    paragraphs = minutes.split("\n")
+    return "\n".join(paragraphs[s - 1] for s in sources[:limit] if s <= len(paragraphs))
+
+
+def section_excerpts(minutes, digest, heading, limit=MAX_EXCERPT_PARAGRAPHS) -> str:
+    """The minutes paragraphs one strategy section (or "Recommendations" for the action plan) needs."""
+    fields = SECTION_FIELDS.get(heading)
+    if fields is None:
+        # Custom ***Heading*** section: the text written under it, capped like the digest's excerpts
+        paragraphs = [p for p in build_outline(minutes).section_body(heading).split("\n") if p.strip()]
+        return "\n".join(paragraphs[:limit])
+    return excerpts(minutes, field_sources(digest, fields), limit)
+
+
+def section_context(minutes, digest, heading) -> str:
+    """Digest plus the excerpts relevant to one strategy section, as a single block of text."""
+    excerpt = section_excerpts(minutes, digest, heading)
+    return f"{format_digest(digest)}\n\nRelevant excerpts from the minutes:\n{excerpt or '(none)'}"
+
+
+def action_plan_excerpts(minutes, digest) -> str:
+    return section_excerpts(minutes, digest, "Recommendations")
+
+
+def one_pager_content(digest) -> dict:
+    """One-pager heading -> text, ready for generate_one_pager without another API call."""
+    return {heading: digest[field]["summary"] for heading, field in ONE_PAGER_FIELDS}
@@ -0,0 +1,106 @@
+"""
+Outline index of the minutes, built in one pass.
+
+Finds every ***Heading*** marker and the "Business Structure Mapping" anchor
+once, with offsets and section bodies, so placing custom sections and pulling
+excerpts no longer rescan (and lower-case) the whole minutes per heading.
+Repeated headings are merged: the first occurrence decides the position, and
+the bodies of all occurrences are kept.
+"""
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+ANCHOR_PHRASE = "Business Structure Mapping"
+HEADING_PATTERN = re.compile(r"\*\*\*(.*?)\*\*\*")
+
+# start/end: span of the ***marker***, body_start/body_end: text up to the next marker or the anchor
+OutlineHeading = namedtuple("OutlineHeading", ["name", "raw", "start", "end", "body_start", "body_end"])
+
+
+def smart_capitalize(text):
+    text = text.lower()
+    result = []
+    capitalize_next = True
+    for char in text:
+        if capitalize_next and char.isalpha():
+            result.append(char.upper())
+            capitalize_next = False
+        else:
+            result.append(char)
+        if char == ' ':
+            capitalize_next = True
+    return "".join(result)
+
+
+def clean_heading(heading):
+    # Trim leading/trailing whitespace
+    heading = heading.strip()
+
+    # Remove leading number/dot patterns, with or without space (e.g., "2. ", "2.1.", "10.2. ")
+    heading = re.sub(r'^\d+(?:\.\d+)*\.?\s*', '', heading)
+
+    # Remove trailing colon ":  "
+    heading = heading.rstrip(':')
+
+    # Final strip to catch " :  "
+    heading = heading.strip()
+
+    # Smart capitalize
+    return smart_capitalize(heading)
+
+
+class Outline:
+    def __init__(self, minutes, anchor_phrase=ANCHOR_PHRASE):
+        self.minutes = minutes
+
+        anchor = re.search(re.escape(anchor_phrase), minutes, re.IGNORECASE)
+        self.anchor_index = anchor.start() if anchor else -1
+
+        matches = list(HEADING_PATTERN.finditer(minutes))
+        self.occurrences = []
+        for i, match in enumerate(matches):
+            body_end = matches[i + 1].start() if i + 1 < len(matches) else len(minutes)
+            if match.end() <= self.anchor_index < body_end:
+                body_end = self.anchor_index        # The anchor starts the business model part
+            self.occurrences.append(OutlineHeading(
+                name=clean_heading(match.group(1)),
+                raw=match.group(1),
+                start=match.start(),
+                end=match.end(),
+                body_start=match.end(),
+                body_end=body_end,
+            ))
+
+        # Unique headings in order of first appearance
+        self._by_name = {}
+        for occurrence in self.occurrences:
+            if occurrence.name:
+                self._by_name.setdefault(occurrence.name, []).append(occurrence)
+        self.headings = [occurrences[0] for occurrences in self._by_name.values()]
+
+    def position(self, name) -> str:
+        """"before" / "after" the anchor for the first occurrence, "unknown" if not a heading."""
+        occurrences = self._by_name.get(name)
+        if not occurrences:
+            return "unknown"
+        if self.anchor_index == -1:
+            return "before"
+        return "before" if occurrences[0].start < self.anchor_index else "after"
+
+    def before_anchor(self) -> list:
+        return [h.name for h in self.headings if self.position(h.name) == "before"]
+
+    def after_anchor(self) -> list:
+        return [h.name for h in self.headings if self.position(h.name) == "after"]
+
+    def section_body(self, name) -> str:
+        """Text under every occurrence of a heading, up to the next marker."""
+        occurrences = self._by_name.get(name, [])
+        return "\n".join(self.minutes[h.body_start:h.body_end].strip() for h in occurrences).strip()
+
+
+@lru_cache(maxsize=8)
+def build_outline(minutes, anchor_phrase=ANCHOR_PHRASE) -> Outline:
+    # Cached: every section of a report asks for the outline of the same minutes
+    return Outline(minutes, anchor_phrase)
@@ -0,0 +1,134 @@
+"""
+Rendering of the one-pager .docx (python-docx + docxcompose for the cover page).
+
+Kept apart from generate_one_pager so generating the summary doesn't pay for
+importing python-docx; generate_one_pager.generate_one_pager imports this on
+first use.
+"""
+from io import BytesIO
+
+from docxcompose.composer import Composer
+
+from docx import Document
+from docx.shared import Inches, Pt, RGBColor
+from docx.enum.section import WD_ORIENT
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+
+
+def generate_one_pager(company_name, content_dict, output_path) -> BytesIO:
+    doc = Document("template.docx")
+    
+    # Set to portrait and A4
+    section = doc.sections[0]
+    section.orientation = WD_ORIENT.PORTRAIT
+    section.page_height = Inches(11.69)
+    section.page_width = Inches(8.27)
+
+    # Set standard margins (optional tweak)
+    section.top_margin = section.bottom_margin = Pt(72)  # 1 inch
+    section.left_margin = section.right_margin = Pt(72)
+
+    # Set default font
+    style = doc.styles['Normal']
+    font = style.font
+    font.name = 'Calibri'
+    font.size = Pt(12)
+
+    # Set global line spacing to 1.3
+    paragraph_format = style.paragraph_format
+    paragraph_format.space_after = Pt(0)
+    paragraph_format.line_spacing = 1.15
+
+    # Add each section
+    for heading, text in content_dict.items():
+        # Heading
+        heading_para = doc.add_paragraph()
+        heading_run = heading_para.add_run(heading)
+        heading_run.font.name = 'Calibri'
+        heading_run.font.size = Pt(18)
+        heading_run.font.bold = True
+        heading_run.font.color.rgb = RGBColor(255, 153, 0)
+
+        # Content
+        # Add quotes for Vision and Mission Statements
+        if heading == "Vision Statement" or heading == "Mission Statement":
+            text = "“" + text + "”"  
+
+        body_para = doc.add_paragraph(text)
+        for run in body_para.runs:
+            run.font.name = 'Calibri'
+            run.font.size = Pt(12)
+
+        # Double New Lines between Paragraph and New Heading (except at the very last heading)
+        if heading != "Definition of Success":
+            doc.add_paragraph()
+            doc.add_paragraph()
+
+    # Save
+    # doc.save(output_path)
+    doc_cover = Document()
+    section = doc_cover.sections[0]
+    section.orientation = WD_ORIENT.PORTRAIT
+    section.page_height = Inches(11.69)
+    section.page_width = Inches(8.27)
+
+    # Set standard margins (optional tweak)
+    section.top_margin = section.bottom_margin = Pt(72)  # 1 inch
+    section.left_margin = section.right_margin = Pt(72)
+
+    style = doc_cover.styles['Normal']
+    font = style.font
+    font.name = 'Calibri'
+    font.size = Pt(12)
+
+    # Set global line spacing to 1.3
+    paragraph_format = style.paragraph_format
+    paragraph_format.space_after = Pt(0)
+    paragraph_format.line_spacing = 1.15
+
+    insert_cover_page(doc_cover, company_name=company_name, logo_path="Logo3.png")
+    composer = Composer(doc_cover)
+
+    composer.append(doc)
+
+    # doc_cover.save(output_path)
+    buffer = BytesIO()
+    doc_cover.save(buffer)
+    buffer.seek(0)  # Move back to the beginning so Streamlit can read it
+    return buffer
+
+def insert_cover_page(doc, company_name, logo_path=None):
+    # Add blank lines to push text down
+    for _ in range(10):  # Adjust number as needed for vertical spacing
+        doc.add_paragraph()
+
+    # Add Company Name (centered, large, orange, bold)
+    para1 = doc.add_paragraph()
+    run1 = para1.add_run(company_name)
+    run1.font.name = 'Calibri'
+    run1.font.size = Pt(44)
+    run1.font.color.rgb = RGBColor(255, 153, 0)  # Orange (#FF9900)
+    run1.bold = True
+    para1.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    # Add "Strategy Report" below
+    para2 = doc.add_paragraph()
+    run2 = para2.add_run("1-Page Strategy")
+    run2.font.name = 'Calibri'
+    run2.font.size = Pt(44)
+    run2.font.color.rgb = RGBColor(255, 153, 0)  # Orange (#FF9900)
+    run2.bold = True
+    para2.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    # Optional spacing before logo
+    doc.add_paragraph()
+
+    # Insert logo if provided
+    if logo_path:
+        logo_para = doc.add_paragraph()
+        logo_run = logo_para.add_run()
+        logo_run.add_picture(logo_path, width=Inches(2))
+        logo_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    # Add a page break after the cover page
+    doc.add_page_break()
@@ -0,0 +1,195 @@
+"""
+On-demand profiling of generation runs.
+
+profile_run() wraps a run in cProfile and tracemalloc when profiling is on,
+and does nothing otherwise. For each profiled run it saves
+    <run>-<label>.pstats       open with python -m pstats, snakeviz, ...
+    <run>-<label>.txt          top functions and top allocations
+in PROFILE_DIR, and keeps the same summary in memory (result(run_id)) so the
+app can show the hotspots under the document.
+
+Switched on for every run with MML_PROFILE=1, or per session from the
+admin-only toggle in the app's sidebar.
+
+What is measured:
+ - cProfile covers the thread the run is on: prompt building, rendering and
+   the time spent waiting for API calls (llm sends those from its own pool,
+   they show up here as lock waits and are totalled separately).
+ - tracemalloc is process-wide, so allocations by other sessions' runs at the
+   same time are included. Allocations are snapshotted every
+   SNAPSHOT_INTERVAL while the run goes, and the summary lists the top lines
+   of the snapshot taken closest to the peak.
+"""
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+from contextlib import contextmanager
+
+PROFILE_ENABLED = os.getenv("MML_PROFILE", "0") == "1"
+PROFILE_DIR = os.getenv("MML_PROFILE_DIR", os.path.join(".cache", "profiles"))
+TOP_FUNCTIONS = 15
+TOP_ALLOCATIONS = 15
+TRACEMALLOC_FRAMES = 1                              # Frames kept per allocation, more is slower
+SNAPSHOT_INTERVAL = 0.25                            # Seconds between allocation snapshots
+PROFILE_LIMIT = 50                                  # Runs whose results are kept in memory
+WAIT_FUNCTIONS = {"acquire", "wait", "sleep", "select", "poll"}  # Builtins that block, not CPU
+
+_lock = threading.Lock()
+_active = 0                                         # Profiled runs in progress (tracemalloc is shared)
+_results = OrderedDict()                            # run_id -> summary of its latest profiled run
+
+
+# ----------- Summaries -----------
+def _function_name(func) -> str:
+    filename, line, name = func
+    if filename == "~":
+        return name                                 # Builtin, e.g. {method 'acquire' of '_thread.lock' objects}
+    return f"{os.path.basename(filename)}:{line}({name})"
+
+
+def _is_wait(func) -> bool:
+    filename, _, name = func
+    return filename == "~" and any(f"'{wait}'" in name or name.endswith(f".{wait}>") for wait in WAIT_FUNCTIONS)
+
+
+def hotspots(stats, limit=TOP_FUNCTIONS) -> list:
+    """Top functions by time spent in the function itself, blocking waits left out."""
+    rows = []
+    for func, (_, calls, self_time, cumulative, _) in stats.stats.items():
+        if not _is_wait(func):
+            rows.append({"function": _function_name(func), "calls": calls, "self_s": round(self_time, 4),
+                         "cumulative_s": round(cumulative, 4)})
+    rows.sort(key=lambda row: row["self_s"], reverse=True)
+    return rows[:limit]
+
+
+def wait_seconds(stats) -> float:
+    return sum(self_time for func, (_, _, self_time, _, _) in stats.stats.items() if _is_wait(func))
+
+
+def top_allocations(snapshot, limit=TOP_ALLOCATIONS) -> list:
+    if snapshot is None:
+        return []
+    snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+    return [{"line": f"{os.path.basename(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+             "size_kb": round(stat.size / 1024, 1), "blocks": stat.count}
+            for stat in snapshot.statistics("lineno")[:limit]]
+
+
+def format_summary(result) -> str:
+    lines = [
+        f"Run {result['run']} ({result['label']}): {result['wall_s']:.2f}s wall, {result['cpu_s']:.2f}s CPU, "
+        f"{result['wait_s']:.2f}s waiting, peak traced memory {result['peak_mb']:.1f} MB",
+        "",
+        f"{'self s':>8} {'cum s':>8} {'calls':>8}  function",
+    ]
+    lines += [f"{row['self_s']:>8.3f} {row['cumulative_s']:>8.3f} {row['calls']:>8}  {row['function']}"
+              for row in result["hotspots"]]
+    lines += ["", f"{'KB':>10} {'blocks':>8}  allocated at (snapshot nearest the peak)"]
+    lines += [f"{row['size_kb']:>10.1f} {row['blocks']:>8}  {row['line']}" for row in result["allocations"]]
+    return "\n".join(lines)
+
+
+# ----------- Profiling -----------
+class _Snapshots:
+    """Keeps the allocation snapshot taken when the most memory was traced."""
+
+    def __init__(self):
+        self.best, self.best_size = None, -1
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-snapshots", daemon=True)
+
+    def take(self):
+        size = tracemalloc.get_traced_memory()[0]
+        if size > self.best_size:
+            self.best, self.best_size = tracemalloc.take_snapshot(), size
+
+    def _run(self):
+        while not self._stop.wait(SNAPSHOT_INTERVAL):
+            self.take()
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.take()
+
+
+def _start_tracing():
+    global _active
+    with _lock:
+        _active += 1
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        tracemalloc.reset_peak()
+
+
+def _stop_tracing():
+    global _active
+    with _lock:
+        _active -= 1
+        if _active == 0:
+            tracemalloc.stop()
+
+
+@contextmanager
+def profile_run(run_id, label="run", enabled=None):
+    """
+    Profile the block when enabled (default: PROFILE_ENABLED), otherwise just
+    run it. Yields the result dict, filled in once the block has finished (None when off).
+    """
+    if not (PROFILE_ENABLED if enabled is None else enabled):
+        yield None
+        return
+
+    result = {"run": run_id or "norun", "label": label}
+    profiler = cProfile.Profile()
+    _start_tracing()
+    snapshots = _Snapshots()
+    snapshots.start()
+    wall, cpu = time.perf_counter(), time.thread_time()
+    profiler.enable()
+    try:
+        yield result
+    finally:
+        profiler.disable()
+        result["wall_s"] = time.perf_counter() - wall
+        result["cpu_s"] = time.thread_time() - cpu
+        snapshots.stop()
+        result["peak_mb"] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        _stop_tracing()
+        _save(profiler, snapshots.best, result)
+
+
+def _save(profiler, snapshot, result):
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    result["wait_s"] = wait_seconds(stats)
+    result["hotspots"] = hotspots(stats)
+    result["allocations"] = top_allocations(snapshot)
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, f"{result['run']}-{result['label']}")
+    result["pstats_path"] = f"{base}.pstats"
+    result["summary_path"] = f"{base}.txt"
+    stats.dump_stats(result["pstats_path"])
+    with open(result["summary_path"], "w", encoding="utf-8") as f:
+        f.write(format_summary(result) + "\n")
+
+    with _lock:
+        _results.pop(result["run"], None)
+        _results[result["run"]] = result
+        while len(_results) > PROFILE_LIMIT:
+            _results.popitem(last=False)
+
+
+def result(run_id):
+    """Summary of the run's latest profiled generation, None if it wasn't profiled."""
+    with _lock:
+        return _results.get(run_id)
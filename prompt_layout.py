@@ -0,0 +1,34 @@
+"""
+Canonical prompt layout shared by every document of a run.
+
+Providers cache long prompt prefixes automatically, but only when the prefix is
+byte-identical and comes first. So every call (all strategy sections, the
+one-pager and the action plan) is laid out as:
+
+    system: shared header for the company + workshop minutes   <- identical, cacheable
+    user:   document / section specific instructions           <- varies per call
+
+Nothing call-specific (section names, token limits, excerpts) may go into the
+system message.
+"""
+
+SHARED_HEADER = """You are a professional business strategist who has just run a workshop for a business called "{company_name}". You've gathered key insights from the workshop, captured in the minutes below, that now need to be turned into professional, high-quality documents.
+
+All writing should use British English spelling and conventions. Where appropriate, expand upon the ideas captured during the workshop to ensure clarity, completeness, and usefulness.
+
+Write in a professional tone using clear, direct language. Avoid overly formal or common ChatGPT phrases like "delve," "poise," "robust," etc."""
+
+
+def shared_header(company_name) -> str:
+    return SHARED_HEADER.format(company_name=company_name)
+
+
+def shared_prefix(header, minutes) -> str:
+    return f"{header}\n\n=== Workshop Minutes ===\n{minutes}"
+
+
+def build_messages(header, minutes, instructions) -> list:
+    return [
+        {"role": "system", "content": shared_prefix(header, minutes)},
+        {"role": "user", "content": instructions},
+    ]
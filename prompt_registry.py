@@ -0,0 +1,145 @@
+"""
+Compiled strategy report prompts, keyed by section heading.
+
+prompts.json (or a variant such as test_prompts.json, via MML_PROMPTS_FILE) is
+loaded once, every section heading is mapped to its prompt by key (not by
+position) and the static part of each section's instructions is rendered up
+front. Coverage is checked on load, so a missing or renamed key fails at
+startup instead of quietly pairing sections with the wrong prompts.
+
+get_registry() reloads the file when its mtime changes, so prompts can be
+edited without restarting Streamlit. A reload that fails validation keeps the
+previous prompts.
+
+An optional "_conventions" entry holds formatting rules shared by every
+section (see prompt_tokens.py --compact). It is rendered at the start of each
+section's instructions, right after the objective, so it is part of the prefix
+the provider caches across sections instead of being repeated in each prompt.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import namedtuple
+
+PROMPTS_PATH = os.getenv("MML_PROMPTS_FILE", "prompts.json")
+
+# Section heading -> key in prompts.json
+SECTION_KEYS = {
+    "Our Approach": "our_approach",
+    "Scope of Project": "scope_of_project",
+    "Definition of Success": "definition_of_success",
+    "Purpose of Starting the Business": "purpose_of_starting",
+    "Vision": "vision",
+    "Mission": "mission",
+    "Goals": "goals",
+    "Product Service Offering": "product_service_offering",
+    "Customer Segments": "customer_segments",
+    "Value Proposition": "value_proposition",
+    "Channels": "channels",
+    "Customer Relationships": "customer_relationships",
+    "Revenue Streams": "revenue_streams",
+    "Key Resources": "key_resources",
+    "Key Activities": "key_activities",
+    "Key Partners": "key_partners",
+    "Cost Structure": "cost_structure",
+    "Recommendations": "recommendations",
+    "Conclusion": "conclusion",
+}
+
+CONVENTIONS_KEY = "_conventions"                    # Keys starting with "_" are not sections
+
+STRATEGY_OBJECTIVE = ("The objective is to generate a well-written, detailed, and structured section of a business "
+                      "strategy report based on the provided workshop minutes. The writing must be clear, actionable, "
+                      "and appropriate for a professional audience.")
+
+# instructions: the pre-rendered, call-independent part of the section's user message
+CompiledPrompt = namedtuple("CompiledPrompt", ["heading", "key", "text", "instructions"])
+
+
+class PromptRegistryError(ValueError):
+    """The prompts file doesn't cover the report's sections."""
+
+
+def render_instructions(section_prompt, conventions=None) -> str:
+    shared = f"{STRATEGY_OBJECTIVE}\n\n"
+    if conventions:
+        shared += f"=== Formatting Conventions ===\n{conventions}\n\n"
+    return (f"{shared}=== Section Instructions ===\n{section_prompt}\n\n"
+            "Do not include a section heading at the start of your response.")
+
+
+def compile_prompts(raw, source="prompts") -> dict:
+    """heading -> CompiledPrompt, raising PromptRegistryError unless every section has a usable prompt."""
+    if not isinstance(raw, dict):
+        raise PromptRegistryError(f"{source}: expected a JSON object of key -> prompt")
+
+    missing = [key for key in SECTION_KEYS.values() if not isinstance(raw.get(key), str) or not raw[key].strip()]
+    if missing:
+        unknown = sorted(key for key in set(raw) - set(SECTION_KEYS.values()) if not key.startswith("_"))
+        message = f"{source}: no prompt for {', '.join(missing)}"
+        if unknown:
+            message += f" (unrecognised keys: {', '.join(unknown)})"
+        raise PromptRegistryError(message)
+
+    conventions = raw.get(CONVENTIONS_KEY)
+    return {heading: CompiledPrompt(heading, key, raw[key], render_instructions(raw[key], conventions))
+            for heading, key in SECTION_KEYS.items()}
+
+
+class PromptRegistry:
+    def __init__(self, path=PROMPTS_PATH):
+        self.path = path
+        self.mtime = os.stat(path).st_mtime_ns
+        with open(path, "rb") as f:
+            data = f.read()
+        self.version = hashlib.sha256(data).hexdigest()[:12]  # Changes with any edit to the prompts
+        self.prompts = compile_prompts(json.loads(data.decode("utf-8")), path)
+
+    def __contains__(self, heading):
+        return heading in self.prompts
+
+    def get(self, heading) -> CompiledPrompt:
+        try:
+            return self.prompts[heading]
+        except KeyError:
+            raise PromptRegistryError(f"{self.path}: no prompt for section '{heading}'") from None
+
+    def instructions(self, heading) -> str:
+        return self.get(heading).instructions
+
+    def check(self, headings):
+        """Raise unless every heading (e.g. the report's SECTIONS) has a prompt."""
+        missing = [heading for heading in headings if heading not in self.prompts]
+        if missing:
+            raise PromptRegistryError(f"{self.path}: no prompt for section(s) {', '.join(missing)}")
+
+
+_lock = threading.Lock()
+_registries = {}                                    # path -> PromptRegistry
+
+
+def get_registry(path=PROMPTS_PATH) -> PromptRegistry:
+    """
+    The registry for a prompts file, reloaded if the file changed since it was loaded.
+    The first load raises on a bad file; later failed reloads keep the previous prompts.
+    """
+    with _lock:
+        registry = _registries.get(path)
+        if registry is None:
+            registry = _registries[path] = PromptRegistry(path)
+            return registry
+
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return registry                         # Mid-save or removed, keep serving what we have
+        if mtime == registry.mtime:
+            return registry
+
+        try:
+            registry = _registries[path] = PromptRegistry(path)
+        except (OSError, ValueError) as e:
+            print(f"Reloading {path} failed, keeping previous prompts: {e}")
+            registry.mtime = mtime                  # Don't retry until the file changes again
+        return registry
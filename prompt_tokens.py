@@ -0,0 +1,222 @@
+"""
+Token accounting for the strategy report prompts, no API calls.
+
+    python prompt_tokens.py minutes.docx --company "Pal's Pickling Plant"
+    python prompt_tokens.py minutes.docx --prompts test_prompts.json
+    python prompt_tokens.py minutes.docx --compact prompts.compact.json
+
+Lists every section the minutes would produce with its routed model,
+instruction tokens, total prompt tokens (shared prefix + instructions) and
+projected cost, then report totals with and without prefix caching. Output
+tokens are projected at each section's token_limit.
+
+--compact writes a compacted copy of the prompts file and prints the token
+diff: whitespace is normalised and sentences repeated across MIN_REPEATS or
+more prompts are hoisted into the shared "_conventions" entry (see
+prompt_registry.py), which is sent once in the cached prefix instead of in
+every section's own instructions. Hoisted rules then apply to every section,
+so review the file before pointing MML_PROMPTS_FILE at it.
+"""
+import argparse
+import json
+import re
+from collections import Counter
+
+import routing
+import token_count
+from docx_stream import read_minutes
+from prompt_layout import shared_prefix
+from prompt_registry import CONVENTIONS_KEY, SECTION_KEYS, PromptRegistry, render_instructions
+
+MIN_REPEATS = 3                                     # Sentence in this many prompts -> boilerplate
+MIN_BOILERPLATE_CHARS = 30
+CACHE_MIN_TOKENS = 1024                             # Providers only cache prefixes at least this long
+CACHE_INCREMENT = 128
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+ABBREVIATIONS = ("e.g.", "i.e.", "etc.")            # A "sentence" ending in these runs into the next one
+
+
+# ----------- Report -----------
+def load_minutes(path) -> str:
+    if path.lower().endswith(".docx"):
+        return read_minutes(path)
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def cached_prefix_tokens(prefix_tokens) -> int:
+    return prefix_tokens // CACHE_INCREMENT * CACHE_INCREMENT if prefix_tokens >= CACHE_MIN_TOKENS else 0
+
+
+def section_report(minutes, company_name, registry) -> dict:
+    # Imported here: the generator checks the default prompts file on import, not needed for --compact
+    import generate_strategy_3 as strategy
+
+    global_prompt = strategy.build_global(company_name)
+    prefix_tokens = token_count.count_tokens(shared_prefix(global_prompt, minutes))
+    rows = []
+    for heading, token_limit, instructions, custom in strategy.plan_sections(minutes, registry, strategy.SECTIONS):
+        if heading == "Our Approach":
+            continue                                # Static text, no API call
+        model = routing.route_for_section(heading, token_limit, custom=custom)["model"]
+        # Only the user message differs between sections, the shared prefix is counted once
+        _, user = strategy.build_prompt(global_prompt, minutes, instructions, token_limit)
+        instruction_tokens = token_count.count_tokens(user["content"], model)
+        rows.append({
+            "section": heading,
+            "model": model,
+            "instruction_tokens": instruction_tokens,
+            "prompt_tokens": (token_count.REPLY_OVERHEAD + 2 * token_count.MESSAGE_OVERHEAD
+                              + prefix_tokens + instruction_tokens),
+            "completion_tokens": token_limit,
+        })
+
+    # Prefix caching: the first call per model writes the cache, later calls read the shared prefix from it
+    seen_models = set()
+    for row in rows:
+        cached = cached_prefix_tokens(prefix_tokens) if row["model"] in seen_models else 0
+        seen_models.add(row["model"])
+        row["cost"] = routing.estimate_cost(row["model"], row["prompt_tokens"], row["completion_tokens"])
+        row["cost_cached"] = routing.estimate_cost(row["model"], row["prompt_tokens"], row["completion_tokens"],
+                                                   cached_tokens=cached)
+
+    return {
+        "minutes_tokens": token_count.count_tokens(minutes),
+        "prefix_tokens": prefix_tokens,
+        "rows": rows,
+        "prompt_tokens": sum(row["prompt_tokens"] for row in rows),
+        "completion_tokens": sum(row["completion_tokens"] for row in rows),
+        "cost": sum(row["cost"] for row in rows),
+        "cost_cached": sum(row["cost_cached"] for row in rows),
+    }
+
+
+def counter_note() -> str:
+    if token_count.exact():
+        return "Token counts: tiktoken"
+    return "Token counts: ESTIMATES (tiktoken or its encoding unavailable), not BPE counts"
+
+
+def print_report(report):
+    print(counter_note())
+    print(f"Minutes: {report['minutes_tokens']:,} tokens   shared prefix (header + minutes): "
+          f"{report['prefix_tokens']:,} tokens")
+    print()
+    header = f"{'Section':34} {'Model':12} {'instr':>6} {'prompt':>8} {'output':>7} {'$':>8} {'$ cached':>9}"
+    print(header)
+    print("-" * len(header))
+    for row in report["rows"]:
+        print(f"{row['section'][:34]:34} {row['model']:12} {row['instruction_tokens']:>6,} {row['prompt_tokens']:>8,} "
+              f"{row['completion_tokens']:>7,} {row['cost']:>8.4f} {row['cost_cached']:>9.4f}")
+    print("-" * len(header))
+    print(f"{'Total (' + str(len(report['rows'])) + ' calls)':47} {report['prompt_tokens']:>8,} "
+          f"{report['completion_tokens']:>7,} {report['cost']:>8.4f} {report['cost_cached']:>9.4f}")
+
+
+# ----------- Compaction -----------
+def normalise_whitespace(text) -> str:
+    lines = [re.sub(r"(?<=\S)[ \t]{2,}", " ", line.rstrip()) for line in text.strip().splitlines()]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines))
+
+
+def split_sentences(text) -> list:
+    sentences = []
+    for line in text.splitlines():
+        for sentence in SENTENCE_END.split(line.strip()):
+            if sentence:
+                sentences.append(sentence)
+    return sentences
+
+
+def find_boilerplate(prompts, min_repeats=MIN_REPEATS) -> list:
+    """Sentences that appear in at least min_repeats prompts, most repeated first."""
+    counts = Counter()
+    for text in prompts.values():
+        counts.update(set(split_sentences(text)))
+    return [sentence for sentence, count in counts.most_common()
+            if count >= min_repeats and len(sentence) >= MIN_BOILERPLATE_CHARS
+            and not sentence.endswith(ABBREVIATIONS) and not sentence.endswith(":")]
+
+
+def remove_sentence(text, sentence) -> str:
+    lines = []
+    for line in text.splitlines():
+        stripped = line.replace(sentence, "")
+        if stripped.strip() or not line.strip():    # Drop lines that held only the sentence
+            lines.append(stripped)
+    return normalise_whitespace("\n".join(lines))
+
+
+def compact_prompts(raw, min_repeats=MIN_REPEATS):
+    """Returns (compacted prompts dict, hoisted sentences)."""
+    compacted = {key: normalise_whitespace(value) if isinstance(value, str) else value for key, value in raw.items()}
+    sections = {key: compacted[key] for key in SECTION_KEYS.values() if key in compacted}
+    boilerplate = find_boilerplate(sections, min_repeats)
+
+    for key in sections:
+        for sentence in boilerplate:
+            compacted[key] = remove_sentence(compacted[key], sentence)
+
+    if boilerplate:
+        existing = compacted.get(CONVENTIONS_KEY)
+        conventions = [existing] if existing else []
+        compacted[CONVENTIONS_KEY] = "\n".join(conventions + [f"- {sentence}" for sentence in boilerplate])
+    return compacted, boilerplate
+
+
+def token_diff(before, after) -> list:
+    """(section, tokens before, tokens after) of each section's own instructions, shared conventions excluded."""
+    rows = []
+    for heading, key in SECTION_KEYS.items():
+        rows.append((heading,
+                     token_count.count_tokens(render_instructions(before[key], before.get(CONVENTIONS_KEY))),
+                     token_count.count_tokens(render_instructions(after[key]))))
+    return rows
+
+
+def print_token_diff(before, after, boilerplate):
+    print(counter_note())
+    print(f"Hoisted {len(boilerplate)} repeated sentence(s) into {CONVENTIONS_KEY}:")
+    for sentence in boilerplate:
+        print(f"  - {sentence}")
+    print()
+
+    rows = token_diff(before, after)
+    header = f"{'Section':34} {'before':>7} {'after':>7} {'saved':>7}"
+    print(header)
+    print("-" * len(header))
+    for heading, old, new in rows:
+        print(f"{heading[:34]:34} {old:>7,} {new:>7,} {old - new:>7,}")
+    total_old, total_new = sum(r[1] for r in rows), sum(r[2] for r in rows)
+    conventions = token_count.count_tokens(after.get(CONVENTIONS_KEY, ""))
+    print("-" * len(header))
+    print(f"{'Total':34} {total_old:>7,} {total_new:>7,} {total_old - total_new:>7,}")
+    print(f"Shared conventions: {conventions:,} tokens per call, in the cached prefix")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count prompt tokens and project spend for a minutes file.")
+    parser.add_argument("minutes", help="Minutes .docx (or plain text)")
+    parser.add_argument("--company", default="the business", help="Company name used in the prompts")
+    parser.add_argument("--prompts", default="prompts.json", help="Prompts file to measure")
+    parser.add_argument("--compact", metavar="OUT", help="Write a compacted prompts file to OUT and show the diff")
+    parser.add_argument("--min-repeats", type=int, default=MIN_REPEATS)
+    args = parser.parse_args()
+
+    registry = PromptRegistry(args.prompts)
+    print_report(section_report(load_minutes(args.minutes), args.company, registry))
+
+    if args.compact:
+        with open(args.prompts, "r", encoding="utf-8") as f:
+            before = json.load(f)
+        after, boilerplate = compact_prompts(before, args.min_repeats)
+        with open(args.compact, "w", encoding="utf-8") as f:
+            json.dump(after, f, indent=2, ensure_ascii=False)
+        print()
+        print_token_diff(before, after, boilerplate)
+        print(f"Wrote {args.compact}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Model routing for every LLM call the generators make.
+
+Each strategy section, custom ***Heading*** section and document type maps to a
+model and its parameters. Sections not listed fall back to a policy based on
+their token_limit: short formulaic sections go to the fast model, long ones to
+the quality model.
+
+Routes can be overridden without a code change by pointing MML_ROUTES_FILE at a
+JSON file shaped like {"sections": {...}, "documents": {...}}.
+"""
+import json
+import os
+
+# ----------- Models -----------
+QUALITY_MODEL = "gpt-4o"
+FAST_MODEL = "gpt-4o-mini"
+
+# USD per 1M tokens: (input, output)
+PRICES_PER_MILLION = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+CACHED_INPUT_DISCOUNT = 0.5                         # Prompt tokens served from the prefix cache are half price
+BATCH_DISCOUNT = 0.5                                # Batch API requests (bulk.py) are half price
+
+# Draft previews: every call goes to the fast model with shortened budgets
+DRAFT_MODEL = FAST_MODEL
+DRAFT_TOKEN_SCALE = 0.5
+DRAFT_ONE_PAGER_MAX_TOKENS = 400
+
+# ----------- Default policy -----------
+SHORT_SECTION_LIMIT = 250                           # token_limit at or below this -> FAST_MODEL
+DEFAULT_TEMPERATURE = 0.7
+
+# ----------- Routing table -----------
+# Only sections that should NOT follow the token_limit policy need an entry
+SECTION_ROUTES = {
+    # Headline statements, quoted back to the client - keep on the quality model
+    "Vision": {"model": QUALITY_MODEL},
+    "Mission": {"model": QUALITY_MODEL},
+    "Value Proposition": {"model": QUALITY_MODEL},
+    # Formulaic business model sections
+    "Channels": {"model": FAST_MODEL},
+    "Revenue Streams": {"model": FAST_MODEL},
+    "Customer Relationships": {"model": FAST_MODEL},
+    # Long, synthesis heavy
+    "Definition of Success": {"model": QUALITY_MODEL},
+    "Recommendations": {"model": QUALITY_MODEL},
+}
+
+# Sections found in the minutes as ***Heading***, we know nothing about them
+CUSTOM_SECTION_ROUTE = {"model": QUALITY_MODEL}
+
+DOCUMENT_ROUTES = {
+    "one_pager": {"model": QUALITY_MODEL, "temperature": 0.7},
+    "action_plan": {"model": QUALITY_MODEL, "temperature": 0.3, "max_tokens": 1500},
+    "company_name": {"model": FAST_MODEL, "temperature": 0, "max_tokens": 20},
+    "minutes_digest": {"model": QUALITY_MODEL, "temperature": 0, "max_tokens": 1500},
+    "minutes_chunk_summary": {"model": FAST_MODEL, "temperature": 0, "max_tokens": 800},
+}
+
+
+def _load_overrides():
+    path = os.getenv("MML_ROUTES_FILE")
+    if not path:
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        overrides = json.load(f)
+    SECTION_ROUTES.update(overrides.get("sections", {}))
+    DOCUMENT_ROUTES.update(overrides.get("documents", {}))
+
+_load_overrides()
+
+
+def default_route(token_limit) -> dict:
+    model = FAST_MODEL if token_limit <= SHORT_SECTION_LIMIT else QUALITY_MODEL
+    return {"model": model, "temperature": DEFAULT_TEMPERATURE}
+
+
+def route_for_section(heading, token_limit, custom=False) -> dict:
+    """Model and parameters for one strategy report section."""
+    route = default_route(token_limit)
+    if custom:
+        route.update(CUSTOM_SECTION_ROUTE)
+    else:
+        route.update(SECTION_ROUTES.get(heading, {}))
+    return route
+
+
+def route_for_document(doc_type) -> dict:
+    """Model and parameters for a single-call document (one-pager, action plan...)."""
+    route = {"model": QUALITY_MODEL, "temperature": DEFAULT_TEMPERATURE}
+    route.update(DOCUMENT_ROUTES.get(doc_type, {}))
+    return route
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens, cached_tokens=0, batch=False) -> float:
+    """
+    Cost in USD, unknown models are priced as the quality model. cached_tokens is part of prompt_tokens.
+    batch: sent through the batch API rather than interactively.
+    """
+    input_price, output_price = PRICES_PER_MILLION.get(model, PRICES_PER_MILLION[QUALITY_MODEL])
+    input_cost = (prompt_tokens - cached_tokens * CACHED_INPUT_DISCOUNT) * input_price
+    cost = (input_cost + completion_tokens * output_price) / 1_000_000
+    return cost * BATCH_DISCOUNT if batch else cost
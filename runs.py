@@ -0,0 +1,105 @@
+"""
+Generation runs and their document versions.
+
+A run is one request for a document (e.g. the strategy report for a company).
+A draft and the final document produced later are versions of the same run, so
+the UI can offer the preview straight away and swap in the final document once
+background generation finishes.
+"""
+import contextvars
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+import llm
+
+FAILED_SECTIONS_LIMIT = 200                         # Runs whose failed sections are kept in memory
+
+_failed_lock = threading.Lock()
+_failed_sections = OrderedDict()                    # run_id -> {heading: error} of its latest generation
+
+
+class Run:
+    def __init__(self, company_name, doc_type, run_id=None, build_final=None, final_filename=None):
+        """
+        build_final / final_filename: see finalize_in_background, bound to the draft's inputs (minutes, company,
+        digest) so a final started after the page inputs changed is still the same document.
+        """
+        self.run_id = run_id or uuid.uuid4().hex[:8]
+        self.company_name = company_name
+        self.doc_type = doc_type
+        self.build_final = build_final
+        self.final_filename = final_filename
+        self.versions = []                          # Oldest first
+        self.finalizing = False
+        self.error = None
+        self._lock = threading.Lock()
+
+    def add_version(self, kind, data: bytes, filename) -> dict:
+        with self._lock:
+            version = {
+                "version": len(self.versions) + 1,
+                "kind": kind,                       # "draft" or "final"
+                "data": data,
+                "filename": filename,
+                "created": datetime.now(),
+            }
+            self.versions.append(version)
+        return version
+
+    def latest(self):
+        with self._lock:
+            return self.versions[-1] if self.versions else None
+
+    def is_final(self) -> bool:
+        latest = self.latest()
+        return latest is not None and latest["kind"] == "final"
+
+    def failed_sections(self) -> dict:
+        return failed_sections(self.run_id)
+
+
+def record_failed_sections(run_id, failed):
+    """
+    Sections of a run's latest generation that failed and were rendered as
+    placeholders (heading -> error), replacing what an earlier generation recorded.
+    """
+    if run_id is None:
+        return
+    with _failed_lock:
+        _failed_sections.pop(run_id, None)
+        _failed_sections[run_id] = dict(failed)
+        while len(_failed_sections) > FAILED_SECTIONS_LIMIT:
+            _failed_sections.popitem(last=False)
+
+
+def failed_sections(run_id) -> dict:
+    """heading -> error of the sections that need regenerating ({} if none)."""
+    with _failed_lock:
+        return dict(_failed_sections.get(run_id) or {})
+
+
+def finalize_in_background(run, build_final, filename) -> threading.Thread:
+    """
+    Regenerate the document at full quality on a background thread.
+    build_final: zero-argument callable returning a BytesIO docx.
+    """
+    def worker():
+        try:
+            # Usage of the final version, see llm.run_usage and ledger.run_spend
+            with llm.run_scope(run.run_id, company=run.company_name, doc_type=run.doc_type):
+                buffer = build_final()
+            run.add_version("final", buffer.getvalue(), filename)
+        except Exception as e:
+            run.error = e
+        finally:
+            run.finalizing = False
+
+    run.finalizing = True
+    run.error = None
+    # Run with a copy of the caller's context, so calls stay attributed to its fair_share session
+    thread = threading.Thread(target=contextvars.copy_context().run, args=(worker,), name=f"finalize-{run.run_id}",
+                              daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,81 @@
+"""
+Observed output lengths per strategy section, kept across runs.
+
+generate_section uses these to size max_tokens from what each section really
+needs instead of the static token_limit * 1.3, which keeps budgets (and tail
+latency) tight while never going above the static ceiling. A section cut off
+by max_tokens in one of its last TRUNCATION_WINDOW runs gets the full ceiling
+back until it stops being cut off.
+"""
+import json
+import os
+import threading
+
+STATS_PATH = os.getenv("MML_SECTION_STATS", os.path.join(".cache", "section_stats.json"))
+STATIC_BUFFER = 1.3                                 # Old fixed budget: token_limit * 1.3
+HEADROOM = 1.15                                     # Budget = p95 of observed lengths + 15%
+MIN_SAMPLES = 5                                     # Below this we keep the static budget
+MIN_BUDGET = 64
+WINDOW = 30                                         # Samples kept per section
+TRUNCATION_WINDOW = 5                               # Recent runs checked for a cut-off
+
+_lock = threading.Lock()
+_stats = None
+
+
+def _load():
+    global _stats
+    if _stats is None:
+        try:
+            with open(STATS_PATH, "r", encoding="utf-8") as f:
+                _stats = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            _stats = {}
+    return _stats
+
+
+def _save():
+    directory = os.path.dirname(STATS_PATH)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = STATS_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(_stats, f, indent=2)
+    os.replace(tmp_path, STATS_PATH)
+
+
+def record_output(section, completion_tokens, truncated=False):
+    """Store one observed output length (after any continuation) for a section."""
+    if not section:
+        return
+    with _lock:
+        entry = _load().setdefault(section, {"samples": [], "truncations": 0})
+        entry["samples"] = (entry["samples"] + [completion_tokens])[-WINDOW:]
+        entry["recent"] = (entry.get("recent", []) + [truncated])[-TRUNCATION_WINDOW:]
+        if truncated:
+            entry["truncations"] += 1
+        _save()
+
+
+def max_tokens_for(section, token_limit) -> int:
+    """max_tokens for the next call of this section."""
+    ceiling = int(token_limit * STATIC_BUFFER)
+    with _lock:
+        entry = _load().get(section, {})
+        samples = sorted(entry.get("samples", []))
+        recently_truncated = any(entry.get("recent", []))
+    if len(samples) < MIN_SAMPLES or recently_truncated:
+        return ceiling
+
+    p95 = samples[min(len(samples) - 1, int(0.95 * len(samples)))]
+    return max(MIN_BUDGET, min(ceiling, int(p95 * HEADROOM)))
+
+
+def summary() -> dict:
+    """Section -> samples, p95 and truncation count, for debugging budgets."""
+    with _lock:
+        stats = json.loads(json.dumps(_load()))
+    for entry in stats.values():
+        samples = sorted(entry["samples"])
+        entry["p95"] = samples[min(len(samples) - 1, int(0.95 * len(samples)))] if samples else None
+    return stats
@@ -0,0 +1,139 @@
+"""
+Single-flight coalescing of identical work that is already in progress.
+
+A key identifies the work (e.g. minutes hash + company + document type +
+prompt version, or an exact LLM request). While a job for a key is running,
+anyone asking for the same key joins it instead of starting a second copy,
+and gets the same result (or the same exception). Keys are forgotten as soon
+as the job finishes: this is not a cache.
+
+Two ways to run work:
+ - do(key, fn): fn runs on the first caller's thread, later callers block
+   until it is done. Used per LLM call in llm.py.
+ - submit(key, fn): fn(job) runs on its own thread, so it outlives the
+   Streamlit script run that started it (a double-click reruns the script
+   and would otherwise kill the first pipeline). Callers wait() on the Job,
+   which relays the job's progress messages to their own status area.
+   Each caller gets a Subscription; a caller that no longer wants the result
+   leave()s it, and the job's cancel_token is cancelled once nobody is left
+   waiting for it.
+"""
+import contextvars
+import threading
+from concurrent.futures import Future, wait
+
+from cancellation import CancelToken
+
+POLL_INTERVAL = 0.5                                 # Seconds between progress updates for waiting callers
+
+
+class Job:
+    def __init__(self, key):
+        self.key = key
+        self.future = Future()
+        self.progress = None                        # Latest progress message
+        self.run_id = None                          # Set by the job itself, for callers that joined it
+        self.subscribers = 1
+        self.cancel_token = CancelToken()           # Cancelled when the last subscriber leaves
+        self._lock = threading.Lock()
+
+    def text(self, message):
+        """Record a progress message. Has the signature of a Streamlit status area, so it can be passed as one."""
+        self.progress = message
+
+    def done(self) -> bool:
+        return self.future.done()
+
+    def _join(self):
+        with self._lock:
+            self.subscribers += 1
+
+    def _leave(self):
+        with self._lock:
+            self.subscribers -= 1
+            last = self.subscribers <= 0
+        if last:
+            self.cancel_token.cancel()
+
+    def wait(self, status_area=None, timeout=None):
+        """Result of the job (re-raising its exception), relaying progress to status_area while waiting."""
+        if status_area is None:
+            return self.future.result(timeout)
+        # Polls with wait(), not result(timeout): a job that raised TimeoutError itself must not look unfinished
+        while not wait([self.future], POLL_INTERVAL).done:
+            # Sent on every poll, not only on change: Streamlit only stops a script run for a rerun
+            # (e.g. the cancel button) when the script touches an element
+            status_area.text(self.progress or "")
+        return self.future.result()
+
+
+class Subscription:
+    """One caller's interest in a Job."""
+
+    def __init__(self, job):
+        self.job = job
+        self.left = False
+        self._lock = threading.Lock()
+
+    def wait(self, status_area=None, timeout=None):
+        return self.job.wait(status_area, timeout)
+
+    def leave(self):
+        """Stop waiting for the job (safe to call more than once). The last subscriber to leave cancels it."""
+        with self._lock:
+            if self.left:
+                return
+            self.left = True
+        self.job._leave()
+
+
+class Group:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs = {}                             # key -> Job in flight
+
+    def _join_or_start(self, key):
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and not job.cancel_token.is_set():
+                job._join()
+                return job, True
+            job = self._jobs[key] = Job(key)
+            return job, False
+
+    def _run(self, job, fn, *args):
+        try:
+            job.future.set_result(fn(*args))
+        except BaseException as e:
+            job.future.set_exception(e)
+        finally:
+            with self._lock:
+                if self._jobs.get(job.key) is job:
+                    del self._jobs[job.key]
+
+    def do(self, key, fn):
+        """
+        Run fn() unless an identical call is in flight. Returns (result, shared),
+        shared is True for callers that joined someone else's call.
+        """
+        job, joined = self._join_or_start(key)
+        if not joined:
+            self._run(job, fn)
+        return job.future.result(), joined
+
+    def submit(self, key, fn):
+        """
+        Start fn(job) on a background thread (with a copy of the caller's
+        context) unless an identical job is in flight. Returns (Subscription, joined).
+        """
+        job, joined = self._join_or_start(key)
+        if not joined:
+            thread = threading.Thread(target=contextvars.copy_context().run, args=(self._run, job, fn, job),
+                                      name=f"single-flight-{key[:8]}", daemon=True)
+            thread.start()
+        return Subscription(job), joined
+
+    def in_flight(self) -> dict:
+        """key -> number of callers sharing the job."""
+        with self._lock:
+            return {key: job.subscribers for key, job in self._jobs.items()}
@@ -0,0 +1,146 @@
+"""
+Speculative pre-generation.
+
+Once the minutes and company name are known, the app can start generating the
+one-pager and strategy sections in the background, before any button is
+pressed. The button then picks up the finished (or nearly finished) result.
+
+Speculation is opt-in, only starts once the inputs have stopped changing, is
+cancelled when they change, and is capped per session so a user flicking
+between uploads (or typing a company name) can't run up unbounded cost.
+"""
+import contextvars
+import hashlib
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from cancellation import CancelToken, raise_if_cancelled
+
+MAX_SPECULATIONS_PER_SESSION = int(os.getenv("MML_MAX_SPECULATIONS", "3"))
+SETTLE_SECONDS = float(os.getenv("MML_SPECULATION_SETTLE", "3"))  # Inputs unchanged this long before speculating
+SETTLE_RUNS = 2                                     # ... or seen unchanged on this many script runs
+POLL_INTERVAL = 0.5                                 # Seconds between progress updates while waiting for a job
+
+
+def inputs_key(minutes, company_name, *options) -> str:
+    # options: anything else that changes the output (e.g. digest mode)
+    return hashlib.sha256(f"{company_name}\n{options}\n{minutes}".encode("utf-8")).hexdigest()
+
+
+class _Progress:
+    """Status area handed to a speculative job, keeps its latest progress message."""
+
+    def __init__(self):
+        self.message = None
+
+    def text(self, message):
+        self.message = message
+
+
+class Speculation:
+    def __init__(self, key, jobs):
+        """
+        jobs: name -> callable taking cancel_token (a cancellation.CancelToken), status_area and run_id
+        keywords. run_id is the llm run to record the job's calls under, one per job, so the document
+        that takes its result can take over its spend (llm.adopt_run).
+        """
+        self.key = key
+        self.cancel_token = CancelToken()
+        self.progress = {name: _Progress() for name in jobs}
+        self.run_ids = {name: uuid.uuid4().hex[:8] for name in jobs}
+        executor = ThreadPoolExecutor(max_workers=len(jobs), thread_name_prefix="speculate")
+        self.futures = {name: executor.submit(contextvars.copy_context().run, job, cancel_token=self.cancel_token,
+                                              status_area=self.progress[name], run_id=self.run_ids[name])
+                        for name, job in jobs.items()}
+        executor.shutdown(wait=False)
+
+    def cancel(self):
+        self.cancel_token.cancel()
+        for future in self.futures.values():
+            future.cancel()
+
+    def status(self, name) -> str:
+        future = self.futures.get(name)
+        if future is None:
+            return "none"
+        if not future.done():
+            return "running"
+        if future.cancelled() or future.exception() is not None:
+            return "failed"
+        return "ready"
+
+    def result(self, name, status_area=None, cancel_token=None):
+        """
+        Wait for a job and return its result, or None if it failed or was cancelled.
+        Relays the job's progress to status_area while waiting, and raises Cancelled
+        as soon as cancel_token is cancelled (the job itself keeps running).
+        """
+        future = self.futures.get(name)
+        if future is None:
+            return None
+        while not future.done():
+            raise_if_cancelled(cancel_token)
+            if status_area is not None:
+                status_area.text(self.progress[name].message or "Waiting for background generation...")
+            wait([future], timeout=POLL_INTERVAL)
+        if self.status(name) == "failed":
+            return None
+        return future.result()
+
+
+def settled(state, key) -> bool:
+    """
+    True once key has been seen unchanged for SETTLE_SECONDS, or on SETTLE_RUNS
+    calls in a row (one per script run), so every edit of an input doesn't start a run.
+    """
+    now = time.monotonic()
+    seen = state.get("speculation_inputs")
+    if seen is None or seen["key"] != key:
+        state["speculation_inputs"] = {"key": key, "since": now, "runs": 1}
+        return False
+    seen["runs"] += 1
+    return seen["runs"] >= SETTLE_RUNS or now - seen["since"] >= SETTLE_SECONDS
+
+
+def limit_reached(state) -> bool:
+    return state.get("speculations_started", 0) >= MAX_SPECULATIONS_PER_SESSION
+
+
+def speculate(state, key, jobs):
+    """
+    Make sure a speculation for `key` is running once the inputs have settled.
+    state is the session state (any dict-like). Returns the Speculation, or None
+    while the inputs are settling or once the session cap is hit (limit_reached).
+    """
+    current = state.get("speculation")
+    if current is not None and current.key == key:
+        return current
+
+    # Inputs changed, throw away the old work
+    cancel(state)
+
+    if not settled(state, key) or limit_reached(state):
+        return None
+    started = state.get("speculations_started", 0)
+    state["speculations_started"] = started + 1
+
+    speculation = Speculation(key, jobs)
+    state["speculation"] = speculation
+    return speculation
+
+
+def cancel(state):
+    current = state.get("speculation")
+    if current is not None:
+        current.cancel()
+    state["speculation"] = None
+
+
+def running(state, key):
+    """The Speculation for these inputs, or None. Wait for its jobs with Speculation.result."""
+    speculation = state.get("speculation")
+    if speculation is None or speculation.key != key:
+        return None
+    return speculation
@@ -0,0 +1,279 @@
+"""
+Rendering of the strategy report .docx (python-docx).
+
+Kept apart from generate_strategy_3 so planning and generating sections (and
+anything importing them, like workers and CLIs) doesn't pay for importing
+python-docx; generate_strategy_3.render_strategy_docx imports this on first use.
+"""
+import re
+from io import BytesIO
+
+from docx import Document
+from docx.shared import Inches, Pt, RGBColor
+from docx.enum.section import WD_ORIENT
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+
+BM_SECTIONS = ["Customer Segments", "Value Proposition", "Channels", "Customer Relationships",
+               "Revenue Streams", "Key Resources", "Key Activities", "Key Partners", "Cost Structure"]
+
+# ----------- Functions -----------
+def add_page_number(paragraph):
+    run = paragraph.add_run()
+    fldChar1 = OxmlElement('w:fldChar')
+    fldChar1.set(qn('w:fldCharType'), 'begin')
+
+    instrText = OxmlElement('w:instrText')
+    instrText.text = "PAGE"
+
+    fldChar2 = OxmlElement('w:fldChar')
+    fldChar2.set(qn('w:fldCharType'), 'end')
+
+    run._r.append(fldChar1)
+    run._r.append(instrText)
+    run._r.append(fldChar2)
+
+    # Optional styling
+    run.font.name = 'Calibri'
+    run.font.size = Pt(10)
+
+def insert_cover_page(doc, company_name, logo_path=None):
+    # Add blank lines to push text down
+    for _ in range(4):  # Adjust number as needed for vertical spacing
+        doc.add_paragraph()
+
+    # Add Company Name (centered, large, orange, bold)
+    para1 = doc.add_paragraph()
+    run1 = para1.add_run(company_name)
+    run1.font.name = 'Calibri'
+    run1.font.size = Pt(44)
+    run1.font.color.rgb = RGBColor(255, 153, 0)  # Orange (#FF9900)
+    run1.bold = True
+    para1.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    # Add "Strategy Report" below
+    para2 = doc.add_paragraph()
+    run2 = para2.add_run("Strategy Report")
+    run2.font.name = 'Calibri'
+    run2.font.size = Pt(44)
+    run2.font.color.rgb = RGBColor(255, 153, 0)  # Orange (#FF9900)
+    run2.bold = True
+    para2.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    # Optional spacing before logo
+    doc.add_paragraph()
+
+    # Insert logo if provided
+    if logo_path:
+        logo_para = doc.add_paragraph()
+        logo_run = logo_para.add_run()
+        logo_run.add_picture(logo_path, width=Inches(2))
+        logo_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    # Add a page break after the cover page
+    doc.add_page_break()
+
+def insert_table_of_contents(doc):
+    """
+     - Does not work, XML field codes don't work.
+     - Table of Contents not accessible
+     - Can't even generate a Blank or Empty ToC to be manually update
+
+     - Solution: Insert a blank page and manually insert ToC and Update it.
+    
+    """
+    heading_para = doc.add_paragraph()
+    run = heading_para.add_run("Contents Page")
+    run.font.name = 'Calibri'
+    run.font.size = Pt(34)
+    run.font.color.rgb = RGBColor(255, 153, 0)
+    run.bold = True
+    # paragraph = doc.add_paragraph()
+    # run = paragraph.add_run()
+
+    # fldChar1 = OxmlElement('w:fldChar')
+    # fldChar1.set(qn('w:fldCharType'), 'begin')
+
+    # instrText = OxmlElement('w:instrText')
+    # instrText.set(qn('xml:space'), 'preserve')
+    # instrText.text = 'TOC \\o "1-3" \\h \\z \\u'
+
+    # fldChar2 = OxmlElement('w:fldChar')
+    # fldChar2.set(qn('w:fldCharType'), 'separate')
+
+    # fldChar3 = OxmlElement('w:fldChar')
+    # fldChar3.set(qn('w:fldCharType'), 'end')
+
+    # r_element = run._r
+    # r_element.append(fldChar1)
+    # r_element.append(instrText)
+    # r_element.append(fldChar2)
+    # r_element.append(fldChar3)
+
+    doc.add_paragraph()  # Optional spacing
+    doc.add_page_break()
+
+def is_bullet_point(line):
+    stripped = line.strip()
+    return bool(re.match(r"^[-–—•●]\s+", stripped))
+
+def add_markdown_bold_paragraph(doc, text, style="Normal"):
+    paragraph = doc.add_paragraph(style=style)
+    paragraph.paragraph_format.space_after = Pt(0)
+
+    # Indent bullets only
+    if style == "List Bullet":
+        paragraph.paragraph_format.left_indent = Inches(0.5)
+
+    # Split into parts by bold markers (**...**)
+    parts = re.split(r"(\*\*.*?\*\*)", text)
+
+    for part in parts:
+        run = paragraph.add_run()
+        run.font.name = 'Calibri'
+        run.font.size = Pt(12)
+
+        if part.startswith("**") and part.endswith("**"):
+            run.text = part[2:-2]
+            run.bold = True
+        else:
+            run.text = part
+
+    return paragraph
+
+def insert_logo(doc, image_path, width_in_inches=2):
+    if image_path:
+        para = doc.add_paragraph()
+        run = para.add_run()
+        run.add_picture(image_path, width=Inches(width_in_inches))
+        para.alignment = WD_ALIGN_PARAGRAPH.LEFT
+
+# Marked stand-in for a section that failed to generate (generate_strategy_3 passes its content as None)
+def add_failed_section_placeholder(doc, heading):
+    para = doc.add_paragraph()
+    run = para.add_run(f"[Section not generated: \"{heading}\" failed or timed out. Regenerate the report "
+                       f"to fill it in before sending.]")
+    run.font.name = 'Calibri'
+    run.font.size = Pt(12)
+    run.font.color.rgb = RGBColor(192, 0, 0)
+    run.bold = True
+    run.italic = True
+
+# Helper function: add landscape section break
+def set_landscape(document):
+    section = document.sections[-1]
+    
+    # Set A4 size
+    section.page_width = Inches(11.69)
+    section.page_height = Inches(8.27)
+    section.orientation = WD_ORIENT.LANDSCAPE
+
+# Lay out generated sections as the strategy report docx
+def render_strategy_docx(section_contents, company_name) -> BytesIO:
+    doc = Document()
+    set_landscape(doc)
+
+    # Set normal margins
+    section = doc.sections[-1]
+    inch = Inches(1)
+    section.top_margin = inch
+    section.bottom_margin = inch
+    section.left_margin = inch
+    section.right_margin = inch
+
+    # Set default font
+    style = doc.styles['Normal']
+    font = style.font
+    font.name = 'Calibri'
+    font.size = Pt(12)
+
+    # Set global line spacing to 1.3
+    paragraph_format = style.paragraph_format
+    paragraph_format.space_after = Pt(0)
+    paragraph_format.line_spacing = 1.3
+
+    # company_name = extract_company_name(minutes)
+    insert_cover_page(doc, company_name=company_name, logo_path="Logo3.png")
+    # Currently jsut a blank page
+    insert_table_of_contents(doc)
+
+    # Track whether we've already added the "Business Model" heading
+    inserted_bm_heading = False
+
+    for i, (heading, content) in enumerate(section_contents):
+        # Add styled heading
+        if heading in BM_SECTIONS:
+            # Insert "Business Model" heading once
+            if not inserted_bm_heading:
+                bm_para = doc.add_paragraph("Business Model", style='Heading 1')
+                bm_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
+                bm_run = bm_para.runs[0]
+                bm_run.font.name = 'Calibri'
+                bm_run.font.size = Pt(34)
+                bm_run.font.color.rgb = RGBColor(255, 153, 0)
+                bm_run.bold = True
+                inserted_bm_heading = True
+
+            # Create unstyled heading (NOT "Heading 1") for BM section
+            heading_para = doc.add_paragraph()
+            run = heading_para.add_run(heading)
+            run.font.name = 'Calibri'
+            run.font.size = Pt(34)
+            run.font.color.rgb = RGBColor(255, 153, 0)
+            run.bold = True
+
+        else:
+            # Styled heading that WILL appear in the table of contents
+            heading_para = doc.add_paragraph(heading, style='Heading 1')
+            run = heading_para.runs[0]
+            run.font.name = 'Calibri'
+            run.font.size = Pt(34)
+            run.font.color.rgb = RGBColor(255, 153, 0)
+            run.bold = True
+
+        # Add normal body text
+        # doc.add_paragraph(content)
+        # Should do bolding AND bullet points
+        # save_raw_text(heading, content)
+
+        if content is None:
+            add_failed_section_placeholder(doc, heading)
+            content = ""
+
+        for line in content.split("\n"):
+            stripped = line.strip()
+
+            if not stripped:
+                doc.add_paragraph()
+                continue
+
+            if is_bullet_point(stripped):
+                # Strip hyphen/bullet prefix
+                bullet_text = re.sub(r"^[-–—•●]\s+", "", stripped)
+                # Handle markdown-style bold within the bullet
+                add_markdown_bold_paragraph(doc, bullet_text, style="List Bullet")
+            else:
+                add_markdown_bold_paragraph(doc, stripped)
+
+        if i != len(section_contents) - 1:
+            doc.add_page_break()
+
+    insert_logo(doc, "Logo3.png")
+    # Add "Momentum Mind Lab Team" below the logo
+    team_para = doc.add_paragraph()
+    team_run = team_para.add_run("\nMomentum Mind Lab Team")
+    team_run.font.name = 'Calibri'
+    team_run.font.size = Pt(12)
+
+    # Add page number to footer of *all* sections
+    for section in doc.sections:
+        footer = section.footer
+        paragraph = footer.paragraphs[0]
+        paragraph.alignment = 2  # Right?
+        add_page_number(paragraph)
+
+    buffer = BytesIO()
+    doc.save(buffer)
+    buffer.seek(0)  # Move back to the beginning so Streamlit can read it
+    return buffer
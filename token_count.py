@@ -0,0 +1,97 @@
+"""
+Local token counting, no API calls.
+
+Exact counts come from tiktoken (the BPE tables the OpenAI models use). tiktoken
+downloads an encoding the first time it is used; it is kept in TIKTOKEN_CACHE_DIR
+(.cache/tiktoken next to this module unless set), so after one online run
+counting works offline.
+
+Without tiktoken, or without its encoding (offline on first use), counts are an
+estimate, not BPE: text is split with the same kind of pre-tokenisation regex
+the GPT encoders use (words with their leading space, digit runs, punctuation
+runs, whitespace) and each piece is costed from its length, which lands close
+to the real count on English prose. exact() tells which one is in use, reports
+showing counts should say when they are estimates.
+"""
+import math
+import os
+import re
+import threading
+
+try:
+    import tiktoken
+except ImportError:                                 # Optional dependency
+    tiktoken = None
+
+DEFAULT_ENCODING = "o200k_base"                     # gpt-4o / gpt-4o-mini
+MESSAGE_OVERHEAD = 3                                # Tokens per chat message (role + separators)
+REPLY_OVERHEAD = 3                                  # Every reply is primed with <|start|>assistant<|message|>
+
+# Rough GPT-style pre-tokenisation: contractions, words, numbers, punctuation, whitespace
+PIECE_PATTERN = re.compile(r"'(?:s|t|re|ve|m|ll|d)\b| ?[^\W\d_]+| ?\d{1,3}| ?[^\s\w]+|\s+(?!\S)|\s+", re.IGNORECASE)
+CHARS_PER_WORD_TOKEN = 6                            # Common words are one token, long ones split into ~6 char parts
+CACHE_DIR = os.getenv("TIKTOKEN_CACHE_DIR",
+                      os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "tiktoken"))
+
+
+_encodings_lock = threading.Lock()
+_encodings = {}                                     # model -> tiktoken Encoding, None if it couldn't be loaded
+
+
+def _encoding(model):
+    with _encodings_lock:
+        if model in _encodings:
+            return _encodings[model]
+    # Loaded outside the lock (a first load can download), the first one published wins
+    encoding = _load_encoding(model)
+    with _encodings_lock:
+        return _encodings.setdefault(model, encoding)
+
+
+def _load_encoding(model):
+    if tiktoken is None:
+        return None
+    # tiktoken reads the variable when it loads an encoding, not at import
+    os.environ.setdefault("TIKTOKEN_CACHE_DIR", CACHE_DIR)
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding(DEFAULT_ENCODING)
+    except Exception as e:                          # Not cached and no network: estimate instead
+        print(f"tiktoken encoding for {model} unavailable, estimating token counts: {e}")
+        return None
+
+
+def exact(model="gpt-4o") -> bool:
+    """True when counts come from tiktoken, False when they are estimates."""
+    return _encoding(model) is not None
+
+
+def _piece_tokens(piece) -> int:
+    word = piece.lstrip(" ")
+    if not word:
+        return 1                                    # Whitespace run
+    if word[0].isalpha():
+        return math.ceil(len(word) / CHARS_PER_WORD_TOKEN)
+    if word[0].isdigit():
+        return 1                                    # Digit runs are split into groups of <= 3
+    return math.ceil(len(word) / 2)                 # Punctuation, symbols
+
+
+def estimate_tokens(text) -> int:
+    return sum(_piece_tokens(piece) for piece in PIECE_PATTERN.findall(text))
+
+
+def count_tokens(text, model=None) -> int:
+    if not text:
+        return 0
+    encoding = _encoding(model or "gpt-4o")
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return estimate_tokens(text)
+
+
+def count_messages(messages, model=None) -> int:
+    """Prompt tokens of a chat request, as billed."""
+    return REPLY_OVERHEAD + sum(MESSAGE_OVERHEAD + count_tokens(m["content"], model) for m in messages)
@@ -1,12 +1,11 @@
 from datetime import datetime, timedelta
 import json
 import re
-from docx import Document
+from docx_stream import iter_lines
 
 # === Utilities ===
 def read_minutes(file_path):
-    doc = Document(file_path)
-    return "\n".join(p.text for p in doc.paragraphs if p.text.strip())
+    return "\n".join(iter_lines(file_path))
 
 def get_day_suffix(day):
     if 11 <= day <= 13: